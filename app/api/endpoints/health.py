@@ -5,23 +5,52 @@ import logging
 import onnxruntime as ort
 from fastapi import HTTPException
 
-from app.core.lifespan import get_ocr_model
+from app.core.admission import get_admission_controller
+from app.core.lifespan import get_ocr_model, is_ocr_model_ready
+from app.services.cache_service import get_result_cache
+from app.services.job_service import get_job_manager
 
 logger = logging.getLogger(__name__)
 
 
 async def health_check():
     """健康检查端点"""
-    ocr_model = get_ocr_model()
-    if ocr_model is None:
+    if not is_ocr_model_ready():
         raise HTTPException(503, "OCR model not initialized")
     
-    return {
+    health = {
         "status": "healthy",
         "model": "PaddleOCRV4",
         "providers": ort.get_available_providers(),
     }
 
+    # 流水线模式下上报各阶段队列深度与利用率（进程池模式下模型在工作进程中, 不上报）
+    ocr_model = get_ocr_model()
+    if hasattr(ocr_model, "stats"):
+        health["pipeline"] = ocr_model.stats()
+
+    # 文本框去重与跨请求缓存命中情况
+    text_rec_cache = getattr(getattr(ocr_model, "ocr", ocr_model), "text_rec_cache", None)
+    if text_rec_cache is not None:
+        health["rec_crop_cache"] = text_rec_cache.stats()
+
+    # 各接口类别的在途请求数、排队数与排空速率
+    admission_controller = get_admission_controller()
+    if admission_controller is not None:
+        health["admission"] = admission_controller.stats()
+
+    # 结果缓存命中率
+    result_cache = get_result_cache()
+    if result_cache is not None:
+        health["result_cache"] = result_cache.stats()
+
+    # 异步任务队列长度
+    job_manager = get_job_manager()
+    if job_manager is not None:
+        health["jobs"] = {"queue_depth": job_manager.queue_depth()}
+
+    return health
+
 
 async def root():
     """根端点"""
@@ -31,11 +60,17 @@ async def root():
         "endpoints": [
             "/ocr",
             "/v1/ocr",
+            "/v1/ocr/batch",
             "/binary_ocr",
             "/fast_ocr",
+            "/v1/ocr/shm",
             "/paddleocr",
             "/easyocr",
             "/upload",
+            "/upload_pdf",
+            "/upload_pdf_stream",
+            "/upload_frames_stream",
+            "/jobs",
             "/health"
         ],
         "features": [
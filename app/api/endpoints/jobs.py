@@ -0,0 +1,123 @@
+"""
+异步任务端点
+"""
+import logging
+from typing import Dict
+
+from fastapi import UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.api.endpoints.upload import check_pdf_file, check_pdf_mode
+from app.core.config import PDF_DEFAULT_MODE
+from app.models.schemas import JobStatusResponse, JobResultResponse
+from app.services.job_service import (
+    JobManager, get_job_manager, JOB_STATUS_SUCCEEDED, JOB_FINISHED_STATUSES
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _require_job_manager() -> JobManager:
+    job_manager = get_job_manager()
+    if job_manager is None:
+        raise HTTPException(503, "Job service not available")
+    return job_manager
+
+
+def _load_job(job_manager: JobManager, job_id: str) -> Dict:
+    job = job_manager.store.load(job_id)
+    if job is None:
+        raise HTTPException(404, f"Job not found: {job_id}")
+    return job
+
+
+def _to_status_response(job: Dict) -> JobStatusResponse:
+    progress = 0.0
+    if job["status"] == JOB_STATUS_SUCCEEDED:
+        progress = 1.0
+    elif job["pages_total"]:
+        progress = round(job["pages_done"] / job["pages_total"], 4)
+
+    return JobStatusResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        filename=job["filename"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        pages_total=job["pages_total"],
+        pages_done=job["pages_done"],
+        results_count=job["results_count"],
+        progress=progress,
+        error=job["error"]
+    )
+
+
+async def create_job(
+    file: UploadFile = File(...),
+    use_det: bool = Form(True),
+    use_cls: bool = Form(True),
+    use_rec: bool = Form(True),
+    text_score: float = Form(0.5),
+    box_thresh: float = Form(0.5),
+    unclip_ratio: float = Form(1.6),
+    return_word_box: bool = Form(True),
+    mode: str = Form(PDF_DEFAULT_MODE)
+) -> JobStatusResponse:
+    """提交PDF异步OCR任务, 立即返回任务ID"""
+    job_manager = _require_job_manager()
+    check_pdf_file(file)
+    check_pdf_mode(mode)
+
+    job = await job_manager.submit(
+        file.file,
+        file.filename,
+        {
+            "use_det": use_det,
+            "use_cls": use_cls,
+            "use_rec": use_rec,
+            "text_score": text_score,
+            "box_thresh": box_thresh,
+            "unclip_ratio": unclip_ratio,
+            "return_word_box": return_word_box,
+        },
+        mode
+    )
+    return _to_status_response(job)
+
+
+async def get_job(job_id: str) -> JobStatusResponse:
+    """查询任务状态与进度"""
+    job_manager = _require_job_manager()
+    return _to_status_response(_load_job(job_manager, job_id))
+
+
+async def get_job_result(job_id: str, partial: bool = False, format: str = "json"):
+    """
+    获取任务结果
+    partial=true 时返回任务未完成前已识别的部分结果; format=ndjson 时直接返回结果文件
+    """
+    job_manager = _require_job_manager()
+    job = _load_job(job_manager, job_id)
+
+    if job["status"] not in JOB_FINISHED_STATUSES and not partial:
+        raise HTTPException(
+            409, f"Job {job_id} is {job['status']}, use partial=true for partial results"
+        )
+
+    if format == "ndjson":
+        return FileResponse(
+            job_manager.store.results_path(job_id), media_type="application/x-ndjson"
+        )
+    if format != "json":
+        raise HTTPException(400, f"Unsupported format: {format}, expected 'json' or 'ndjson'")
+
+    results = await run_in_threadpool(lambda: list(job_manager.store.iter_results(job_id)))
+    return JobResultResponse(
+        job_id=job_id,
+        status=job["status"],
+        success=job["status"] == JOB_STATUS_SUCCEEDED,
+        results=results,
+        error=job["error"]
+    )
@@ -2,31 +2,52 @@
 OCR 相关端点
 """
 import logging
-import numpy as np
-from fastapi import UploadFile, File, Form, HTTPException
+from typing import List, Tuple
+from fastapi import UploadFile, File, Form, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from rapidocr_onnxruntime_run import OCRCancelledError
 
+from app.core.admission import admit_request
+from app.core.cancellation import request_cancel_scope
+from app.core.config import MAX_FILE_SIZE, BATCH_MAX_IMAGES, SHM_INPUT_ENABLED
+from app.core.executor import run_inference
 from app.models.schemas import (
-    OCRRequest, OCRResponse, PaddleOCRRequest, EasyOCRRequest
+    OCRRequest, OCRResponse, PaddleOCRRequest, EasyOCRRequest, OCRBatchResponse,
+    OCRShmRequest
 )
+from app.services.cache_service import cached_ocr
 from app.services.ocr_service import (
-    process_ocr_request, process_binary_ocr, process_ocr_result
+    process_ocr_request, process_binary_ocr, process_fast_ocr, process_batch_ocr,
+    process_shm_ocr
+)
+from app.utils.image_utils import (
+    estimate_base64_pixels, estimate_image_pixels, extract_images_from_zip
 )
 
 logger = logging.getLogger(__name__)
 
 
-async def ocr_endpoint_v1(request: OCRRequest) -> OCRResponse:
+async def ocr_endpoint_v1(request: OCRRequest, http_request: Request) -> OCRResponse:
     """V1 OCR端点 - 标准接口"""
-    results, total_time, image_size = process_ocr_request(
-        request.image,
-        request.use_det,
-        request.use_cls,
-        request.use_rec,
-        request.text_score,
-        request.box_thresh,
-        request.unclip_ratio,
-        request.return_word_box
-    )
+    params = {
+        "use_det": request.use_det,
+        "use_cls": request.use_cls,
+        "use_rec": request.use_rec,
+        "text_score": request.text_score,
+        "box_thresh": request.box_thresh,
+        "unclip_ratio": request.unclip_ratio,
+        "return_word_box": request.return_word_box
+    }
+
+    async def compute():
+        pixels = estimate_base64_pixels(request.image)
+        async with request_cancel_scope(http_request, request.timeout) as cancel_token, \
+                admit_request("image", pixels, cancel_token):
+            return await run_inference(
+                process_ocr_request, request.image, **params, cancel_token=cancel_token
+            )
+
+    results, total_time, image_size = await cached_ocr(request.image, params, compute)
 
     return OCRResponse(
         success=True,
@@ -36,19 +57,32 @@ async def ocr_endpoint_v1(request: OCRRequest) -> OCRResponse:
     )
 
 
-async def ocr_endpoint(request: OCRRequest) -> OCRResponse:
+async def ocr_endpoint(request: OCRRequest, http_request: Request) -> OCRResponse:
     """标准OCR端点"""
-    return await ocr_endpoint_v1(request)
+    return await ocr_endpoint_v1(request, http_request)
 
 
-async def paddleocr_endpoint(request: PaddleOCRRequest):
+async def paddleocr_endpoint(request: PaddleOCRRequest, http_request: Request):
     """PaddleOCR兼容接口"""
-    results, total_time, image_size = process_ocr_request(
-        request.image,
-        use_cls=request.use_angle_cls,
-        box_thresh=request.det_db_box_thresh,
-        unclip_ratio=request.det_db_unclip_ratio
-    )
+    params = {
+        "use_det": True,
+        "use_cls": request.use_angle_cls,
+        "use_rec": True,
+        "text_score": 0.5,
+        "box_thresh": request.det_db_box_thresh,
+        "unclip_ratio": request.det_db_unclip_ratio,
+        "return_word_box": True
+    }
+
+    async def compute():
+        pixels = estimate_base64_pixels(request.image)
+        async with request_cancel_scope(http_request) as cancel_token, \
+                admit_request("image", pixels, cancel_token):
+            return await run_inference(
+                process_ocr_request, request.image, **params, cancel_token=cancel_token
+            )
+
+    results, total_time, image_size = await cached_ocr(request.image, params, compute)
 
     # 转换为PaddleOCR格式
     paddle_results = []
@@ -67,15 +101,27 @@ async def paddleocr_endpoint(request: PaddleOCRRequest):
     }
 
 
-async def easyocr_endpoint(request: EasyOCRRequest):
+async def easyocr_endpoint(request: EasyOCRRequest, http_request: Request):
     """EasyOCR兼容接口"""
-    results, total_time, image_size = process_ocr_request(
-        request.image,
-        use_det=True,
-        use_cls=True,
-        use_rec=True,
-        text_score=request.text_threshold
-    )
+    params = {
+        "use_det": True,
+        "use_cls": True,
+        "use_rec": True,
+        "text_score": request.text_threshold,
+        "box_thresh": 0.5,
+        "unclip_ratio": 1.6,
+        "return_word_box": True
+    }
+
+    async def compute():
+        pixels = estimate_base64_pixels(request.image)
+        async with request_cancel_scope(http_request) as cancel_token, \
+                admit_request("image", pixels, cancel_token):
+            return await run_inference(
+                process_ocr_request, request.image, **params, cancel_token=cancel_token
+            )
+
+    results, total_time, image_size = await cached_ocr(request.image, params, compute)
 
     # 转换为EasyOCR格式
     easyocr_results = []
@@ -95,15 +141,15 @@ async def easyocr_endpoint(request: EasyOCRRequest):
 
 
 async def binary_ocr_endpoint(
+    http_request: Request,
     image_data: UploadFile = File(...),
     height: int = Form(...),
     width: int = Form(...)
 ) -> OCRResponse:
     """最快的二进制传输OCR接口"""
-    from app.core.lifespan import get_ocr_model
-    
-    ocr_model = get_ocr_model()
-    if ocr_model is None:
+    from app.core.lifespan import is_ocr_model_ready
+
+    if not is_ocr_model_ready():
         raise HTTPException(500, "OCR model not initialized")
 
     try:
@@ -112,8 +158,19 @@ async def binary_ocr_endpoint(
         file_size_mb = len(image_bytes) / (1024 * 1024)
         logger.info(f"文件读取完成 | 大小: {file_size_mb:.2f}MB")
 
+        async def compute():
+            # 按图片尺寸申请准入, 与 PDF 等重请求分开限流
+            async with request_cancel_scope(http_request) as cancel_token, \
+                    admit_request("fast", height * width, cancel_token):
+                return await run_inference(
+                    process_binary_ocr, image_bytes, height, width,
+                    cancel_token=cancel_token
+                )
+
         # 处理OCR
-        results, total_time, image_size = process_binary_ocr(image_bytes, height, width)
+        results, total_time, image_size = await cached_ocr(
+            image_bytes, {"height": height, "width": width}, compute
+        )
 
         return OCRResponse(
             success=True,
@@ -122,12 +179,15 @@ async def binary_ocr_endpoint(
             image_size=image_size
         )
 
+    except (HTTPException, OCRCancelledError):
+        raise
     except Exception as e:
         logger.exception(f"Binary OCR处理错误: {str(e)}")
         raise HTTPException(500, f"Binary OCR processing error: {str(e)}")
 
 
 async def fast_ocr_endpoint(
+    http_request: Request,
     image_data: UploadFile = File(...),
     height: int = Form(...),
     width: int = Form(...),
@@ -140,52 +200,169 @@ async def fast_ocr_endpoint(
     return_word_box: bool = Form(False)
 ) -> OCRResponse:
     """适配业务调用方法的快速OCR接口"""
-    from app.core.lifespan import get_ocr_model
-    import numpy as np
-    import time
-    
-    ocr_model = get_ocr_model()
-    if ocr_model is None:
+    from app.core.lifespan import is_ocr_model_ready
+
+    if not is_ocr_model_ready():
         raise HTTPException(500, "OCR model not initialized")
 
+    params = {
+        "use_det": use_det,
+        "use_cls": use_cls,
+        "use_rec": use_rec,
+        "text_score": text_score,
+        "box_thresh": box_thresh,
+        "unclip_ratio": unclip_ratio,
+        "return_word_box": return_word_box
+    }
+
     try:
-        start_time = time.time()
-        
         # 读取UploadFile的内容
         image_bytes = await image_data.read()
 
-        # 使用调用方式
-        img_array = np.frombuffer(image_bytes, dtype=np.uint8).reshape(height, width, 3)
+        async def compute():
+            # 按图片尺寸申请准入, 与 PDF 等重请求分开限流
+            async with request_cancel_scope(http_request) as cancel_token, \
+                    admit_request("fast", height * width, cancel_token):
+                return await run_inference(
+                    process_fast_ocr,
+                    image_bytes,
+                    height,
+                    width,
+                    **params,
+                    cancel_token=cancel_token
+                )
 
         # 执行OCR
-        ocr_result = ocr_model(
-            img_array,
-            use_det=use_det,
-            use_cls=use_cls,
-            use_rec=use_rec,
-            text_score=text_score,
-            box_thresh=box_thresh,
-            unclip_ratio=unclip_ratio,
-            return_word_box=return_word_box
-        )
-
-        # 处理结果
-        results = process_ocr_result(ocr_result, return_word_box)
-        total_time = time.time() - start_time
-        
-        logger.info(
-            f"Fast OCR完成 | 耗时: {total_time:.3f}s | "
-            f"图片尺寸: {width}x{height} | 识别文本数: {len(results)}"
+        results, total_time, image_size = await cached_ocr(
+            image_bytes, {"height": height, "width": width, **params}, compute
         )
 
         return OCRResponse(
             success=True,
             results=results,
             processing_time=round(total_time, 4),
-            image_size={"width": width, "height": height}
+            image_size=image_size
         )
 
+    except (HTTPException, OCRCancelledError):
+        raise
     except Exception as e:
         logger.exception(f"Fast OCR处理错误: {str(e)}")
         raise HTTPException(500, f"Fast OCR processing error: {str(e)}")
 
+
+async def shm_ocr_endpoint(request: OCRShmRequest, http_request: Request) -> OCRResponse:
+    """共享内存OCR接口（同一主机上的客户端只传共享内存段名, 图片数据不经过请求体）"""
+    if not SHM_INPUT_ENABLED:
+        raise HTTPException(404, "Shared memory input is disabled")
+
+    # 按图片尺寸申请准入, 与 /fast_ocr 共用轻量类别
+    pixels = request.shape[0] * request.shape[1] if len(request.shape) >= 2 else 0
+    async with request_cancel_scope(http_request, request.timeout) as cancel_token, \
+            admit_request("fast", pixels, cancel_token):
+        results, total_time, image_size = await run_inference(
+            process_shm_ocr,
+            request.shm_name,
+            request.shape,
+            request.dtype,
+            request.offset,
+            use_det=request.use_det,
+            use_cls=request.use_cls,
+            use_rec=request.use_rec,
+            text_score=request.text_score,
+            box_thresh=request.box_thresh,
+            unclip_ratio=request.unclip_ratio,
+            return_word_box=request.return_word_box,
+            cancel_token=cancel_token
+        )
+
+    return OCRResponse(
+        success=True,
+        results=results,
+        processing_time=round(total_time, 4),
+        image_size=image_size
+    )
+
+
+async def read_batch_images(files: List[UploadFile]) -> List[Tuple[str, bytes]]:
+    """读取批量请求中的图片, zip 压缩包展开为其中的图片; 重名时追加序号"""
+    images = []
+    for i, file in enumerate(files):
+        filename = file.filename or f"image_{i}"
+        if file.size and file.size > MAX_FILE_SIZE * BATCH_MAX_IMAGES:
+            raise HTTPException(400, f"File {filename} too large")
+        content = await file.read()
+
+        if file.content_type in ("application/zip", "application/x-zip-compressed") \
+                or filename.lower().endswith(".zip"):
+            images.extend(await run_in_threadpool(
+                extract_images_from_zip,
+                content,
+                BATCH_MAX_IMAGES - len(images),
+                MAX_FILE_SIZE
+            ))
+        else:
+            if len(content) > MAX_FILE_SIZE:
+                raise HTTPException(400, f"File {filename} too large. Max size: {MAX_FILE_SIZE} bytes")
+            images.append((filename, content))
+
+        if len(images) > BATCH_MAX_IMAGES:
+            raise HTTPException(400, f"Too many images. Max: {BATCH_MAX_IMAGES}")
+
+    if not images:
+        raise HTTPException(400, "No images found in request")
+
+    names = {}
+    unique_images = []
+    for name, content in images:
+        if name in names:
+            names[name] += 1
+            name = f"{name}#{names[name]}"
+        else:
+            names[name] = 0
+        unique_images.append((name, content))
+    return unique_images
+
+
+async def ocr_batch_endpoint(
+    http_request: Request,
+    files: List[UploadFile] = File(...),
+    use_det: bool = Form(True),
+    use_cls: bool = Form(True),
+    use_rec: bool = Form(True),
+    text_score: float = Form(0.5),
+    box_thresh: float = Form(0.5),
+    unclip_ratio: float = Form(1.6),
+    return_word_box: bool = Form(False)
+) -> OCRBatchResponse:
+    """批量OCR接口: 多张图片（multipart 多个 files 或 zip 压缩包）共享识别批次, 结果按图片名返回"""
+    images = await read_batch_images(files)
+    pixels = sum(estimate_image_pixels(content) for _, content in images)
+
+    async with request_cancel_scope(http_request) as cancel_token, \
+            admit_request("image", pixels, cancel_token):
+        try:
+            results, total_time = await run_inference(
+                process_batch_ocr,
+                images,
+                use_det,
+                use_cls,
+                use_rec,
+                text_score,
+                box_thresh,
+                unclip_ratio,
+                return_word_box,
+                cancel_token=cancel_token
+            )
+
+            return OCRBatchResponse(
+                success=True,
+                results=results,
+                processing_time=round(total_time, 4)
+            )
+
+        except OCRCancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"Batch OCR处理错误: {str(e)}")
+            raise HTTPException(500, f"Batch OCR processing error: {str(e)}")
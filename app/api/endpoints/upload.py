@@ -2,29 +2,34 @@
 文件上传端点
 """
 import logging
-import base64
-from fastapi import UploadFile, File, Form, HTTPException
+import os
+from contextlib import AsyncExitStack
+from fastapi import UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from rapidocr_onnxruntime_run import OCRCancelledError
+from starlette.concurrency import run_in_threadpool
 
-from app.models.schemas import OCRResponse, OCRPDFResponse
+from app.core.admission import admit_request
+from app.core.cancellation import request_cancel_scope
+from app.core.executor import run_inference
+from app.models.schemas import OCRResponse, OCRPDFResponse, OCRPDFResult, OCRFrameResult
+from app.services.cache_service import cached_ocr
+from app.services.frame_service import estimate_frames_pixels, iter_frames_ocr
 from app.services.ocr_service import process_ocr_request
-from app.services.pdf_service import process_pdf_ocr
-from app.core.config import MAX_FILE_SIZE, ALLOWED_IMAGE_TYPES
+from app.services.pdf_service import (
+    PDF_MODES, PDFImageResults, process_pdf_ocr_sharded, process_pdf_image_ocr, iter_pdf_items,
+    estimate_pdf_pixels, spool_pdf_upload
+)
+from app.utils.image_utils import estimate_image_pixels
+from app.utils.stream_utils import STREAM_MEDIA_TYPES, encode_stream_event
+from app.core.config import MAX_FILE_SIZE, ALLOWED_IMAGE_TYPES, PDF_DEFAULT_MODE
 
 
 logger = logging.getLogger(__name__)
 
 
-async def upload_file(
-    file: UploadFile = File(...),
-    use_det: bool = Form(True),
-    use_cls: bool = Form(True),
-    use_rec: bool = Form(True),
-    text_score: float = Form(0.5),
-    box_thresh: float = Form(0.5),
-    unclip_ratio: float = Form(1.6),
-    return_word_box: bool = Form(True)
-) -> OCRResponse:
-    """文件上传OCR端点"""
+def check_image_file(file: UploadFile):
+    """检查上传的图片文件类型与大小"""
     # 检查文件类型
     if not file.content_type or file.content_type not in ALLOWED_IMAGE_TYPES:
         raise HTTPException(
@@ -37,23 +42,56 @@ async def upload_file(
     if file.size and file.size > MAX_FILE_SIZE:
         raise HTTPException(400, f"File too large. Max size: {MAX_FILE_SIZE} bytes")
 
-    try:
-        # 读取文件内容
-        file_content = await file.read()
-        image_base64 = base64.b64encode(file_content).decode('utf-8')
 
-        # 处理OCR
-        results, total_time, image_size = process_ocr_request(
-            image_base64,
-            use_det,
-            use_cls,
-            use_rec,
-            text_score,
-            box_thresh,
-            unclip_ratio,
-            return_word_box
+def check_stream_format(stream_format: str):
+    """检查流式响应格式"""
+    if stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(
+            400,
+            f"Unsupported stream format: {stream_format}, "
+            f"expected one of {list(STREAM_MEDIA_TYPES)}"
         )
 
+
+async def upload_file(
+    http_request: Request,
+    file: UploadFile = File(...),
+    use_det: bool = Form(True),
+    use_cls: bool = Form(True),
+    use_rec: bool = Form(True),
+    text_score: float = Form(0.5),
+    box_thresh: float = Form(0.5),
+    unclip_ratio: float = Form(1.6),
+    return_word_box: bool = Form(True)
+) -> OCRResponse:
+    """文件上传OCR端点"""
+    check_image_file(file)
+
+    # 读取文件内容
+    file_content = await file.read()
+
+    params = {
+        "use_det": use_det,
+        "use_cls": use_cls,
+        "use_rec": use_rec,
+        "text_score": text_score,
+        "box_thresh": box_thresh,
+        "unclip_ratio": unclip_ratio,
+        "return_word_box": return_word_box
+    }
+
+    async def compute():
+        pixels = estimate_image_pixels(file_content)
+        async with request_cancel_scope(http_request) as cancel_token, \
+                admit_request("image", pixels, cancel_token):
+            # 直接传递文件内容, 由服务层解码一次
+            return await run_inference(
+                process_ocr_request, file_content, **params, cancel_token=cancel_token
+            )
+
+    try:
+        results, total_time, image_size = await cached_ocr(file_content, params, compute)
+
         return OCRResponse(
             success=True,
             results=results,
@@ -61,22 +99,15 @@ async def upload_file(
             image_size=image_size
         )
 
+    except (HTTPException, OCRCancelledError):
+        raise
     except Exception as e:
         logger.exception(f"文件上传OCR错误: {str(e)}")
         raise HTTPException(500, f"File OCR processing error: {str(e)}")
 
 
-async def upload_file_pdf(
-    file: UploadFile = File(...),
-    use_det: bool = Form(True),
-    use_cls: bool = Form(True),
-    use_rec: bool = Form(True),
-    text_score: float = Form(0.5),
-    box_thresh: float = Form(0.5),
-    unclip_ratio: float = Form(1.6),
-    return_word_box: bool = Form(True)
-) -> OCRPDFResponse:
-    """PDF文件上传OCR端点"""
+def check_pdf_file(file: UploadFile):
+    """检查上传的PDF文件类型与大小"""
     # 检查文件类型
     if not file.content_type or file.content_type not in ["application/pdf", "image/pdf"]:
         raise HTTPException(
@@ -89,12 +120,203 @@ async def upload_file_pdf(
     if file.size and file.size > 1024 * 1024 * 1024 * 10:
         raise HTTPException(400, f"File too large. Max size: 10GB")
 
+
+def check_pdf_mode(mode: str):
+    """检查PDF处理模式"""
+    if mode not in PDF_MODES:
+        raise HTTPException(
+            400, f"Unsupported PDF mode: {mode}, expected one of {list(PDF_MODES)}"
+        )
+
+
+async def upload_file_pdf(
+    http_request: Request,
+    file: UploadFile = File(...),
+    use_det: bool = Form(True),
+    use_cls: bool = Form(True),
+    use_rec: bool = Form(True),
+    text_score: float = Form(0.5),
+    box_thresh: float = Form(0.5),
+    unclip_ratio: float = Form(1.6),
+    return_word_box: bool = Form(True),
+    mode: str = Form(PDF_DEFAULT_MODE)
+) -> OCRPDFResponse:
+    """
+    PDF文件上传OCR端点
+    mode=hybrid 时直接使用PDF文本层, 只识别没有文本覆盖的图片与没有文本层的页面
+    """
+    check_pdf_file(file)
+    check_pdf_mode(mode)
+
+    # 分块写入临时文件, 之后按路径逐页处理, 内存占用与文档大小无关
+    pdf_path = await run_in_threadpool(spool_pdf_upload, file.file)
+    try:
+        # 按页数与首页面积估算像素, PDF 单独限流排队, 不占用图片接口的配额
+        pdf_pixels = await run_in_threadpool(estimate_pdf_pixels, pdf_path)
+        async with request_cancel_scope(http_request) as cancel_token, \
+                admit_request("pdf", pdf_pixels, cancel_token):
+            try:
+                # 处理PDF OCR（按页码范围分片并行）
+                result_pages = await process_pdf_ocr_sharded(
+                    pdf_path,
+                    use_det,
+                    use_cls,
+                    use_rec,
+                    text_score,
+                    box_thresh,
+                    unclip_ratio,
+                    return_word_box,
+                    cancel_token=cancel_token,
+                    mode=mode
+                )
+
+                return OCRPDFResponse(
+                    success=True,
+                    results=result_pages
+                )
+            except OCRCancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"文件上传OCR错误: {str(e)}")
+                raise HTTPException(500, f"File OCR processing error: {str(e)}")
+    finally:
+        await run_in_threadpool(os.unlink, pdf_path)
+
+
+async def upload_file_pdf_stream(
+    http_request: Request,
+    file: UploadFile = File(...),
+    use_det: bool = Form(True),
+    use_cls: bool = Form(True),
+    use_rec: bool = Form(True),
+    text_score: float = Form(0.5),
+    box_thresh: float = Form(0.5),
+    unclip_ratio: float = Form(1.6),
+    return_word_box: bool = Form(True),
+    stream_format: str = Form("ndjson"),
+    mode: str = Form(PDF_DEFAULT_MODE)
+) -> StreamingResponse:
+    """
+    PDF文件上传OCR端点（流式）
+    每张图片识别完成后立即以 NDJSON 行或 SSE 事件返回, 服务端不保留完整结果列表
+    """
+    check_pdf_file(file)
+    check_pdf_mode(mode)
+    check_stream_format(stream_format)
+
+    # 准入在返回响应前完成, 以便繁忙时仍能返回 429; 许可与临时文件在流结束时释放
+    exit_stack = AsyncExitStack()
+    try:
+        # 分块写入临时文件, 之后按路径逐页提取
+        pdf_path = await run_in_threadpool(spool_pdf_upload, file.file)
+        exit_stack.callback(os.unlink, pdf_path)
+        pdf_pixels = await run_in_threadpool(estimate_pdf_pixels, pdf_path)
+        cancel_token = await exit_stack.enter_async_context(
+            request_cancel_scope(http_request)
+        )
+        await exit_stack.enter_async_context(
+            admit_request("pdf", pdf_pixels, cancel_token)
+        )
+    except BaseException:
+        await exit_stack.aclose()
+        raise
+
+    async def generate_results():
+        images = iter_pdf_items(pdf_path, mode)
+        image_results = PDFImageResults()
+        total = 0
+        try:
+            while True:
+                # 逐张提取图片, 提取与识别都不阻塞事件循环
+                image = await run_in_threadpool(next, images, None)
+                if image is None:
+                    break
+
+                # 文本层结果与重复图片无需识别
+                page_result = image_results.resolve(image)
+                if page_result is None:
+                    page_result = await run_inference(
+                        process_pdf_image_ocr,
+                        image,
+                        use_det,
+                        use_cls,
+                        use_rec,
+                        text_score,
+                        box_thresh,
+                        unclip_ratio,
+                        return_word_box,
+                        cancel_token=cancel_token
+                    )
+                    image_results.add(image, page_result)
+                total += 1
+                yield encode_stream_event(
+                    "result", OCRPDFResult(**page_result), stream_format
+                )
+
+            yield encode_stream_event(
+                "done", {"success": True, "done": True, "total": total}, stream_format
+            )
+        except Exception as e:
+            if isinstance(e, OCRCancelledError):
+                logger.warning(f"PDF流式OCR已取消: {str(e)}")
+            else:
+                logger.exception(f"PDF流式OCR错误: {str(e)}")
+            yield encode_stream_event(
+                "error",
+                {"success": False, "done": True, "total": total, "error": str(e)},
+                stream_format
+            )
+        finally:
+            # 取消发生在提取线程中时生成器仍在运行, 由线程结束后回收
+            if not images.gi_running:
+                images.close()
+            await exit_stack.aclose()
+
+    return StreamingResponse(
+        generate_results(),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def upload_file_frames_stream(
+    http_request: Request,
+    file: UploadFile = File(...),
+    use_det: bool = Form(True),
+    use_cls: bool = Form(True),
+    use_rec: bool = Form(True),
+    text_score: float = Form(0.5),
+    box_thresh: float = Form(0.5),
+    unclip_ratio: float = Form(1.6),
+    return_word_box: bool = Form(True),
+    stream_format: str = Form("ndjson")
+) -> StreamingResponse:
+    """
+    多页 TIFF / 动图上传OCR端点（流式）
+    逐帧解码, 多帧并行识别, 每帧结果按帧顺序以 NDJSON 行或 SSE 事件返回
+    """
+    check_image_file(file)
+    check_stream_format(stream_format)
+
+    # 读取文件内容
+    file_content = await file.read()
+
+    # 准入在返回响应前完成, 以便繁忙时仍能返回 429; 许可在流结束时释放
+    frames_pixels = await run_in_threadpool(estimate_frames_pixels, file_content)
+    exit_stack = AsyncExitStack()
     try:
-        # 读取PDF内容
-        file_content = await file.read()
-        
-        # 处理PDF OCR
-        result_pages = process_pdf_ocr(
+        cancel_token = await exit_stack.enter_async_context(
+            request_cancel_scope(http_request)
+        )
+        await exit_stack.enter_async_context(
+            admit_request("pdf", frames_pixels, cancel_token)
+        )
+    except BaseException:
+        await exit_stack.aclose()
+        raise
+
+    async def generate_results():
+        frame_results = iter_frames_ocr(
             file_content,
             use_det,
             use_cls,
@@ -102,14 +324,36 @@ async def upload_file_pdf(
             text_score,
             box_thresh,
             unclip_ratio,
-            return_word_box
+            return_word_box,
+            cancel_token=cancel_token
         )
+        total = 0
+        try:
+            async for frame_result in frame_results:
+                total += 1
+                yield encode_stream_event(
+                    "result", OCRFrameResult(**frame_result), stream_format
+                )
 
-        return OCRPDFResponse(
-            success=True,
-            results=result_pages
-        )
-    except Exception as e:
-        logger.exception(f"文件上传OCR错误: {str(e)}")
-        raise HTTPException(500, f"File OCR processing error: {str(e)}")
+            yield encode_stream_event(
+                "done", {"success": True, "done": True, "total": total}, stream_format
+            )
+        except Exception as e:
+            if isinstance(e, OCRCancelledError):
+                logger.warning(f"多帧图片流式OCR已取消: {str(e)}")
+            else:
+                logger.exception(f"多帧图片流式OCR错误: {str(e)}")
+            yield encode_stream_event(
+                "error",
+                {"success": False, "done": True, "total": total, "error": str(e)},
+                stream_format
+            )
+        finally:
+            await frame_results.aclose()
+            await exit_stack.aclose()
 
+    return StreamingResponse(
+        generate_results(),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -3,7 +3,7 @@ API 路由注册
 """
 from fastapi import APIRouter
 
-from app.api.endpoints import health, ocr, upload
+from app.api.endpoints import health, jobs, ocr, upload
 
 # 创建路由
 api_router = APIRouter()
@@ -14,13 +14,21 @@ api_router.add_api_route("/", health.root, methods=["GET"], tags=["health"])
 
 # 注册OCR路由
 api_router.add_api_route("/v1/ocr", ocr.ocr_endpoint_v1, methods=["POST"], tags=["ocr"])
+api_router.add_api_route("/v1/ocr/batch", ocr.ocr_batch_endpoint, methods=["POST"], tags=["ocr"])
 api_router.add_api_route("/ocr", ocr.ocr_endpoint, methods=["POST"], tags=["ocr"])
 api_router.add_api_route("/paddleocr", ocr.paddleocr_endpoint, methods=["POST"], tags=["ocr"])
 api_router.add_api_route("/easyocr", ocr.easyocr_endpoint, methods=["POST"], tags=["ocr"])
 api_router.add_api_route("/binary_ocr", ocr.binary_ocr_endpoint, methods=["POST"], tags=["ocr"])
 api_router.add_api_route("/fast_ocr", ocr.fast_ocr_endpoint, methods=["POST"], tags=["ocr"])
+api_router.add_api_route("/v1/ocr/shm", ocr.shm_ocr_endpoint, methods=["POST"], tags=["ocr"])
 
 # 注册文件上传路由
 api_router.add_api_route("/upload", upload.upload_file, methods=["POST"], tags=["upload"])
 api_router.add_api_route("/upload_pdf", upload.upload_file_pdf, methods=["POST"], tags=["upload"])
+api_router.add_api_route("/upload_pdf_stream", upload.upload_file_pdf_stream, methods=["POST"], tags=["upload"])
+api_router.add_api_route("/upload_frames_stream", upload.upload_file_frames_stream, methods=["POST"], tags=["upload"])
 
+# 注册异步任务路由
+api_router.add_api_route("/jobs", jobs.create_job, methods=["POST"], status_code=202, tags=["jobs"])
+api_router.add_api_route("/jobs/{job_id}", jobs.get_job, methods=["GET"], tags=["jobs"])
+api_router.add_api_route("/jobs/{job_id}/result", jobs.get_job_result, methods=["GET"], tags=["jobs"])
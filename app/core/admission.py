@@ -0,0 +1,317 @@
+"""
+准入控制
+
+按接口类别（fast / image / pdf）分别限制在途请求数与估算像素总量，
+超出限制的请求进入有界等待队列，队列已满或等待超时则返回 429，
+并根据实测的排空速率计算 Retry-After。
+
+各类别相互独立，大量 PDF 请求排队时不会影响 /fast_ocr 等轻量请求。
+"""
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from rapidocr_onnxruntime_run import CancelToken
+
+from app.core.config import (
+    ADMISSION_ENABLED, ADMISSION_MAX_WAIT_S, ADMISSION_RETRY_AFTER_MAX,
+    ADMISSION_FAST_MAX_IN_FLIGHT, ADMISSION_FAST_MAX_PIXELS, ADMISSION_FAST_MAX_QUEUE,
+    ADMISSION_IMAGE_MAX_IN_FLIGHT, ADMISSION_IMAGE_MAX_PIXELS, ADMISSION_IMAGE_MAX_QUEUE,
+    ADMISSION_PDF_MAX_IN_FLIGHT, ADMISSION_PDF_MAX_PIXELS, ADMISSION_PDF_MAX_QUEUE
+)
+
+logger = logging.getLogger(__name__)
+
+# 各接口所属的准入类别, 用于在读取请求体之前做容量预检
+ADMISSION_ROUTES = {
+    "/fast_ocr": "fast",
+    "/binary_ocr": "fast",
+    "/v1/ocr/shm": "fast",
+    "/ocr": "image",
+    "/v1/ocr": "image",
+    "/v1/ocr/batch": "image",
+    "/paddleocr": "image",
+    "/easyocr": "image",
+    "/upload": "image",
+    "/upload_pdf": "pdf",
+    "/upload_pdf_stream": "pdf",
+    "/upload_frames_stream": "pdf",
+}
+
+
+@dataclass(frozen=True)
+class AdmissionLimit:
+    """单个类别的准入限制"""
+    max_in_flight: int  # 最大在途请求数
+    max_pixels: int  # 在途请求估算像素总量上限
+    max_queue: int  # 最大排队请求数
+
+
+class AdmissionClass:
+    """单个接口类别的准入状态与排空速率统计"""
+
+    def __init__(self, name: str, limit: AdmissionLimit, ewma_alpha: float = 0.2):
+        self.name = name
+        self.limit = limit
+        self.ewma_alpha = ewma_alpha
+
+        self.in_flight = 0
+        self.in_flight_pixels = 0
+        self.waiting = 0
+        self.waiting_pixels = 0
+        self.receiving = 0  # 已通过预检、正在接收请求体的请求数
+        self.admitted = 0
+        self.rejected = 0
+
+        # 已完成请求的平均耗时（秒）与平均处理速率（像素/秒）
+        self.avg_duration: Optional[float] = None
+        self.avg_pixel_rate: Optional[float] = None
+
+        self._condition = asyncio.Condition()
+
+    def _fits(self, pixels: int) -> bool:
+        if self.in_flight >= self.limit.max_in_flight:
+            return False
+        # 单个超大请求在空闲时仍然放行, 避免永远无法被处理
+        return self.in_flight == 0 or self.in_flight_pixels + pixels <= self.limit.max_pixels
+
+    def _update_ewma(self, old: Optional[float], sample: float) -> float:
+        if old is None:
+            return sample
+        return self.ewma_alpha * sample + (1 - self.ewma_alpha) * old
+
+    def retry_after(self, pixels: int) -> int:
+        """根据实测排空速率估算需要等待的秒数"""
+        concurrency = max(self.in_flight, 1)
+        seconds = 1.0
+
+        # 请求数维度: 在途请求以 concurrency / avg_duration 的速率完成
+        excess_requests = self.in_flight + self.waiting + 1 - self.limit.max_in_flight
+        if excess_requests > 0 and self.avg_duration:
+            seconds = max(seconds, excess_requests * self.avg_duration / concurrency)
+
+        # 像素维度: 在途请求以 concurrency * avg_pixel_rate 的速率排空
+        excess_pixels = (
+            self.in_flight_pixels + self.waiting_pixels + pixels - self.limit.max_pixels
+        )
+        if excess_pixels > 0 and self.avg_pixel_rate:
+            seconds = max(seconds, excess_pixels / (self.avg_pixel_rate * concurrency))
+
+        return min(math.ceil(seconds), ADMISSION_RETRY_AFTER_MAX)
+
+    def _reject(self, pixels: int, reason: str) -> HTTPException:
+        self.rejected += 1
+        retry_after = self.retry_after(pixels)
+        logger.warning(
+            f"请求被拒绝 | 类别: {self.name} | 原因: {reason} | "
+            f"在途: {self.in_flight} | 排队: {self.waiting} | Retry-After: {retry_after}s"
+        )
+        return HTTPException(
+            429,
+            f"Server busy ({self.name}): {reason}, retry after {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    def reserve_body(self):
+        """
+        读取请求体之前的容量预检
+        在途、排队与正在接收请求体的请求数已达上限时直接拒绝, 繁忙时不再接收大文件上传
+        """
+        capacity = self.limit.max_in_flight + self.limit.max_queue
+        if self.in_flight + self.waiting + self.receiving >= capacity:
+            raise self._reject(0, "queue full")
+        self.receiving += 1
+
+    def release_body(self):
+        self.receiving -= 1
+
+    async def acquire(self, pixels: int, timeout: float):
+        """获取准入许可, 无法获取时抛出 429"""
+        async with self._condition:
+            if self.waiting == 0 and self._fits(pixels):
+                self._admit(pixels)
+                return
+
+            if self.waiting >= self.limit.max_queue:
+                raise self._reject(pixels, "queue full")
+
+            self.waiting += 1
+            self.waiting_pixels += pixels
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self._fits(pixels)), timeout
+                )
+            except asyncio.TimeoutError:
+                raise self._reject(pixels, "queue timeout")
+            finally:
+                self.waiting -= 1
+                self.waiting_pixels -= pixels
+
+            self._admit(pixels)
+
+    def _admit(self, pixels: int):
+        self.in_flight += 1
+        self.in_flight_pixels += pixels
+        self.admitted += 1
+
+    async def release(self, pixels: int, duration: float, completed: bool):
+        """释放准入许可, 并用成功完成的请求更新排空速率"""
+        async with self._condition:
+            self.in_flight -= 1
+            self.in_flight_pixels -= pixels
+
+            if completed and duration > 0:
+                self.avg_duration = self._update_ewma(self.avg_duration, duration)
+                self.avg_pixel_rate = self._update_ewma(
+                    self.avg_pixel_rate, pixels / duration
+                )
+
+            self._condition.notify_all()
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "in_flight_pixels": self.in_flight_pixels,
+            "waiting": self.waiting,
+            "receiving": self.receiving,
+            "max_in_flight": self.limit.max_in_flight,
+            "max_pixels": self.limit.max_pixels,
+            "max_queue": self.limit.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_duration": round(self.avg_duration, 4) if self.avg_duration else None,
+            "avg_pixel_rate": round(self.avg_pixel_rate) if self.avg_pixel_rate else None,
+        }
+
+
+class BodyReservation:
+    """预检通过后占用的容量, 请求进入准入或结束时释放（只释放一次）"""
+
+    def __init__(self, admission_class: AdmissionClass):
+        self.admission_class = admission_class
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.admission_class.release_body()
+
+
+_body_reservation: ContextVar[Optional[BodyReservation]] = ContextVar(
+    "admission_body_reservation", default=None
+)
+
+
+class AdmissionController:
+    """按接口类别管理准入"""
+
+    def __init__(self, limits: Dict[str, AdmissionLimit], max_wait_s: float):
+        self.max_wait_s = max_wait_s
+        self.classes = {
+            name: AdmissionClass(name, limit) for name, limit in limits.items()
+        }
+
+    @asynccontextmanager
+    async def admit(
+        self, class_name: str, pixels: int = 0, cancel_token: Optional[CancelToken] = None
+    ):
+        """准入上下文: 进入时获取许可, 退出时释放"""
+        admission_class = self.classes[class_name]
+        pixels = max(int(pixels), 0)
+
+        # 请求体已接收完毕, 预检占用的容量转为排队或在途
+        reservation = _body_reservation.get()
+        if reservation is not None and reservation.admission_class is admission_class:
+            reservation.release()
+
+        # 排队时间不超过请求剩余的截止时间
+        timeout = self.max_wait_s
+        if cancel_token is not None and cancel_token.remaining() is not None:
+            timeout = min(timeout, cancel_token.remaining())
+
+        await admission_class.acquire(pixels, timeout)
+        start_time = time.monotonic()
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            await admission_class.release(
+                pixels, time.monotonic() - start_time, completed
+            )
+
+    def stats(self) -> Dict:
+        return {name: c.stats() for name, c in self.classes.items()}
+
+
+admission_controller: Optional[AdmissionController] = None
+
+
+def create_admission_controller() -> Optional[AdmissionController]:
+    """按服务配置创建准入控制器（未启用时返回 None）"""
+    if not ADMISSION_ENABLED:
+        return None
+
+    return AdmissionController(
+        {
+            "fast": AdmissionLimit(
+                ADMISSION_FAST_MAX_IN_FLIGHT,
+                ADMISSION_FAST_MAX_PIXELS,
+                ADMISSION_FAST_MAX_QUEUE
+            ),
+            "image": AdmissionLimit(
+                ADMISSION_IMAGE_MAX_IN_FLIGHT,
+                ADMISSION_IMAGE_MAX_PIXELS,
+                ADMISSION_IMAGE_MAX_QUEUE
+            ),
+            "pdf": AdmissionLimit(
+                ADMISSION_PDF_MAX_IN_FLIGHT,
+                ADMISSION_PDF_MAX_PIXELS,
+                ADMISSION_PDF_MAX_QUEUE
+            ),
+        },
+        ADMISSION_MAX_WAIT_S
+    )
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """获取准入控制器实例"""
+    global admission_controller
+    return admission_controller
+
+
+@asynccontextmanager
+async def admit_request(
+    class_name: str, pixels: int = 0, cancel_token: Optional[CancelToken] = None
+):
+    """在接口中使用的准入上下文, 未启用准入控制时直接放行"""
+    controller = get_admission_controller()
+    if controller is None:
+        yield
+        return
+
+    async with controller.admit(class_name, pixels, cancel_token):
+        yield
+
+
+def reserve_request_body(path: str) -> Optional[BodyReservation]:
+    """
+    在读取请求体之前为接口所属类别占用容量, 容量已满时抛出 429
+    非 OCR 接口或未启用准入控制时返回 None
+    """
+    controller = get_admission_controller()
+    class_name = ADMISSION_ROUTES.get(path)
+    if controller is None or class_name is None:
+        return None
+
+    reservation = BodyReservation(controller.classes[class_name])
+    reservation.admission_class.reserve_body()
+    # 每个请求在独立的任务上下文中处理, 接口内的 admit_request 由此取得预检占用
+    _body_reservation.set(reservation)
+    return reservation
@@ -0,0 +1,66 @@
+"""
+请求截止时间与取消
+
+每个请求携带一个 CancelToken（截止时间 + 取消标志），随 OCR 参数传入模型，
+在 det / cls / rec 各阶段之间以及识别批次之间检查。
+客户端断开连接时由后台任务触发取消，超时或断开的请求不再占用计算资源。
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from rapidocr_onnxruntime_run import CancelToken
+
+from app.core.config import (
+    REQUEST_TIMEOUT_HEADER, DEFAULT_REQUEST_TIMEOUT_S, DISCONNECT_POLL_INTERVAL_S
+)
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_request_timeout(request: Request, timeout: Optional[float] = None) -> Optional[float]:
+    """确定请求的超时时间（秒）: 请求体字段 > 请求头 > 默认配置"""
+    if timeout is not None and timeout > 0:
+        return timeout
+
+    header_value = request.headers.get(REQUEST_TIMEOUT_HEADER)
+    if header_value:
+        try:
+            header_timeout = float(header_value)
+        except ValueError:
+            raise HTTPException(400, f"Invalid {REQUEST_TIMEOUT_HEADER} header: {header_value}")
+        if header_timeout > 0:
+            return header_timeout
+
+    if DEFAULT_REQUEST_TIMEOUT_S > 0:
+        return DEFAULT_REQUEST_TIMEOUT_S
+    return None
+
+
+async def _watch_disconnect(request: Request, cancel_token: CancelToken):
+    """轮询客户端连接状态, 断开或超时后触发取消"""
+    while not cancel_token.cancelled:
+        if await request.is_disconnected():
+            logger.warning(
+                f"客户端已断开, 取消OCR计算 | {request.method} {request.url.path}"
+            )
+            cancel_token.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL_S)
+
+
+@asynccontextmanager
+async def request_cancel_scope(request: Request, timeout: Optional[float] = None):
+    """
+    为请求创建 CancelToken, 并在请求处理期间监听客户端断开
+    退出时（包括请求任务被取消）触发取消, 让仍在执行器中运行的计算尽快停止
+    """
+    cancel_token = CancelToken.from_timeout(resolve_request_timeout(request, timeout))
+    watcher = asyncio.create_task(_watch_disconnect(request, cancel_token))
+    try:
+        yield cancel_token
+    finally:
+        watcher.cancel()
+        cancel_token.cancel()
@@ -11,10 +11,104 @@ ALLOWED_IMAGE_TYPES = [
     "image/png",
     "image/bmp",
     "image/tiff",
-    "image/webp"
+    "image/webp",
+    "image/gif"
 ]  # upload_file中使用
 
 # 模型预热配置
 WARMUP_ENABLED = os.getenv("OCR_WARMUP_ENABLED", "true").lower() == "true"
 WARMUP_IMAGE_PATH = os.getenv("OCR_WARMUP_IMAGE_PATH", None)
 
+
+# 模型路径配置（留空使用内置模型, 可指定 model_surgery 生成的 uint8 输入模型）
+DET_MODEL_PATH = os.getenv("OCR_DET_MODEL_PATH") or None
+CLS_MODEL_PATH = os.getenv("OCR_CLS_MODEL_PATH") or None
+REC_MODEL_PATH = os.getenv("OCR_REC_MODEL_PATH") or None
+
+
+# 推理执行器配置
+INFERENCE_EXECUTOR_TYPE = os.getenv("OCR_INFERENCE_EXECUTOR", "thread").lower()  # thread / process
+INFERENCE_WORKERS = int(os.getenv("OCR_INFERENCE_WORKERS", "1"))  # 推理池大小
+
+# 识别批处理调度配置（跨请求合并识别批次, 需配合 OCR_INFERENCE_WORKERS > 1）
+REC_BATCH_SCHEDULER = os.getenv("OCR_REC_BATCH_SCHEDULER", "false").lower() == "true"
+REC_BATCH_MAX_SIZE = int(os.getenv("OCR_REC_BATCH_MAX_SIZE", "32"))  # 单批最大文本框数
+REC_BATCH_MAX_WAIT_MS = float(os.getenv("OCR_REC_BATCH_MAX_WAIT_MS", "5"))  # 凑批最长等待时间
+
+# 文本框去重配置（相同的文本框只识别一次, 如表格中重复的 "0.00"、表头）
+REC_CROP_DEDUP = os.getenv("OCR_REC_CROP_DEDUP", "false").lower() == "true"
+REC_CROP_CACHE_SIZE = int(os.getenv("OCR_REC_CROP_CACHE_SIZE", "4096"))  # 跨请求缓存的识别结果数, 0 表示只在请求内去重
+
+# 检测批处理调度配置（按尺寸桶合并跨请求检测批次, 需配合 OCR_INFERENCE_WORKERS > 1）
+DET_BATCH_SCHEDULER = os.getenv("OCR_DET_BATCH_SCHEDULER", "false").lower() == "true"
+DET_BATCH_MAX_SIZE = int(os.getenv("OCR_DET_BATCH_MAX_SIZE", "4"))  # 单批最大图片数
+DET_BATCH_MAX_WAIT_MS = float(os.getenv("OCR_DET_BATCH_MAX_WAIT_MS", "5"))  # 凑批最长等待时间
+
+# 流水线配置（det/cls/rec 各一个工作线程, 通过有界队列串联, 需配合 OCR_INFERENCE_WORKERS > 1）
+PIPELINE_ENABLED = os.getenv("OCR_PIPELINE_ENABLED", "false").lower() == "true"
+PIPELINE_QUEUE_SIZE = int(os.getenv("OCR_PIPELINE_QUEUE_SIZE", "4"))  # 每个阶段的队列长度
+
+# 多进程部署配置（配合 gunicorn --preload, 在 fork 前把模型权重加载到共享内存）
+SHARED_WEIGHTS_ENABLED = os.getenv("OCR_SHARED_WEIGHTS", "false").lower() == "true"
+
+# 会话副本池配置（每个模型创建多个推理会话副本, 每个副本独占一部分CPU核）
+SESSION_REPLICAS = int(os.getenv("OCR_SESSION_REPLICAS", "1"))
+REPLICA_CPU_AFFINITY = os.getenv("OCR_REPLICA_CPU_AFFINITY", "false").lower() == "true"
+
+# 准入控制配置（按接口类别限制在途请求数与估算像素总量, 超限时排队, 队列满或超时返回 429）
+ADMISSION_ENABLED = os.getenv("OCR_ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_WAIT_S = float(os.getenv("OCR_ADMISSION_MAX_WAIT_S", "30"))  # 排队最长等待时间（秒）
+ADMISSION_RETRY_AFTER_MAX = int(os.getenv("OCR_ADMISSION_RETRY_AFTER_MAX", "60"))  # Retry-After 上限（秒）
+# /fast_ocr, /binary_ocr
+ADMISSION_FAST_MAX_IN_FLIGHT = int(os.getenv("OCR_ADMISSION_FAST_MAX_IN_FLIGHT", "32"))
+ADMISSION_FAST_MAX_PIXELS = int(os.getenv("OCR_ADMISSION_FAST_MAX_PIXELS", "134217728"))  # 128M像素
+ADMISSION_FAST_MAX_QUEUE = int(os.getenv("OCR_ADMISSION_FAST_MAX_QUEUE", "64"))
+# /ocr, /v1/ocr, /paddleocr, /easyocr, /upload
+ADMISSION_IMAGE_MAX_IN_FLIGHT = int(os.getenv("OCR_ADMISSION_IMAGE_MAX_IN_FLIGHT", "16"))
+ADMISSION_IMAGE_MAX_PIXELS = int(os.getenv("OCR_ADMISSION_IMAGE_MAX_PIXELS", "134217728"))  # 128M像素
+ADMISSION_IMAGE_MAX_QUEUE = int(os.getenv("OCR_ADMISSION_IMAGE_MAX_QUEUE", "32"))
+# /upload_pdf
+ADMISSION_PDF_MAX_IN_FLIGHT = int(os.getenv("OCR_ADMISSION_PDF_MAX_IN_FLIGHT", "2"))
+ADMISSION_PDF_MAX_PIXELS = int(os.getenv("OCR_ADMISSION_PDF_MAX_PIXELS", "268435456"))  # 256M像素
+ADMISSION_PDF_MAX_QUEUE = int(os.getenv("OCR_ADMISSION_PDF_MAX_QUEUE", "8"))
+
+# 请求截止时间配置（超时或客户端断开后停止后续 det/cls/rec 计算）
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"  # 请求头, 单位秒, 优先级低于 OCRRequest.timeout
+DEFAULT_REQUEST_TIMEOUT_S = float(os.getenv("OCR_DEFAULT_REQUEST_TIMEOUT_S", "0"))  # 默认截止时间, 0 表示不限制
+DISCONNECT_POLL_INTERVAL_S = float(os.getenv("OCR_DISCONNECT_POLL_INTERVAL_S", "0.5"))  # 客户端断开检测间隔
+
+# 异步任务配置（POST /jobs 提交文档后台处理, 任务状态与部分结果持久化到本地目录）
+JOBS_DIR = os.getenv("OCR_JOBS_DIR", "/app/uploads/jobs")  # 任务存储目录
+JOB_WORKERS = int(os.getenv("OCR_JOB_WORKERS", "1"))  # 同时处理的任务数
+JOB_RETENTION_HOURS = float(os.getenv("OCR_JOB_RETENTION_HOURS", "72"))  # 已结束任务保留时长, 0 表示永久保留
+JOB_LOCK_RETRY_S = float(os.getenv("OCR_JOB_LOCK_RETRY_S", "10"))  # 任务被其他进程处理时的重试间隔（秒）
+
+# 批量OCR配置（/v1/ocr/batch, 多张图片的文本框合并为共享的识别批次）
+BATCH_MAX_IMAGES = int(os.getenv("OCR_BATCH_MAX_IMAGES", "64"))  # 单次请求最大图片数（含zip内图片）
+BATCH_DECODE_WORKERS = int(os.getenv("OCR_BATCH_DECODE_WORKERS", "4"))  # 并行解码线程数
+
+# 缩小解码配置（超大图片在解码时按 1/2、1/4、1/8 缩小, 识别结果坐标仍对应原图）
+DECODE_MAX_SIDE_LEN = int(os.getenv("OCR_DECODE_MAX_SIDE_LEN", "2000"))  # 缩小解码的目标长边, 与模型 max_side_len 一致, 0 表示按原尺寸解码
+
+# 共享内存输入配置（/v1/ocr/shm, 同一主机上的客户端把图片写入 POSIX 共享内存, 只传段名与形状）
+SHM_INPUT_ENABLED = os.getenv("OCR_SHM_INPUT_ENABLED", "false").lower() == "true"  # 仅在 sidecar 部署中开启
+SHM_NAME_PREFIX = os.getenv("OCR_SHM_NAME_PREFIX", "ocr_")  # 允许读取的共享内存段名前缀
+
+# OCR结果缓存配置（按图片内容哈希与识别参数缓存结果, 重复请求不再推理）
+RESULT_CACHE_ENABLED = os.getenv("OCR_RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("OCR_RESULT_CACHE_MAX_ENTRIES", "1024"))  # 内存中最多缓存的结果数（LRU淘汰）
+RESULT_CACHE_TTL_S = float(os.getenv("OCR_RESULT_CACHE_TTL_S", "3600"))  # 缓存有效期（秒）, 0 表示不过期
+RESULT_CACHE_DIR = os.getenv("OCR_RESULT_CACHE_DIR", "")  # 磁盘缓存目录, 为空时只使用内存缓存
+
+# PDF处理配置
+PDF_DEFAULT_MODE = os.getenv("OCR_PDF_DEFAULT_MODE", "ocr").lower()  # ocr: 识别所有嵌入图片; hybrid: 优先使用PDF文本层, 只识别没有文本的区域
+PDF_RENDER_DPI = int(os.getenv("OCR_PDF_RENDER_DPI", "144"))  # 混合模式下没有文本层的页面整页渲染的DPI
+PDF_IMAGE_DEDUP = os.getenv("OCR_PDF_IMAGE_DEDUP", "true").lower() == "true"  # 同一文档中重复出现的图片（如页眉logo）只识别一次, 原始JPEG按图片对象、渲染图片按像素内容判断
+PDF_IMAGE_MIN_SIDE = float(os.getenv("OCR_PDF_IMAGE_MIN_SIDE", "0"))  # 图片在页面上的最短边小于该值（pt）时跳过, 0 表示不限制; 过大会漏掉单行文字图片
+PDF_IMAGE_MAX_ASPECT = float(os.getenv("OCR_PDF_IMAGE_MAX_ASPECT", "0"))  # 图片长宽比大于该值时跳过（分隔线等装饰图片）, 0 表示不限制; 过小会漏掉长条形的文字图片
+PDF_TEXT_COVER_RATIO = float(os.getenv("OCR_PDF_TEXT_COVER_RATIO", "0.5"))  # 混合模式下图片面积被文本行覆盖的比例达到该值时不再识别（可搜索的扫描件）; 过小会漏掉只有图注等少量文字与之重叠的图片
+PDF_PAGE_SHARDS = int(os.getenv("OCR_PDF_PAGE_SHARDS", "0"))  # /upload_pdf 按页码范围切分的分片数, 各分片在推理池中并行处理; 0 表示与 OCR_INFERENCE_WORKERS 一致
+PDF_TEMP_DIR = os.getenv("OCR_PDF_TEMP_DIR", "")  # 上传的PDF分块写入的临时目录, 为空时使用系统临时目录（应位于磁盘而非 tmpfs）
+
+# 多帧图片配置（/upload_frames_stream, 多页 TIFF 与动图逐帧识别）
+FRAME_MAX_IN_FLIGHT = int(os.getenv("OCR_FRAME_MAX_IN_FLIGHT", "0"))  # 同时识别的最大帧数, 0 表示与 OCR_INFERENCE_WORKERS 一致
@@ -69,3 +69,20 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors(), "body": body_info}
     )
 
+
+
+async def ocr_cancelled_handler(request: Request, exc: Exception):
+    """请求超过截止时间或客户端断开导致OCR计算被取消"""
+    logger.warning(
+        f"OCR计算已取消 | {request.method} {request.url.path} | "
+        f"IP: {request.client.host if request.client else 'unknown'} | "
+        f"原因: {str(exc)}"
+    )
+    return JSONResponse(
+        status_code=504,
+        content={
+            "error": "Gateway Timeout",
+            "message": f"OCR processing cancelled: {str(exc)}",
+            "path": request.url.path
+        }
+    )
@@ -0,0 +1,58 @@
+"""
+推理执行器
+
+所有 OCR 推理（图片解码、模型推理、结果构建）都提交到该执行器中运行，
+避免阻塞 asyncio 事件循环。
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def init_worker_model():
+    """进程池工作进程初始化：在子进程中加载独立的OCR模型"""
+    from app.core import lifespan
+
+    lifespan.ocr_model = lifespan.create_ocr_model()
+    lifespan.warmup_ocr_model(lifespan.ocr_model)
+    logger.info("Inference worker process OCR model loaded")
+
+
+def create_inference_executor(executor_type: str, max_workers: int) -> Executor:
+    """根据配置创建线程池或进程池"""
+    max_workers = max(1, max_workers)
+
+    if executor_type == "thread":
+        return ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="ocr-inference"
+        )
+
+    if executor_type == "process":
+        # 使用 spawn 避免 fork 已初始化的 ONNX Runtime 线程池
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker_model
+        )
+
+    raise ValueError(
+        f"Unsupported inference executor type: {executor_type}, "
+        f"expected 'thread' or 'process'"
+    )
+
+
+async def run_inference(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在推理执行器中运行同步函数并等待结果"""
+    from app.core.lifespan import get_inference_executor
+
+    executor = get_inference_executor()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(func, *args, **kwargs)
+    )
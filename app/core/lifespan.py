@@ -1,22 +1,36 @@
 """
 应用生命周期管理
 """
+import gc
 import os
 import time
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from rapidocr_onnxruntime_run import RapidOCR
+from rapidocr_onnxruntime_run import OCRPipeline, RapidOCR
 
 from app.core.config import (
-    WARMUP_ENABLED, WARMUP_IMAGE_PATH
+    WARMUP_ENABLED, WARMUP_IMAGE_PATH,
+    DET_MODEL_PATH, CLS_MODEL_PATH, REC_MODEL_PATH,
+    INFERENCE_EXECUTOR_TYPE, INFERENCE_WORKERS,
+    REC_BATCH_SCHEDULER, REC_BATCH_MAX_SIZE, REC_BATCH_MAX_WAIT_MS,
+    REC_CROP_DEDUP, REC_CROP_CACHE_SIZE,
+    DET_BATCH_SCHEDULER, DET_BATCH_MAX_SIZE, DET_BATCH_MAX_WAIT_MS,
+    PIPELINE_ENABLED, PIPELINE_QUEUE_SIZE,
+    SESSION_REPLICAS, REPLICA_CPU_AFFINITY,
+    JOBS_DIR, JOB_WORKERS, JOB_RETENTION_HOURS, JOB_LOCK_RETRY_S
 )
+from app.core.executor import create_inference_executor
+from app.core import admission
 
 logger = logging.getLogger(__name__)
 
 # 全局变量存储OCR模型
 ocr_model = None
 
+# 全局变量存储推理执行器
+inference_executor = None
+
 
 def get_ocr_model():
     """获取OCR模型实例"""
@@ -24,28 +38,121 @@ def get_ocr_model():
     return ocr_model
 
 
+def get_ocr_model_kwargs() -> dict:
+    """按服务配置生成创建 RapidOCR 的参数（结果缓存的模型指纹使用相同的参数）"""
+    return dict(
+        det_model_path=DET_MODEL_PATH,
+        cls_model_path=CLS_MODEL_PATH,
+        rec_model_path=REC_MODEL_PATH,
+        session_replicas=SESSION_REPLICAS,
+        replica_cpu_affinity=REPLICA_CPU_AFFINITY,
+        det_batch_scheduler=DET_BATCH_SCHEDULER,
+        det_batch_max_size=DET_BATCH_MAX_SIZE,
+        det_batch_max_wait_ms=DET_BATCH_MAX_WAIT_MS,
+        rec_batch_scheduler=REC_BATCH_SCHEDULER,
+        rec_batch_max_size=REC_BATCH_MAX_SIZE,
+        rec_batch_max_wait_ms=REC_BATCH_MAX_WAIT_MS,
+        rec_crop_dedup=REC_CROP_DEDUP,
+        rec_crop_cache_size=REC_CROP_CACHE_SIZE
+    )
+
+
+def create_ocr_model():
+    """按服务配置创建OCR模型实例（RapidOCR 或 OCRPipeline）"""
+    model = RapidOCR(**get_ocr_model_kwargs())
+    if PIPELINE_ENABLED:
+        return OCRPipeline(model, queue_size=PIPELINE_QUEUE_SIZE)
+    return model
+
+
+def warmup_ocr_model(model):
+    """使用预热图片执行一次识别"""
+    if not (WARMUP_ENABLED and WARMUP_IMAGE_PATH and os.path.exists(WARMUP_IMAGE_PATH)):
+        return
+
+    logger.info("Warming up OCR model...")
+    try:
+        model(WARMUP_IMAGE_PATH)
+        logger.info("Model warmup completed")
+    except Exception as e:
+        logger.warning(f"Model warmup failed: {str(e)}")
+
+
+def is_ocr_model_ready() -> bool:
+    """OCR模型是否可用（进程池模式下模型只在工作进程中加载）"""
+    if INFERENCE_EXECUTOR_TYPE == "process":
+        return inference_executor is not None
+    return ocr_model is not None
+
+
+def preload_shared_weights():
+    """在 gunicorn master 进程 fork 前加载共享模型权重"""
+    start_time = time.time()
+    RapidOCR.share_weights(
+        det_model_path=DET_MODEL_PATH,
+        cls_model_path=CLS_MODEL_PATH,
+        rec_model_path=REC_MODEL_PATH
+    )
+
+    # 冻结已有对象, 避免 worker 中的垃圾回收触发写时复制
+    gc.freeze()
+    logger.info(f"Shared model weights preloaded in {time.time() - start_time:.2f}s")
+
+
+def get_inference_executor():
+    """获取推理执行器实例"""
+    global inference_executor
+    return inference_executor
+
+
+async def start_job_manager():
+    """启动异步任务工作池, 任务目录不可用时仅禁用任务接口"""
+    from app.services import job_service
+
+    try:
+        store = job_service.JobStore(JOBS_DIR)
+    except OSError as e:
+        logger.warning(f"Job store unavailable, /jobs disabled | dir: {JOBS_DIR} | error: {str(e)}")
+        return
+
+    job_service.job_manager = job_service.JobManager(
+        store, JOB_WORKERS, JOB_RETENTION_HOURS, JOB_LOCK_RETRY_S
+    )
+    await job_service.job_manager.start()
+    logger.info(f"Job workers started | dir: {JOBS_DIR} | workers: {JOB_WORKERS}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    global ocr_model
+    global ocr_model, inference_executor
     
     logger.info("Initializing OCR model...")
     start_time = time.time()
     
     try:
 
-        ocr_model = RapidOCR()
+        # 进程池模式下推理只在工作进程中进行, 主进程不加载模型
+        if INFERENCE_EXECUTOR_TYPE != "process":
+            ocr_model = create_ocr_model()
+            warmup_ocr_model(ocr_model)
+            logger.info(f"OCR model loaded in {time.time() - start_time:.2f}s")
+
+        inference_executor = create_inference_executor(
+            INFERENCE_EXECUTOR_TYPE, INFERENCE_WORKERS
+        )
+        logger.info(
+            f"Inference executor started | type: {INFERENCE_EXECUTOR_TYPE} | "
+            f"workers: {INFERENCE_WORKERS}"
+        )
 
-        # 模型预热
-        if WARMUP_ENABLED and WARMUP_IMAGE_PATH and os.path.exists(WARMUP_IMAGE_PATH):
-            logger.info("Warming up OCR model...")
-            try:
-                ocr_model(WARMUP_IMAGE_PATH)
-                logger.info("Model warmup completed")
-            except Exception as e:
-                logger.warning(f"Model warmup failed: {str(e)}")
+        # 准入控制器需在事件循环内创建
+        admission.admission_controller = admission.create_admission_controller()
 
-        logger.info(f"OCR model loaded in {time.time() - start_time:.2f}s")
+        from app.services import cache_service
+        cache_service.result_cache = cache_service.create_result_cache()
+
+        await start_job_manager()
     except Exception as e:
         logger.exception(f"OCR model initialization failed: {str(e)}")
         raise
@@ -53,7 +160,23 @@ async def lifespan(app: FastAPI):
     yield
     
     # 清理资源
+    from app.services import cache_service, job_service
+
+    admission.admission_controller = None
+    cache_service.result_cache = None
+
+    if job_service.job_manager is not None:
+        await job_service.job_manager.stop()
+        job_service.job_manager = None
+        logger.info("Job workers stopped")
+
+    if inference_executor is not None:
+        inference_executor.shutdown(wait=True, cancel_futures=True)
+        inference_executor = None
+        logger.info("Inference executor shut down")
+
     if ocr_model is not None:
+        ocr_model.close()
         del ocr_model
         ocr_model = None
         logger.info("OCR model resources released")
@@ -3,7 +3,10 @@
 """
 import time
 import logging
-from fastapi import Request
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from app.core.admission import reserve_request_body
 
 logger = logging.getLogger(__name__)
 
@@ -42,3 +45,16 @@ async def log_requests_middleware(request: Request, call_next):
 
     return response
 
+
+async def admission_precheck_middleware(request: Request, call_next):
+    """在读取请求体之前检查准入容量, 服务繁忙时直接返回 429, 不再接收上传内容"""
+    try:
+        reservation = reserve_request_body(request.url.path)
+    except HTTPException as e:
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+
+    try:
+        return await call_next(request)
+    finally:
+        if reservation is not None:
+            reservation.release()
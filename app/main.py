@@ -4,14 +4,17 @@ FastAPI 应用主入口
 import logging
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
+from rapidocr_onnxruntime_run import OCRCancelledError
 
 from app.core.logging_config import setup_logging
-from app.core.lifespan import lifespan
-from app.core.middleware import log_requests_middleware
+from app.core.config import SHARED_WEIGHTS_ENABLED
+from app.core.lifespan import lifespan, preload_shared_weights
+from app.core.middleware import admission_precheck_middleware, log_requests_middleware
 from app.core.exceptions import (
     not_found_handler,
     global_exception_handler,
-    validation_exception_handler
+    validation_exception_handler,
+    ocr_cancelled_handler
 )
 from app.api.routes import api_router
 
@@ -19,6 +22,10 @@ from app.api.routes import api_router
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# 多进程部署: 在 fork 前加载共享模型权重
+if SHARED_WEIGHTS_ENABLED:
+    preload_shared_weights()
+
 # 创建 FastAPI 应用
 app = FastAPI(
     title="RapidOCR API Service",
@@ -27,13 +34,15 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# 注册中间件
+# 注册中间件（后注册的在外层, 被预检拒绝的请求同样记录日志）
+app.middleware("http")(admission_precheck_middleware)
 app.middleware("http")(log_requests_middleware)
 
 # 注册异常处理器
 app.add_exception_handler(404, not_found_handler)
 app.add_exception_handler(Exception, global_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
+app.add_exception_handler(OCRCancelledError, ocr_cancelled_handler)
 
 # 注册路由
 app.include_router(api_router)
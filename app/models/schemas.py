@@ -1,7 +1,7 @@
 """
 Pydantic 数据模型
 """
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -16,6 +16,23 @@ class OCRRequest(BaseModel):
     box_thresh: float = 0.5
     unclip_ratio: float = 1.6
     return_word_box: bool = False
+    timeout: Optional[float] = None  # 请求截止时间（秒）, 超时后停止计算, 未设置时使用 X-Request-Timeout 请求头
+
+
+class OCRShmRequest(BaseModel):
+    """共享内存 OCR 请求模型, 图片由同一主机上的客户端写入 POSIX 共享内存"""
+    shm_name: str  # 共享内存段名（multiprocessing.shared_memory.SharedMemory.name）
+    shape: List[int]  # 图片形状 [height, width] 或 [height, width, channels]
+    dtype: str = "uint8"
+    offset: int = 0  # 图片数据在共享内存段中的起始偏移（字节）
+    use_det: bool = True
+    use_cls: bool = True
+    use_rec: bool = True
+    text_score: float = 0.5
+    box_thresh: float = 0.5
+    unclip_ratio: float = 1.6
+    return_word_box: bool = False
+    timeout: Optional[float] = None  # 请求截止时间（秒）
 
 
 class OCRResult(BaseModel):
@@ -42,6 +59,7 @@ class OCRPDFResult(BaseModel):
     bbox_image: List[float]
     processing_time: float
     image_size: dict
+    source: str = "ocr"  # ocr: OCR识别结果; text: PDF文本层（坐标为页面坐标）
 
 
 class OCRPDFResponse(BaseModel):
@@ -50,6 +68,15 @@ class OCRPDFResponse(BaseModel):
     results: List[OCRPDFResult]
 
 
+# 多帧图片 OCR 模型
+class OCRFrameResult(BaseModel):
+    """多页 TIFF / 动图单帧 OCR 结果模型"""
+    frame: int  # 帧序号, 从1开始
+    result: List[OCRResult]
+    processing_time: float
+    image_size: dict
+
+
 # 兼容 PaddleOCR 的请求模型
 class PaddleOCRRequest(BaseModel):
     """PaddleOCR 兼容请求模型"""
@@ -81,3 +108,44 @@ class EasyOCRRequest(BaseModel):
     low_text: float = 0.4
     canvas_size: int = 2560
     mag_ratio: float = 1.0
+
+
+# 异步任务模型
+class JobStatusResponse(BaseModel):
+    """异步任务状态响应模型"""
+    job_id: str
+    status: str  # queued / running / succeeded / failed
+    filename: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    pages_total: Optional[int] = None
+    pages_done: int = 0
+    results_count: int = 0
+    progress: float = 0.0  # 0 ~ 1
+    error: Optional[str] = None
+
+
+class JobResultResponse(BaseModel):
+    """异步任务结果响应模型"""
+    job_id: str
+    status: str
+    success: bool
+    results: List[OCRPDFResult]
+    error: Optional[str] = None
+
+
+# 批量 OCR 模型
+class OCRBatchItemResult(BaseModel):
+    """批量 OCR 单张图片结果模型"""
+    success: bool
+    results: List[OCRResult] = []
+    image_size: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class OCRBatchResponse(BaseModel):
+    """批量 OCR 响应模型, 结果按图片名索引"""
+    success: bool
+    results: Dict[str, OCRBatchItemResult]
+    processing_time: float
@@ -0,0 +1,273 @@
+"""
+OCR 结果缓存服务
+
+以图片内容哈希与生效的识别参数作为键缓存OCR结果，重试、重复上传、相同模板的图片直接返回缓存结果，不再占用推理资源。
+内存中为带 TTL 的 LRU，可选的磁盘层在进程重启或被内存层淘汰后继续命中。
+缓存键同时包含模型与配置指纹（模型文件内容、det/cls/rec 配置、解码长边）, 更换模型或调整配置后旧结果不再命中。
+
+磁盘层目录结构:
+    {RESULT_CACHE_DIR}/{key[:2]}/{key}.json   {"expires_at": 过期时间, "value": 缓存结果}
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from rapidocr_onnxruntime_run import RapidOCR
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import (
+    DECODE_MAX_SIDE_LEN, PIPELINE_ENABLED, RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_S, RESULT_CACHE_DIR
+)
+from app.models.schemas import OCRResult
+
+logger = logging.getLogger(__name__)
+
+
+class OCRResultCache:
+    """内容寻址的OCR结果缓存（内存 LRU + 可选磁盘层）"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_s: float,
+        disk_dir: Optional[str] = None,
+        fingerprint: str = ""
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.fingerprint = fingerprint
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, image_data: Union[str, bytes], params: Dict[str, Any]) -> Optional[str]:
+        """
+        计算缓存键: 图片内容的 BLAKE2b 哈希 + 识别参数 + 模型与配置指纹
+        base64 图片按解码后的内容计算, 与上传同一文件命中相同的键; 无法解码时返回 None（不缓存）
+        """
+        if isinstance(image_data, str):
+            # 移除可能的data:image/xxx;base64,前缀
+            if ',' in image_data[:256]:
+                image_data = image_data.split(',', 1)[1]
+            try:
+                image_data = base64.b64decode(image_data)
+            except (binascii.Error, ValueError):
+                return None
+
+        digest = hashlib.blake2b(image_data, digest_size=16)
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        digest.update(self.fingerprint.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _expires_at(self) -> Optional[float]:
+        """过期时间, TTL 为 0 时永不过期"""
+        return time.time() + self.ttl_s if self.ttl_s > 0 else None
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """查询缓存, 内存未命中时查询磁盘层并回填内存"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, value, self._expires_at())
+        return value
+
+    def put(self, key: str, value: Dict):
+        expires_at = self._expires_at()
+        with self._lock:
+            self._memory_put(key, value, expires_at)
+        self._disk_put(key, value, expires_at)
+
+    def _memory_put(self, key: str, value: Dict, expires_at: Optional[float]):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[Dict]:
+        if self.disk_dir is None:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取磁盘缓存失败 | key: {key} | 错误: {str(e)}")
+            return None
+
+        if entry["expires_at"] is not None and entry["expires_at"] <= now:
+            path.unlink(missing_ok=True)
+            return None
+        return entry["value"]
+
+    def _disk_put(self, key: str, value: Dict, expires_at: Optional[float]):
+        """原子写入磁盘层, 写入失败只记录日志"""
+        if self.disk_dir is None:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入磁盘缓存失败 | key: {key} | 错误: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+
+    def cleanup(self) -> int:
+        """删除磁盘层中已过期的条目"""
+        if self.disk_dir is None or self.ttl_s <= 0:
+            return 0
+
+        expire_before = time.time() - self.ttl_s
+        removed = 0
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                if path.stat().st_mtime < expire_before:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "disk": self.disk_dir is not None,
+            "fingerprint": self.fingerprint,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+        }
+
+
+result_cache: Optional[OCRResultCache] = None
+
+
+def compute_model_fingerprint() -> str:
+    """
+    计算影响识别结果的模型与配置指纹
+    包含以 create_ocr_model 相同参数生成的 det/cls/rec 配置（模型路径、批处理调度等）、
+    各模型文件内容的哈希、流水线模式与解码长边
+    """
+    from app.core.lifespan import get_ocr_model_kwargs
+
+    config = RapidOCR.load_config(**get_ocr_model_kwargs())
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(f"{PIPELINE_ENABLED}:{DECODE_MAX_SIDE_LEN}".encode("utf-8"))
+
+    for module in ("Det", "Cls", "Rec"):
+        model_path = config[module]["model_path"]
+        try:
+            with open(model_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        except OSError as e:
+            logger.warning(f"读取模型文件失败, 指纹只包含路径 | path: {model_path} | 错误: {str(e)}")
+    return digest.hexdigest()
+
+
+def create_result_cache() -> Optional[OCRResultCache]:
+    """按服务配置创建结果缓存（未启用时返回 None, 磁盘目录不可用时只使用内存层）"""
+    if not RESULT_CACHE_ENABLED:
+        return None
+
+    fingerprint = compute_model_fingerprint()
+    try:
+        cache = OCRResultCache(
+            RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_S, RESULT_CACHE_DIR, fingerprint
+        )
+    except OSError as e:
+        logger.warning(
+            f"Result cache dir unavailable, memory only | dir: {RESULT_CACHE_DIR} | error: {str(e)}"
+        )
+        cache = OCRResultCache(
+            RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_S, fingerprint=fingerprint
+        )
+
+    removed = cache.cleanup()
+    if removed:
+        logger.info(f"已清理过期磁盘缓存 | 数量: {removed}")
+    return cache
+
+
+def get_result_cache() -> Optional[OCRResultCache]:
+    """获取结果缓存实例"""
+    global result_cache
+    return result_cache
+
+
+async def cached_ocr(
+    image_data: Union[str, bytes],
+    params: Dict[str, Any],
+    compute: Callable[[], Awaitable[Tuple[List[OCRResult], float, dict]]]
+) -> Tuple[List[OCRResult], float, dict]:
+    """
+    带缓存地执行OCR
+    命中时直接返回缓存结果（不经过准入控制与推理执行器）, 未命中时执行 compute 并写入缓存
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return await compute()
+
+    start_time = time.time()
+    key = await run_in_threadpool(cache.make_key, image_data, params)
+    if key is not None:
+        value = await run_in_threadpool(cache.get, key)
+        if value is not None:
+            total_time = time.time() - start_time
+            logger.info(f"OCR缓存命中 | key: {key} | 耗时: {total_time:.4f}s")
+            return [OCRResult(**r) for r in value["results"]], total_time, value["image_size"]
+
+    results, total_time, image_size = await compute()
+
+    if key is not None:
+        await run_in_threadpool(
+            cache.put,
+            key,
+            {"results": [r.model_dump() for r in results], "image_size": image_size}
+        )
+    return results, total_time, image_size
@@ -0,0 +1,120 @@
+"""
+多帧图片处理服务
+
+多页 TIFF（传真、扫描仪）与动图（GIF/WebP）逐帧解码后送入OCR，
+每帧识别完成后按帧顺序生成结果。解码在单独线程中顺序进行，识别在推理执行器中并行，
+同时在途的帧数不超过 FRAME_MAX_IN_FLIGHT，每个工作线程同一时刻只持有一帧解码后的图片。
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional
+
+import numpy as np
+from rapidocr_onnxruntime_run import CancelToken
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import FRAME_MAX_IN_FLIGHT, INFERENCE_WORKERS
+from app.core.executor import run_inference
+from app.utils.image_utils import get_image_frame_info, iter_image_frames
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_frames_pixels(image_data: bytes) -> int:
+    """按首帧尺寸与帧数估算需要处理的像素数（不解码图片）"""
+    n_frames, width, height = get_image_frame_info(image_data)
+    return n_frames * width * height
+
+
+def process_frame_ocr(
+    frame_no: int,
+    image: np.ndarray,
+    use_det: bool = True,
+    use_cls: bool = True,
+    use_rec: bool = True,
+    text_score: float = 0.5,
+    box_thresh: float = 0.5,
+    unclip_ratio: float = 1.6,
+    return_word_box: bool = False,
+    cancel_token: Optional[CancelToken] = None
+) -> Dict:
+    """识别单帧, 返回该帧的OCR结果"""
+    from app.services.ocr_service import process_ocr_request
+
+    # 每帧开始前检查截止时间与客户端断开
+    if cancel_token is not None:
+        cancel_token.check(f"frame {frame_no}")
+
+    results, total_time, image_size = process_ocr_request(
+        image,
+        use_det,
+        use_cls,
+        use_rec,
+        text_score,
+        box_thresh,
+        unclip_ratio,
+        return_word_box,
+        cancel_token
+    )
+
+    return {
+        "frame": frame_no,
+        "result": results,
+        "processing_time": total_time,
+        "image_size": image_size
+    }
+
+
+async def iter_frames_ocr(
+    image_data: bytes,
+    use_det: bool = True,
+    use_cls: bool = True,
+    use_rec: bool = True,
+    text_score: float = 0.5,
+    box_thresh: float = 0.5,
+    unclip_ratio: float = 1.6,
+    return_word_box: bool = False,
+    cancel_token: Optional[CancelToken] = None
+) -> AsyncIterator[Dict]:
+    """
+    逐帧解码并并行识别, 按帧顺序生成结果
+    最早提交的帧识别完成前, 最多再解码并提交 FRAME_MAX_IN_FLIGHT - 1 帧
+    """
+    max_in_flight = max(1, FRAME_MAX_IN_FLIGHT or INFERENCE_WORKERS)
+    frames = iter_image_frames(image_data)
+    pending: Deque[asyncio.Future] = deque()
+    frame_no = 0
+    try:
+        while True:
+            image = await run_in_threadpool(next, frames, None)
+            if image is not None:
+                frame_no += 1
+                pending.append(asyncio.ensure_future(run_inference(
+                    process_frame_ocr,
+                    frame_no,
+                    image,
+                    use_det,
+                    use_cls,
+                    use_rec,
+                    text_score,
+                    box_thresh,
+                    unclip_ratio,
+                    return_word_box,
+                    cancel_token=cancel_token
+                )))
+                # 释放本地引用, 解码后的帧只由识别任务持有
+                del image
+                if len(pending) < max_in_flight:
+                    continue
+
+            if not pending:
+                break
+            yield await pending.popleft()
+    finally:
+        # 出错或客户端断开时不再等待其余帧, 由 CancelToken 停止仍在运行的识别
+        for future in pending:
+            future.cancel()
+        # 取消发生在解码线程中时生成器仍在运行, 由线程结束后回收
+        if not frames.gi_running:
+            frames.close()
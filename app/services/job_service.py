@@ -0,0 +1,396 @@
+"""
+异步任务服务
+
+POST /jobs 提交的文档先保存到本地任务目录并立即返回任务ID，
+由后台工作协程逐张图片识别，每张图片的结果追加写入 results.ndjson，任务状态写入 job.json。
+服务重启后未完成的任务从已完成的位置继续处理，吞吐量不再依赖客户端连接的生命周期。
+
+目录结构:
+    {JOBS_DIR}/{job_id}/job.json         任务状态、OCR参数与PDF处理模式
+    {JOBS_DIR}/{job_id}/input.pdf        上传的文档
+    {JOBS_DIR}/{job_id}/results.ndjson   已完成的结果, 每行一个 OCRPDFResult
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台
+    fcntl = None
+
+from rapidocr_onnxruntime_run import CancelToken
+from starlette.concurrency import run_in_threadpool
+
+from app.core.executor import run_inference
+from app.models.schemas import OCRPDFResult
+from app.services.pdf_service import (
+    PDFImageResults, get_pdf_page_count, iter_pdf_items, process_pdf_image_ocr
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+JOB_FINISHED_STATUSES = {JOB_STATUS_SUCCEEDED, JOB_STATUS_FAILED}
+
+_JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class JobStore:
+    """基于本地目录的任务存储"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_valid_id(job_id: str) -> bool:
+        return bool(_JOB_ID_PATTERN.match(job_id))
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def input_path(self, job_id: str) -> Path:
+        return self.job_dir(job_id) / "input.pdf"
+
+    def results_path(self, job_id: str) -> Path:
+        return self.job_dir(job_id) / "results.ndjson"
+
+    def create(
+        self, source: BinaryIO, filename: Optional[str], params: Dict[str, Any], mode: str = "ocr"
+    ) -> Dict:
+        """创建任务: 分块复制上传文件到任务目录, 不把整个文档读入内存"""
+        job_id = uuid.uuid4().hex
+        job_dir = self.job_dir(job_id)
+        job_dir.mkdir(parents=True)
+
+        source.seek(0)
+        with open(self.input_path(job_id), "wb") as f:
+            shutil.copyfileobj(source, f, _COPY_CHUNK_SIZE)
+        self.results_path(job_id).touch()
+
+        job = {
+            "job_id": job_id,
+            "status": JOB_STATUS_QUEUED,
+            "filename": filename,
+            "params": params,
+            "mode": mode,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "pages_total": None,
+            "pages_done": 0,
+            "results_count": 0,
+            "error": None,
+        }
+        self.save(job)
+        return job
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        if not self.is_valid_id(job_id):
+            return None
+        try:
+            with open(self.job_dir(job_id) / "job.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, job: Dict):
+        """原子写入任务状态"""
+        job_file = self.job_dir(job["job_id"]) / "job.json"
+        tmp_file = job_file.with_suffix(".json.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_file, job_file)
+
+    def update(self, job_id: str, **changes: Any) -> Dict:
+        with self._lock:
+            job = self.load(job_id)
+            job.update(changes)
+            self.save(job)
+            return job
+
+    def append_result(self, job_id: str, result_json: str, pages_done: int) -> Dict:
+        """追加一条结果并落盘, 随后更新任务进度"""
+        with open(self.results_path(job_id), "a", encoding="utf-8") as f:
+            f.write(result_json + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self._lock:
+            job = self.load(job_id)
+            job["results_count"] += 1
+            job["pages_done"] = max(job["pages_done"], pages_done)
+            self.save(job)
+            return job
+
+    def try_lock(self, job_id: str) -> Optional[int]:
+        """
+        尝试独占任务（多个 gunicorn worker 共享任务目录时避免重复处理）
+        成功返回锁文件描述符, 任务已被其他进程处理时返回 None; 进程退出时锁自动释放
+        """
+        fd = os.open(self.job_dir(job_id) / "job.lock", os.O_CREAT | os.O_RDWR)
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+        return fd
+
+    @staticmethod
+    def unlock(fd: int):
+        os.close(fd)
+
+    def recover_results(self, job_id: str) -> int:
+        """截断末尾未写完的行, 返回已完整写入的结果数"""
+        results_path = self.results_path(job_id)
+        with open(results_path, "rb+") as f:
+            data = f.read()
+            valid_size = data.rfind(b"\n") + 1
+            if valid_size != len(data):
+                f.truncate(valid_size)
+        return data[:valid_size].count(b"\n")
+
+    def iter_results(self, job_id: str) -> Iterator[Dict]:
+        with open(self.results_path(job_id), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+
+    def list_jobs(self) -> List[Dict]:
+        jobs = []
+        for job_dir in self.root.iterdir():
+            job = self.load(job_dir.name)
+            if job is not None:
+                jobs.append(job)
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    def cleanup(self, retention_hours: float) -> int:
+        """删除超过保留时长的已结束任务"""
+        if retention_hours <= 0:
+            return 0
+
+        expire_before = time.time() - retention_hours * 3600
+        removed = 0
+        for job in self.list_jobs():
+            if (
+                job["status"] in JOB_FINISHED_STATUSES
+                and (job["finished_at"] or job["created_at"]) < expire_before
+            ):
+                shutil.rmtree(self.job_dir(job["job_id"]), ignore_errors=True)
+                removed += 1
+        return removed
+
+
+class JobManager:
+    """后台任务工作池: 从队列中取出任务, 逐张图片识别并持久化结果"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = 1,
+        retention_hours: float = 0,
+        lock_retry_s: float = 10
+    ):
+        self.store = store
+        self.workers = max(1, workers)
+        self.retention_hours = retention_hours
+        self.lock_retry_s = lock_retry_s
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._cancel_tokens: Dict[str, CancelToken] = {}
+        self._retry_handles: Dict[str, asyncio.TimerHandle] = {}
+
+    async def start(self):
+        """启动工作协程, 并重新排队上次未完成的任务"""
+        removed = await run_in_threadpool(self.store.cleanup, self.retention_hours)
+        if removed:
+            logger.info(f"已清理过期任务 | 数量: {removed}")
+
+        jobs = await run_in_threadpool(self.store.list_jobs)
+        for job in jobs:
+            if job["status"] not in JOB_FINISHED_STATUSES:
+                logger.info(f"恢复未完成任务 | job_id: {job['job_id']} | 状态: {job['status']}")
+                self._queue.put_nowait(job["job_id"])
+
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"ocr-job-worker-{i}"))
+
+    async def stop(self):
+        """停止工作协程, 正在运行的任务保持未完成状态, 下次启动时继续"""
+        for cancel_token in self._cancel_tokens.values():
+            cancel_token.cancel()
+        for handle in self._retry_handles.values():
+            handle.cancel()
+        self._retry_handles.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self, source: BinaryIO, filename: Optional[str], params: Dict[str, Any], mode: str = "ocr"
+    ) -> Dict:
+        """保存文档并排队, 立即返回任务信息"""
+        job = await run_in_threadpool(self.store.create, source, filename, params, mode)
+        self._queue.put_nowait(job["job_id"])
+        logger.info(f"任务已提交 | job_id: {job['job_id']} | 文件: {filename}")
+        return job
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"任务处理异常 | job_id: {job_id} | 错误: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _requeue_later(self, job_id: str):
+        """稍后重新排队, 持有锁的进程退出后由本进程接手未完成的任务"""
+        def requeue():
+            self._retry_handles.pop(job_id, None)
+            self._queue.put_nowait(job_id)
+
+        if job_id not in self._retry_handles:
+            loop = asyncio.get_running_loop()
+            self._retry_handles[job_id] = loop.call_later(self.lock_retry_s, requeue)
+
+    async def _run_job(self, job_id: str):
+        lock_fd = await run_in_threadpool(self.store.try_lock, job_id)
+        if lock_fd is None:
+            logger.info(f"任务正由其他进程处理, 稍后重试 | job_id: {job_id}")
+            self._requeue_later(job_id)
+            return
+
+        try:
+            await self._process_job(job_id)
+        finally:
+            self.store.unlock(lock_fd)
+
+    async def _process_job(self, job_id: str):
+        job = await run_in_threadpool(self.store.load, job_id)
+        if job is None or job["status"] in JOB_FINISHED_STATUSES:
+            return
+
+        input_path = str(self.store.input_path(job_id))
+        completed = await run_in_threadpool(self.store.recover_results, job_id)
+        pages_total = await run_in_threadpool(get_pdf_page_count, input_path)
+        await run_in_threadpool(
+            self.store.update,
+            job_id,
+            status=JOB_STATUS_RUNNING,
+            started_at=job["started_at"] or time.time(),
+            pages_total=pages_total,
+            results_count=completed,
+        )
+        logger.info(
+            f"任务开始处理 | job_id: {job_id} | 页数: {pages_total} | 已完成结果: {completed}"
+        )
+
+        cancel_token = CancelToken()
+        self._cancel_tokens[job_id] = cancel_token
+        # 旧版本创建的任务没有 mode 字段
+        images = iter_pdf_items(input_path, job.get("mode", "ocr"))
+        image_results = PDFImageResults()
+        # 结果文件与待处理项一一对应, 恢复时用于回填已识别图片的结果
+        stored_results = self.store.iter_results(job_id)
+        try:
+            image_no = 0
+            while True:
+                image = await run_in_threadpool(next, images, None)
+                if image is None:
+                    break
+
+                # 跳过重启前已经完成的图片
+                image_no += 1
+                if image_no <= completed:
+                    stored_result = await run_in_threadpool(next, stored_results, None)
+                    if stored_result is not None:
+                        image_results.add(image, stored_result)
+                        continue
+
+                    # 结果文件中的行数少于记录的结果数, 以实际写入的结果为准, 从这里继续识别
+                    completed = image_no - 1
+                    logger.warning(
+                        f"任务结果文件不完整, 从第 {image_no} 项继续 | job_id: {job_id}"
+                    )
+                    await run_in_threadpool(
+                        self.store.update, job_id, results_count=completed
+                    )
+
+                # 文本层结果与重复图片无需识别
+                page_result = image_results.resolve(image)
+                if page_result is None:
+                    page_result = await run_inference(
+                        process_pdf_image_ocr, image, **job["params"], cancel_token=cancel_token
+                    )
+                    image_results.add(image, page_result)
+                await run_in_threadpool(
+                    self.store.append_result,
+                    job_id,
+                    OCRPDFResult(**page_result).model_dump_json(),
+                    image["page"],
+                )
+
+            job = await run_in_threadpool(
+                self.store.update,
+                job_id,
+                status=JOB_STATUS_SUCCEEDED,
+                finished_at=time.time(),
+                pages_done=pages_total,
+            )
+            logger.info(
+                f"任务完成 | job_id: {job_id} | 结果数: {job['results_count']} | "
+                f"耗时: {job['finished_at'] - job['started_at']:.3f}s"
+            )
+        except asyncio.CancelledError:
+            # 服务关闭: 保持 running 状态, 下次启动时继续
+            raise
+        except Exception as e:
+            if cancel_token.cancelled:
+                return
+            logger.exception(f"任务失败 | job_id: {job_id} | 错误: {str(e)}")
+            await run_in_threadpool(
+                self.store.update,
+                job_id,
+                status=JOB_STATUS_FAILED,
+                finished_at=time.time(),
+                error=str(e),
+            )
+        finally:
+            # 取消发生在提取线程中时生成器仍在运行, 由线程结束后回收
+            if not images.gi_running:
+                images.close()
+            stored_results.close()
+            self._cancel_tokens.pop(job_id, None)
+
+
+job_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> Optional[JobManager]:
+    """获取任务管理器实例（任务目录不可用时为 None）"""
+    global job_manager
+    return job_manager
@@ -3,19 +3,44 @@ OCR 业务逻辑服务
 """
 import time
 import logging
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 import numpy as np
 from fastapi import HTTPException
+from rapidocr_onnxruntime_run import CancelToken, OCRCancelledError
 
+from app.core.config import BATCH_DECODE_WORKERS, DECODE_MAX_SIDE_LEN
 from app.core.lifespan import get_ocr_model
 from app.models.schemas import OCRResult
-from app.utils.image_utils import decode_base64_image
+from app.utils.image_utils import decode_image_reduced, scale_bbox
+from app.utils.shm_utils import open_shared_image
 
 logger = logging.getLogger(__name__)
 
+# 批量OCR的图片解码线程池（在推理执行器所在进程中按需创建）
+decode_executor: Optional[ThreadPoolExecutor] = None
 
-def process_ocr_result(ocr_result, return_word_box: bool = False) -> List[OCRResult]:
-    """处理OCR结果"""
+
+def get_decode_executor() -> ThreadPoolExecutor:
+    """获取图片解码线程池"""
+    global decode_executor
+    if decode_executor is None:
+        decode_executor = ThreadPoolExecutor(
+            max_workers=max(1, BATCH_DECODE_WORKERS),
+            thread_name_prefix="ocr-decode"
+        )
+    return decode_executor
+
+
+def process_ocr_result(
+    ocr_result,
+    return_word_box: bool = False,
+    image_scale: Tuple[float, float] = (1.0, 1.0)
+) -> List[OCRResult]:
+    """
+    处理OCR结果
+    image_scale 为原图与识别所用图片的宽高比例（缩小解码时大于1）, 坐标按该比例映射回原图
+    """
     if (
         ocr_result is None
         or not isinstance(ocr_result, (list, tuple))
@@ -30,6 +55,8 @@ def process_ocr_result(ocr_result, return_word_box: bool = False) -> List[OCRRes
             bbox = item[0]  # 边界框坐标
             text = item[1]  # 识别的文本
             confidence = item[2]  # 置信度
+            if image_scale != (1.0, 1.0):
+                bbox = scale_bbox(bbox, *image_scale)
 
             results.append(OCRResult(
                 text=text,
@@ -40,17 +67,26 @@ def process_ocr_result(ocr_result, return_word_box: bool = False) -> List[OCRRes
     return results
 
 
+def get_image_scale(image: np.ndarray, image_size: dict) -> Tuple[float, float]:
+    """原图与解码后图片的宽高比例"""
+    return image_size["width"] / image.shape[1], image_size["height"] / image.shape[0]
+
+
 def process_ocr_request(
-    image_base64: str,
+    image_data: Union[str, bytes, np.ndarray],
     use_det: bool = True,
     use_cls: bool = True,
     use_rec: bool = True,
     text_score: float = 0.5,
     box_thresh: float = 0.5,
     unclip_ratio: float = 1.6,
-    return_word_box: bool = True
+    return_word_box: bool = True,
+    cancel_token: Optional[CancelToken] = None
 ) -> Tuple[List[OCRResult], float, dict]:
-    """处理OCR请求的通用函数"""
+    """
+    处理OCR请求的通用函数
+    image_data 可以是base64字符串、图片文件内容或BGR数组, 只解码一次
+    """
     start_time = time.time()
     ocr_model = get_ocr_model()
 
@@ -58,9 +94,9 @@ def process_ocr_request(
         raise HTTPException(500, "OCR model not initialized")
 
     try:
-        # 解码图片
-        image = decode_base64_image(image_base64)
-        image_size = {"width": image.shape[1], "height": image.shape[0]}
+        # 解码图片, 超大图片直接按缩小后的尺寸解码
+        image, image_size = decode_image_reduced(image_data, DECODE_MAX_SIDE_LEN)
+        image_scale = get_image_scale(image, image_size)
 
         # 执行OCR
         ocr_result = ocr_model(
@@ -71,11 +107,12 @@ def process_ocr_request(
             text_score=text_score,
             box_thresh=box_thresh,
             unclip_ratio=unclip_ratio,
-            return_word_box=return_word_box
+            return_word_box=return_word_box,
+            cancel_token=cancel_token
         )
 
         # 处理结果
-        results = process_ocr_result(ocr_result, return_word_box)
+        results = process_ocr_result(ocr_result, return_word_box, image_scale)
 
         total_time = time.time() - start_time
         logger.info(
@@ -86,6 +123,8 @@ def process_ocr_request(
 
         return results, total_time, image_size
 
+    except OCRCancelledError:
+        raise
     except Exception as e:
         logger.exception(f"OCR处理错误: {str(e)}")
         raise HTTPException(500, f"OCR processing error: {str(e)}")
@@ -94,7 +133,8 @@ def process_ocr_request(
 def process_binary_ocr(
     image_bytes: bytes,
     height: int,
-    width: int
+    width: int,
+    cancel_token: Optional[CancelToken] = None
 ) -> Tuple[List[OCRResult], float, dict]:
     """处理二进制OCR请求"""
     start_time = time.time()
@@ -108,7 +148,7 @@ def process_binary_ocr(
         img_array = np.frombuffer(image_bytes, dtype=np.uint8).reshape(height, width, 3)
 
         # 执行OCR
-        ocr_result = ocr_model(img_array)
+        ocr_result = ocr_model(img_array, cancel_token=cancel_token)
 
         # 处理结果
         results = process_ocr_result(ocr_result)
@@ -121,7 +161,194 @@ def process_binary_ocr(
 
         return results, total_time, {"width": width, "height": height}
 
+    except OCRCancelledError:
+        raise
     except Exception as e:
         logger.exception(f"Binary OCR处理错误: {str(e)}")
         raise HTTPException(500, f"Binary OCR processing error: {str(e)}")
 
+
+
+def process_fast_ocr(
+    image_bytes: bytes,
+    height: int,
+    width: int,
+    use_det: bool = True,
+    use_cls: bool = True,
+    use_rec: bool = True,
+    text_score: float = 0.5,
+    box_thresh: float = 0.5,
+    unclip_ratio: float = 1.6,
+    return_word_box: bool = False,
+    cancel_token: Optional[CancelToken] = None
+) -> Tuple[List[OCRResult], float, dict]:
+    """处理快速OCR请求（原始BGR数据 + 业务参数）"""
+    start_time = time.time()
+    ocr_model = get_ocr_model()
+
+    if ocr_model is None:
+        raise HTTPException(500, "OCR model not initialized")
+
+    try:
+        # 使用调用方式
+        img_array = np.frombuffer(image_bytes, dtype=np.uint8).reshape(height, width, 3)
+
+        # 执行OCR
+        ocr_result = ocr_model(
+            img_array,
+            use_det=use_det,
+            use_cls=use_cls,
+            use_rec=use_rec,
+            text_score=text_score,
+            box_thresh=box_thresh,
+            unclip_ratio=unclip_ratio,
+            return_word_box=return_word_box,
+            cancel_token=cancel_token
+        )
+
+        # 处理结果
+        results = process_ocr_result(ocr_result, return_word_box)
+        total_time = time.time() - start_time
+
+        logger.info(
+            f"Fast OCR完成 | 耗时: {total_time:.3f}s | "
+            f"图片尺寸: {width}x{height} | 识别文本数: {len(results)}"
+        )
+
+        return results, total_time, {"width": width, "height": height}
+
+    except OCRCancelledError:
+        raise
+    except Exception as e:
+        logger.exception(f"Fast OCR处理错误: {str(e)}")
+        raise HTTPException(500, f"Fast OCR processing error: {str(e)}")
+
+
+def process_shm_ocr(
+    shm_name: str,
+    shape: List[int],
+    dtype: str = "uint8",
+    offset: int = 0,
+    use_det: bool = True,
+    use_cls: bool = True,
+    use_rec: bool = True,
+    text_score: float = 0.5,
+    box_thresh: float = 0.5,
+    unclip_ratio: float = 1.6,
+    return_word_box: bool = False,
+    cancel_token: Optional[CancelToken] = None
+) -> Tuple[List[OCRResult], float, dict]:
+    """
+    处理共享内存OCR请求
+    在推理执行器中按段名打开共享内存, 直接在其上识别, 图片数据不复制
+    """
+    start_time = time.time()
+    ocr_model = get_ocr_model()
+
+    if ocr_model is None:
+        raise HTTPException(500, "OCR model not initialized")
+
+    with open_shared_image(shm_name, shape, dtype, offset) as img_array:
+        image_size = {"width": img_array.shape[1], "height": img_array.shape[0]}
+
+        # 执行OCR
+        ocr_result = ocr_model(
+            img_array,
+            use_det=use_det,
+            use_cls=use_cls,
+            use_rec=use_rec,
+            text_score=text_score,
+            box_thresh=box_thresh,
+            unclip_ratio=unclip_ratio,
+            return_word_box=return_word_box,
+            cancel_token=cancel_token
+        )
+        # 释放视图, 退出时才能关闭共享内存映射
+        del img_array
+
+    # 处理结果
+    results = process_ocr_result(ocr_result, return_word_box)
+    total_time = time.time() - start_time
+
+    logger.info(
+        f"Shm OCR完成 | 耗时: {total_time:.3f}s | 段名: {shm_name} | "
+        f"图片尺寸: {image_size['width']}x{image_size['height']} | 识别文本数: {len(results)}"
+    )
+
+    return results, total_time, image_size
+
+
+def process_batch_ocr(
+    images: List[Tuple[str, bytes]],
+    use_det: bool = True,
+    use_cls: bool = True,
+    use_rec: bool = True,
+    text_score: float = 0.5,
+    box_thresh: float = 0.5,
+    unclip_ratio: float = 1.6,
+    return_word_box: bool = False,
+    cancel_token: Optional[CancelToken] = None
+) -> Tuple[Dict[str, dict], float]:
+    """
+    处理批量OCR请求
+    并行解码所有图片, 所有图片的文本框合并为共享的分类/识别批次, 结果按图片名返回
+    """
+    start_time = time.time()
+    ocr_model = get_ocr_model()
+
+    if ocr_model is None:
+        raise HTTPException(500, "OCR model not initialized")
+
+    def decode(image_data: bytes):
+        try:
+            return decode_image_reduced(image_data, DECODE_MAX_SIDE_LEN), None
+        except HTTPException as e:
+            return None, e.detail
+
+    # 并行解码（PIL/OpenCV 解码时释放GIL）, 超大图片按缩小后的尺寸解码
+    decoded = list(get_decode_executor().map(decode, [data for _, data in images]))
+
+    results: Dict[str, dict] = {}
+    valid_names, valid_images = [], []
+    valid_sizes = []
+    for (name, _), (decoded_image, error) in zip(images, decoded):
+        if decoded_image is None:
+            results[name] = {"success": False, "error": error}
+            continue
+        image, image_size = decoded_image
+        valid_names.append(name)
+        valid_images.append(image)
+        valid_sizes.append(image_size)
+
+    # 执行OCR
+    ocr_results = ocr_model.ocr_batch(
+        valid_images,
+        use_det=use_det,
+        use_cls=use_cls,
+        use_rec=use_rec,
+        text_score=text_score,
+        box_thresh=box_thresh,
+        unclip_ratio=unclip_ratio,
+        return_word_box=return_word_box,
+        cancel_token=cancel_token
+    )
+
+    for name, image, image_size, ocr_result in zip(
+        valid_names, valid_images, valid_sizes, ocr_results
+    ):
+        results[name] = {
+            "success": True,
+            "results": process_ocr_result(
+                ocr_result, return_word_box, get_image_scale(image, image_size)
+            ),
+            "image_size": image_size
+        }
+
+    total_time = time.time() - start_time
+    logger.info(
+        f"Batch OCR完成 | 耗时: {total_time:.3f}s | 图片数: {len(images)} | "
+        f"解码失败: {len(images) - len(valid_images)}"
+    )
+
+    # 按请求中的顺序返回
+    return {name: results[name] for name, _ in images}, total_time
@@ -1,109 +1,571 @@
 """
 PDF 处理服务
 """
+import asyncio
+import hashlib
 import logging
-import base64
-from typing import List, Dict
+import os
+import shutil
+import tempfile
+import time
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from rapidocr_onnxruntime_run import CancelToken
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import (
+    INFERENCE_WORKERS, PDF_RENDER_DPI, PDF_IMAGE_DEDUP, PDF_IMAGE_MIN_SIDE,
+    PDF_IMAGE_MAX_ASPECT, PDF_TEXT_COVER_RATIO, PDF_PAGE_SHARDS, PDF_TEMP_DIR
+)
+from app.core.executor import run_inference
+from app.utils.image_utils import pixmap_to_bgr
+from app.models.schemas import OCRResult
+
+# PDF处理模式
+PDF_MODES = ("ocr", "hybrid")
+
+_COPY_CHUNK_SIZE = 1024 * 1024
 
 logger = logging.getLogger(__name__)
 
 
-def extract_images_from_pdf_bytes(pdf_bytes: bytes) -> List[Dict]:
+def open_pdf(pdf_source: Union[bytes, str]):
+    """打开PDF, pdf_source 为PDF内容或PDF文件路径"""
+    import fitz
+    if isinstance(pdf_source, bytes):
+        return fitz.open(stream=pdf_source, filetype="pdf")
+    return fitz.open(pdf_source)
+
+
+def get_pixmap_key(pix) -> str:
     """
-    从PDF中提取图片
-    返回格式: [{"page": 1, "image": bytes, "bbox": (x0, y0, x1, y1), "index": 0}]
+    渲染图片的去重键: 像素内容哈希 + 尺寸
+    渲染结果包含叠加在图片上的文字等页面内容, 只有渲染出的像素完全相同时才复用识别结果
     """
-    images = []
-    try:
+    digest = hashlib.blake2b(pix.samples_mv, digest_size=16)
+    return f"pix:{digest.hexdigest()}:{pix.width}x{pix.height}"
+
+
+def is_trivial_image(bbox) -> bool:
+    """过小的图标或细长的分隔线不需要识别"""
+    width, height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    short_side, long_side = min(width, height), max(width, height)
+    if short_side < PDF_IMAGE_MIN_SIDE or short_side <= 0:
+        return True
+    return PDF_IMAGE_MAX_ASPECT > 0 and long_side / short_side > PDF_IMAGE_MAX_ASPECT
+
+
+def text_cover_ratio(bbox, text_bboxes: Sequence) -> float:
+    """图片区域被文本行覆盖的面积比例（文本行之间一般不重叠, 按交集面积之和计算）"""
+    x0, y0, x1, y1 = bbox
+    area = (x1 - x0) * (y1 - y0)
+    if area <= 0:
+        return 0.0
+
+    covered = 0.0
+    for tx0, ty0, tx1, ty1 in text_bboxes:
+        width = min(x1, tx1) - max(x0, tx0)
+        height = min(y1, ty1) - max(y0, ty0)
+        if width > 0 and height > 0:
+            covered += width * height
+    return min(1.0, covered / area)
+
+
+def is_upright(transform) -> bool:
+    """图片在页面上未旋转、未翻转（只有缩放与平移）"""
+    a, b, c, d = transform[:4]
+    return abs(b) < 1e-6 and abs(c) < 1e-6 and a > 0 and d > 0
+
+
+def extract_native_jpeg(doc, xref: int) -> Optional[bytes]:
+    """
+    直接取出以JPEG（DCTDecode）存储的图片对象, 按原始分辨率交给识别时只解码一次
+    带透明蒙版、Decode 反相或非 RGB/灰度 的图片需要渲染, 返回 None
+    """
+    if doc.xref_get_key(xref, "Filter") != ("name", "/DCTDecode"):
+        return None
+    if any(doc.xref_get_key(xref, key)[0] != "null" for key in ("SMask", "Mask", "Decode")):
+        return None
+
+    image = doc.extract_image(xref)
+    if not image or image["ext"] != "jpeg" or image["colorspace"] not in (1, 3):
+        return None
+    return image["image"]
+
+
+class PDFImageExtractor:
+    """
+    逐页提取PDF中的图片, 在同一文档内记录已提取的图片（去重）与可直接取出的JPEG图片对象
+    未旋转的JPEG图片直接取出原始数据（按 xref 去重）; 其他图片按显示尺寸渲染为像素图（按像素内容去重）,
+    在像素图内存上创建视图并转换为BGR数组, 不经过PNG编解码
+    """
+
+    def __init__(self, dedup: bool = PDF_IMAGE_DEDUP):
+        self.seen_keys: Optional[Set[str]] = set() if dedup else None
+        self._native_xrefs: Dict[int, bool] = {}
+
+    def iter_page_images(self, page, page_num: int, text_bboxes: Sequence = ()) -> Iterator[Dict]:
+        """
+        提取单页中的图片, 跳过过小、细长以及大部分面积已被 text_bboxes 中文本行覆盖的图片
+        开启去重时已经提取过的图片不再提取, 生成不含 "image" 的重复项
+        """
         import fitz
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
 
-        for page_num in range(len(doc)):
-            page = doc[page_num]
+        try:
+            # 获取页面上的所有图片信息
+            image_list = page.get_image_info(xrefs=True)
+        except Exception as e:
+            logger.error(f"处理页面 {page_num + 1} 时出错: {str(e)}")
+            return
+
+        for i, img_info in enumerate(image_list):
             try:
-                # 获取页面上的所有图片信息
-                image_list = page.get_image_info()
-
-                for i, img_info in enumerate(image_list):
-                    try:
-                        # 获取图片边界框
-                        bbox = img_info["bbox"]
-
-                        # 检查bbox是否有效
-                        if not bbox or len(bbox) != 4:
-                            logger.warning(f"页面 {page_num + 1} 图片 {i} bbox无效: {bbox}")
-                            continue
-
-                        # 提取图片数据
-                        pix = page.get_pixmap(matrix=fitz.Identity, clip=bbox)
-                        img_data = pix.tobytes("png")
-
-                        images.append({
-                            "page": page_num + 1,
-                            "image": img_data,
-                            "bbox": bbox,
-                            "index": i
-                        })
-                        logger.info(f"成功提取页面 {page_num + 1} 图片 {i}")
-
-                    except Exception as e:
-                        logger.warning(f"页面 {page_num + 1} 图片 {i} 提取失败: {str(e)}")
-                        continue
+                # 获取图片边界框
+                bbox = img_info["bbox"]
+
+                # 检查bbox是否有效
+                if not bbox or len(bbox) != 4:
+                    logger.warning(f"页面 {page_num + 1} 图片 {i} bbox无效: {bbox}")
+                    continue
+
+                if is_trivial_image(bbox):
+                    logger.debug(f"跳过页面 {page_num + 1} 图片 {i}: 尺寸 {bbox}")
+                    continue
+
+                if text_bboxes and text_cover_ratio(bbox, text_bboxes) >= PDF_TEXT_COVER_RATIO:
+                    logger.debug(f"跳过页面 {page_num + 1} 图片 {i}: 已被文本层覆盖")
+                    continue
+
+                # 每个图片对象只检查一次能否直接取出
+                xref = img_info["xref"]
+                img_data = None
+                native = (
+                    xref > 0
+                    and is_upright(img_info["transform"])
+                    and self._native_xrefs.get(xref, True)
+                )
+                if native and xref not in self._native_xrefs:
+                    img_data = extract_native_jpeg(page.parent, xref)
+                    native = self._native_xrefs[xref] = img_data is not None
+
+                # 原始图片与显示尺寸、页面上叠加的内容无关, 按 xref 去重;
+                # 渲染的图片包含叠加内容, 渲染后按像素内容去重
+                key = None
+                pix = None
+                if native:
+                    if self.seen_keys is not None:
+                        key = f"xref:{xref}"
+                else:
+                    pix = page.get_pixmap(
+                        matrix=fitz.Identity, clip=bbox, colorspace=fitz.csRGB, alpha=False
+                    )
+                    if self.seen_keys is not None:
+                        key = get_pixmap_key(pix)
+                if key is not None and key in self.seen_keys:
+                    yield {"page": page_num + 1, "bbox": bbox, "index": i, "key": key}
+                    continue
+
+                # 提取图片数据
+                if pix is not None:
+                    img_data = pixmap_to_bgr(pix)
+                elif img_data is None:
+                    img_data = page.parent.extract_image(xref)["image"]
+                logger.info(f"成功提取页面 {page_num + 1} 图片 {i}")
 
             except Exception as e:
-                logger.error(f"处理页面 {page_num + 1} 时出错: {str(e)}")
+                logger.warning(f"页面 {page_num + 1} 图片 {i} 提取失败: {str(e)}")
                 continue
 
+            if key is not None:
+                self.seen_keys.add(key)
+            yield {
+                "page": page_num + 1,
+                "image": img_data,
+                "bbox": bbox,
+                "index": i,
+                "key": key
+            }
+
+
+def get_page_numbers(doc, page_range: Optional[Tuple[int, int]] = None) -> range:
+    """页码范围 [start, end)（从0开始）, 超出文档页数的部分忽略"""
+    if page_range is None:
+        return range(len(doc))
+    return range(max(0, page_range[0]), min(len(doc), page_range[1]))
+
+
+def split_page_ranges(page_count: int, shards: int) -> List[Tuple[int, int]]:
+    """把页码均匀切分为最多 shards 个连续范围"""
+    shards = max(1, min(shards, page_count))
+    size, remainder = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for i in range(shards):
+        end = start + size + (1 if i < remainder else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def iter_images_from_pdf(
+    pdf_source: Union[bytes, str], page_range: Optional[Tuple[int, int]] = None
+) -> Iterator[Dict]:
+    """
+    逐页从PDF中提取图片（惰性生成, 不在内存中保留全部图片）
+    开启 PDF_IMAGE_DEDUP 时重复出现的图片只提取一次, 之后生成不含 "image" 的重复项
+    pdf_source 为PDF内容或PDF文件路径, page_range 为页码范围 [start, end)
+    生成格式: {"page": 1, "image": JPEG数据或BGR数组, "bbox": (x0, y0, x1, y1), "index": 0, "key": 去重键}
+    重复项格式: {"page": 2, "bbox": (x0, y0, x1, y1), "index": 0, "key": 去重键}
+    """
+    try:
+        doc = open_pdf(pdf_source)
+    except Exception as e:
+        logger.exception(f"iter_images_from_pdf error: {str(e)}")
+        return
+
+    extractor = PDFImageExtractor()
+    try:
+        for page_num in get_page_numbers(doc, page_range):
+            yield from extractor.iter_page_images(doc[page_num], page_num)
+    finally:
         doc.close()
+
+
+def extract_text_lines(page) -> List[OCRResult]:
+    """从PDF文本层提取文本行, 坐标为页面坐标（点）"""
+    import fitz
+
+    lines = []
+    text_dict = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
+    for block in text_dict["blocks"]:
+        if block.get("type") != 0:
+            continue
+        for line in block["lines"]:
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if not text:
+                continue
+            x0, y0, x1, y1 = line["bbox"]
+            lines.append(OCRResult(
+                text=text,
+                confidence=1.0,
+                bbox=[[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+            ))
+    return lines
+
+
+def iter_hybrid_items_from_pdf(
+    pdf_source: Union[bytes, str], page_range: Optional[Tuple[int, int]] = None
+) -> Iterator[Dict]:
+    """
+    混合模式逐页生成待处理项
+    有文本层的页面: 先生成文本层结果（已完成, 不需要OCR）, 再生成未被文本层覆盖的图片;
+    没有文本层的页面（扫描件、文字转曲）: 按 PDF_RENDER_DPI 渲染整页后OCR
+    文本层结果格式: {"page": 1, "index": -1, "result": [OCRResult], "bbox_image": 页面区域,
+                     "processing_time": 0.001, "image_size": 页面尺寸, "source": "text"}
+    """
+    import fitz
+
+    try:
+        doc = open_pdf(pdf_source)
     except Exception as e:
-        logger.exception(f"extract_images_from_pdf_bytes error: {str(e)}")
-    
-    return images
+        logger.exception(f"iter_hybrid_items_from_pdf error: {str(e)}")
+        return
 
+    extractor = PDFImageExtractor()
+    try:
+        for page_num in get_page_numbers(doc, page_range):
+            page = doc[page_num]
+            start_time = time.time()
+            try:
+                lines = extract_text_lines(page)
+            except Exception as e:
+                logger.warning(f"页面 {page_num + 1} 文本层提取失败: {str(e)}")
+                lines = []
 
-def process_pdf_ocr(
-    pdf_bytes: bytes,
+            page_bbox = tuple(page.rect)
+            if not lines:
+                pix = page.get_pixmap(dpi=PDF_RENDER_DPI, colorspace=fitz.csRGB, alpha=False)
+                yield {
+                    "page": page_num + 1,
+                    "image": pixmap_to_bgr(pix),
+                    "bbox": page_bbox,
+                    "index": -1
+                }
+                continue
+
+            yield {
+                "page": page_num + 1,
+                "index": -1,
+                "result": lines,
+                "bbox_image": page_bbox,
+                "processing_time": time.time() - start_time,
+                "image_size": {"width": page.rect.width, "height": page.rect.height},
+                "source": "text"
+            }
+
+            # 大部分面积已被文本层覆盖的图片（如可搜索的扫描件）不再识别
+            text_bboxes = [(*line.bbox[0], *line.bbox[2]) for line in lines]
+            yield from extractor.iter_page_images(page, page_num, text_bboxes)
+    finally:
+        doc.close()
+
+
+def iter_pdf_items(
+    pdf_source: Union[bytes, str],
+    mode: str = "ocr",
+    page_range: Optional[Tuple[int, int]] = None
+) -> Iterator[Dict]:
+    """
+    按模式逐项生成PDF待处理项
+    ocr: 识别所有嵌入图片; hybrid: 直接使用文本层, 只识别没有文本覆盖的图片与没有文本层的页面
+    """
+    if mode == "hybrid":
+        return iter_hybrid_items_from_pdf(pdf_source, page_range)
+    return iter_images_from_pdf(pdf_source, page_range)
+
+
+class PDFImageResults:
+    """同一文档中已识别图片的结果, 重复出现的图片直接复制结果"""
+
+    def __init__(self):
+        self._results: Dict[str, Dict] = {}
+
+    def resolve(self, item: Dict) -> Optional[Dict]:
+        """返回无需识别的结果（文本层结果、重复图片）, 需要OCR时返回 None"""
+        if "result" in item:
+            return item
+        if "image" in item:
+            return None
+
+        result = self._results[item["key"]]
+        return {
+            **result,
+            "page": item["page"],
+            "index": item["index"],
+            "bbox_image": item["bbox"],
+            "processing_time": 0.0
+        }
+
+    def add(self, item: Dict, result: Dict):
+        if item.get("key") is not None and "image" in item:
+            self._results[item["key"]] = result
+
+
+def extract_images_from_pdf_bytes(pdf_bytes: bytes) -> List[Dict]:
+    """
+    从PDF中提取图片
+    返回格式: [{"page": 1, "image": JPEG数据或BGR数组, "bbox": (x0, y0, x1, y1), "index": 0, "key": 去重键}]
+    重复出现的图片不含 "image"
+    """
+    return list(iter_images_from_pdf(pdf_bytes))
+
+
+def spool_pdf_upload(source: BinaryIO) -> str:
+    """
+    分块复制上传的PDF到临时文件, 返回文件路径（由调用方删除）
+    之后按路径打开文档, 不把整个文档读入内存
+    """
+    source.seek(0)
+    with tempfile.NamedTemporaryFile(
+        suffix=".pdf", dir=PDF_TEMP_DIR or None, delete=False
+    ) as f:
+        try:
+            shutil.copyfileobj(source, f, _COPY_CHUNK_SIZE)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+    return f.name
+
+
+def get_pdf_page_count(pdf_source: Union[bytes, str]) -> int:
+    """获取PDF页数"""
+    with open_pdf(pdf_source) as doc:
+        return len(doc)
+
+
+def estimate_pdf_pixels(pdf_source: Union[bytes, str]) -> int:
+    """按页数与首页面积估算PDF需要处理的像素数（只加载首页, 不渲染页面）"""
+    try:
+        with open_pdf(pdf_source) as doc:
+            if doc.page_count == 0:
+                return 0
+            rect = doc[0].rect
+            return int(doc.page_count * rect.width * rect.height)
+    except Exception as e:
+        logger.warning(f"estimate_pdf_pixels error: {str(e)}")
+        if isinstance(pdf_source, bytes):
+            return len(pdf_source)
+        return os.path.getsize(pdf_source)
+
+
+def process_pdf_image_ocr(
+    image: Dict,
     use_det: bool = True,
     use_cls: bool = True,
     use_rec: bool = True,
     text_score: float = 0.5,
     box_thresh: float = 0.5,
     unclip_ratio: float = 1.6,
-    return_word_box: bool = False
-) -> List[Dict]:
+    return_word_box: bool = False,
+    cancel_token: Optional[CancelToken] = None
+) -> Dict:
+    """处理PDF中提取出的单张图片, 返回该图片的OCR结果"""
+    from app.services.ocr_service import process_ocr_request
+
+    # 每张图片开始前检查截止时间与客户端断开
+    if cancel_token is not None:
+        cancel_token.check(f"page {image['page']} image {image['index']}")
+
+    # 直接使用提取出的图片数据, 不经过base64编解码
+    results, total_time, image_size = process_ocr_request(
+        image['image'],
+        use_det,
+        use_cls,
+        use_rec,
+        text_score,
+        box_thresh,
+        unclip_ratio,
+        return_word_box,
+        cancel_token
+    )
+
+    return {
+        "page": image['page'],
+        "index": image['index'],
+        "result": results,
+        "bbox_image": image['bbox'],
+        "processing_time": total_time,
+        "image_size": image_size,
+        "source": "ocr"
+    }
+
+
+def iter_pdf_ocr(
+    pdf_source: Union[bytes, str],
+    use_det: bool = True,
+    use_cls: bool = True,
+    use_rec: bool = True,
+    text_score: float = 0.5,
+    box_thresh: float = 0.5,
+    unclip_ratio: float = 1.6,
+    return_word_box: bool = False,
+    cancel_token: Optional[CancelToken] = None,
+    mode: str = "ocr",
+    page_range: Optional[Tuple[int, int]] = None
+) -> Iterator[Dict]:
     """
-    处理PDF OCR
-    返回每页的OCR结果
+    流式处理PDF OCR
+    每张图片识别完成后立即生成其结果, 不保留完整结果列表; 文本层结果与重复图片直接生成
     """
-    from app.services.ocr_service import process_ocr_request
-    
-    images = extract_images_from_pdf_bytes(pdf_bytes)
-    result_pages = []
-    
-    for image in images:
-        # 将图片数据编码为base64
-        image_base64 = base64.b64encode(image['image']).decode('utf-8')
-
-        # 处理OCR
-        results, total_time, image_size = process_ocr_request(
-            image_base64,
+    image_results = PDFImageResults()
+    for item in iter_pdf_items(pdf_source, mode, page_range):
+        page_result = image_results.resolve(item)
+        if page_result is not None:
+            yield page_result
+            continue
+
+        page_result = process_pdf_image_ocr(
+            item,
             use_det,
             use_cls,
             use_rec,
             text_score,
             box_thresh,
             unclip_ratio,
-            return_word_box
+            return_word_box,
+            cancel_token
         )
+        image_results.add(item, page_result)
+        yield page_result
+
+
+def process_pdf_ocr(
+    pdf_source: Union[bytes, str],
+    use_det: bool = True,
+    use_cls: bool = True,
+    use_rec: bool = True,
+    text_score: float = 0.5,
+    box_thresh: float = 0.5,
+    unclip_ratio: float = 1.6,
+    return_word_box: bool = False,
+    cancel_token: Optional[CancelToken] = None,
+    mode: str = "ocr",
+    page_range: Optional[Tuple[int, int]] = None
+) -> List[Dict]:
+    """
+    处理PDF OCR
+    返回每页的OCR结果, page_range 为页码范围 [start, end)
+    """
+    return list(iter_pdf_ocr(
+        pdf_source,
+        use_det,
+        use_cls,
+        use_rec,
+        text_score,
+        box_thresh,
+        unclip_ratio,
+        return_word_box,
+        cancel_token,
+        mode,
+        page_range
+    ))
 
-        result_pages.append({
-            "page": image['page'],
-            "index": image['index'],
-            "result": results,
-            "bbox_image": image['bbox'],
-            "processing_time": total_time,
-            "image_size": image_size
-        })
-    
-    return result_pages
 
+async def process_pdf_ocr_sharded(
+    pdf_path: str,
+    use_det: bool = True,
+    use_cls: bool = True,
+    use_rec: bool = True,
+    text_score: float = 0.5,
+    box_thresh: float = 0.5,
+    unclip_ratio: float = 1.6,
+    return_word_box: bool = False,
+    cancel_token: Optional[CancelToken] = None,
+    mode: str = "ocr"
+) -> List[Dict]:
+    """
+    按页码范围分片并行处理PDF OCR
+    各分片在推理执行器中按路径打开文档、独立提取与识别, 结果按页码顺序合并
+    分片数为 PDF_PAGE_SHARDS（0 表示与推理池大小一致）, 只有一个分片或无法读取页数时直接处理
+    任一分片失败时取消其余分片
+    """
+    shards = PDF_PAGE_SHARDS or INFERENCE_WORKERS
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    params = dict(
+        use_det=use_det,
+        use_cls=use_cls,
+        use_rec=use_rec,
+        text_score=text_score,
+        box_thresh=box_thresh,
+        unclip_ratio=unclip_ratio,
+        return_word_box=return_word_box,
+        cancel_token=cancel_token,
+        mode=mode
+    )
+    try:
+        page_count = await run_in_threadpool(get_pdf_page_count, pdf_path)
+    except Exception as e:
+        logger.warning(f"读取PDF页数失败, 不分片处理 | 错误: {str(e)}")
+        page_count = 0
+
+    page_ranges = split_page_ranges(page_count, shards)
+    if len(page_ranges) <= 1:
+        return await run_inference(process_pdf_ocr, pdf_path, **params)
+
+    logger.info(f"PDF分片并行处理 | 页数: {page_count} | 分片: {page_ranges}")
+    tasks = [
+        asyncio.ensure_future(
+            run_inference(process_pdf_ocr, pdf_path, **params, page_range=page_range)
+        )
+        for page_range in page_ranges
+    ]
+    try:
+        shard_results = await asyncio.gather(*tasks)
+    except BaseException:
+        # 正在执行的分片在下一张图片前检查取消标记, 尚未开始的分片直接取消
+        cancel_token.cancel()
+        for task in tasks:
+            task.cancel()
+        raise
+    return [page_result for results in shard_results for page_result in results]
@@ -3,28 +3,221 @@
 """
 import base64
 import io
+import math
+import zipfile
+from typing import Dict, Iterator, List, Tuple, Union
 import numpy as np
 import cv2
-from PIL import Image
+from PIL import Image, ImageSequence
 from fastapi import HTTPException
 
+# zip 压缩包中作为图片读取的文件扩展名
+ZIP_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+
+# OpenCV 缩小解码的标志（JPEG 在DCT阶段直接缩放, 不产生原尺寸的中间数组）
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def get_reduce_factor(width: int, height: int, max_side_len: int) -> int:
+    """缩小解码的倍数: 缩小后长边仍不小于 max_side_len, 检测输入的分辨率不变"""
+    if max_side_len <= 0:
+        return 1
+    for factor in (8, 4, 2):
+        if max(width, height) >= max_side_len * factor:
+            return factor
+    return 1
+
+
+def decode_image_bytes(image_data: Union[bytes, memoryview], reduce_factor: int = 1) -> np.ndarray:
+    """
+    解码图片文件内容为BGR数组
+    直接在原始字节上解码（np.frombuffer 不复制）, OpenCV 不支持的格式回退到 PIL
+    reduce_factor 大于1时按该倍数缩小解码
+    """
+    image = cv2.imdecode(
+        np.frombuffer(image_data, dtype=np.uint8),
+        REDUCED_DECODE_FLAGS[reduce_factor] | cv2.IMREAD_IGNORE_ORIENTATION
+    )
+    if image is not None:
+        return image
+
+    image = Image.open(io.BytesIO(image_data))
+    if reduce_factor > 1:
+        # 仅对 JPEG 生效, 其他格式按原尺寸解码
+        width, height = image.size
+        image.draft(
+            image.mode, (math.ceil(width / reduce_factor), math.ceil(height / reduce_factor))
+        )
+
+    # 转换为OpenCV格式
+    return pil_to_bgr(image)
+
+
+def pil_to_bgr(image: Image.Image) -> np.ndarray:
+    """PIL 图片转换为BGR数组"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+
+
+def iter_image_frames(image_data: bytes) -> Iterator[np.ndarray]:
+    """
+    逐帧解码多页 TIFF、动图（GIF/WebP）等图片为BGR数组
+    惰性生成, 同一时刻只保留当前帧的解码结果; 单帧图片只生成一帧
+    """
+    try:
+        image = Image.open(io.BytesIO(image_data))
+    except Exception as e:
+        raise HTTPException(400, f"Invalid image format: {str(e)}")
+
+    with image:
+        for frame in ImageSequence.Iterator(image):
+            yield pil_to_bgr(frame)
+
+
+def get_image_frame_info(image_data: bytes) -> Tuple[int, int, int]:
+    """只解析图片头部, 返回 (帧数, 首帧宽, 首帧高)"""
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            width, height = image.size
+            return getattr(image, "n_frames", 1), width, height
+    except Exception as e:
+        raise HTTPException(400, f"Invalid image format: {str(e)}")
+
+
+def base64_to_bytes(image_base64: str) -> bytes:
+    """解码base64图片数据"""
+    # 移除可能的data:image/xxx;base64,前缀
+    if ',' in image_base64:
+        image_base64 = image_base64.split(',')[1]
+
+    return base64.b64decode(image_base64)
+
 
 def decode_base64_image(image_base64: str) -> np.ndarray:
     """解码base64图片"""
     try:
-        # 移除可能的data:image/xxx;base64,前缀
-        if ',' in image_base64:
-            image_base64 = image_base64.split(',')[1]
+        return decode_image_bytes(base64_to_bytes(image_base64))
+    except Exception as e:
+        raise HTTPException(400, f"Invalid image format: {str(e)}")
 
-        image_data = base64.b64decode(image_base64)
-        image = Image.open(io.BytesIO(image_data))
 
-        # 转换为OpenCV格式
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+def decode_image(image: Union[str, bytes, memoryview, np.ndarray]) -> np.ndarray:
+    """
+    解码请求中的图片
+    str 为base64编码; bytes 为图片文件内容（上传文件、PDF中提取的图片）; ndarray 为已解码的BGR数组, 直接使用
+    """
+    if isinstance(image, np.ndarray):
+        return image
+
+    if isinstance(image, str):
+        return decode_base64_image(image)
+
+    try:
+        return decode_image_bytes(image)
+    except Exception as e:
+        raise HTTPException(400, f"Invalid image format: {str(e)}")
 
-        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        return cv_image
+
+def decode_image_reduced(
+    image: Union[str, bytes, memoryview, np.ndarray], max_side_len: int
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    按目标尺寸缩小解码请求中的图片
+    先只解析文件头得到原图尺寸, 长边超过 max_side_len 的整数倍时按 1/2、1/4、1/8 解码,
+    避免先解码出原尺寸的数组再由模型缩小。返回 (BGR数组, 原图尺寸)
+    """
+    if isinstance(image, np.ndarray):
+        return image, {"width": image.shape[1], "height": image.shape[0]}
+
+    if isinstance(image, str):
+        try:
+            image = base64_to_bytes(image)
+        except Exception as e:
+            raise HTTPException(400, f"Invalid image format: {str(e)}")
+
+    try:
+        width, height = Image.open(io.BytesIO(image)).size
+    except Exception:
+        # PIL 无法解析文件头时按原尺寸解码
+        decoded = decode_image(image)
+        return decoded, {"width": decoded.shape[1], "height": decoded.shape[0]}
+
+    try:
+        decoded = decode_image_bytes(image, get_reduce_factor(width, height, max_side_len))
     except Exception as e:
         raise HTTPException(400, f"Invalid image format: {str(e)}")
+    return decoded, {"width": width, "height": height}
 
+
+def pixmap_to_bgr(pix) -> np.ndarray:
+    """
+    把 PyMuPDF 的 RGB 像素图转换为BGR数组
+    直接在像素图内存上创建视图, 只在颜色转换时复制一次, 不经过PNG编解码
+    """
+    samples = np.ndarray(
+        (pix.height, pix.width, pix.n),
+        dtype=np.uint8,
+        buffer=pix.samples_mv,
+        strides=(pix.stride, pix.n, 1)
+    )
+    return cv2.cvtColor(samples, cv2.COLOR_RGB2BGR)
+
+
+def scale_bbox(bbox: List[List[float]], scale_x: float, scale_y: float) -> List[List[float]]:
+    """将缩小解码后图片上的坐标映射回原图"""
+    return [[x * scale_x, y * scale_y] for x, y in bbox]
+
+
+def extract_images_from_zip(
+    zip_data: bytes, max_images: int, max_image_size: int
+) -> List[Tuple[str, bytes]]:
+    """
+    从zip压缩包中读取图片文件
+    返回 [(压缩包内文件名, 图片内容)], 跳过目录与非图片文件, 数量或单个文件大小超限时报错
+    """
+    images = []
+    try:
+        with zipfile.ZipFile(io.BytesIO(zip_data)) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(ZIP_IMAGE_EXTENSIONS):
+                    continue
+                if len(images) >= max_images:
+                    raise HTTPException(400, f"Too many images in zip. Max: {max_images}")
+                # 按声明的解压后大小检查, 防止压缩炸弹
+                if info.file_size > max_image_size:
+                    raise HTTPException(
+                        400, f"Image {info.filename} too large. Max size: {max_image_size} bytes"
+                    )
+                images.append((info.filename, archive.read(info)))
+    except zipfile.BadZipFile as e:
+        raise HTTPException(400, f"Invalid zip file: {str(e)}")
+    return images
+
+
+def estimate_image_pixels(image_data: bytes) -> int:
+    """只解析图片头部估算像素数, 解析失败时按字节数估算"""
+    try:
+        width, height = Image.open(io.BytesIO(image_data)).size
+        return width * height
+    except Exception:
+        return len(image_data)
+
+
+def estimate_base64_pixels(image_base64: str, head_size: int = 65536) -> int:
+    """只解码base64的头部估算像素数（JPEG/PNG等格式的尺寸信息都在文件头中）"""
+    if ',' in image_base64[:256]:
+        image_base64 = image_base64.split(',', 1)[1]
+
+    head = image_base64[:head_size - head_size % 4]
+    try:
+        width, height = Image.open(io.BytesIO(base64.b64decode(head))).size
+        return width * height
+    except Exception:
+        return len(image_base64) * 3 // 4
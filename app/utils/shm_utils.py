@@ -0,0 +1,84 @@
+"""
+共享内存工具函数
+
+同一主机上的客户端把图片写入 POSIX 共享内存段后只发送段名、形状与数据类型，
+服务端直接在共享内存上创建 ndarray 视图，图片数据不经过 HTTP 请求体。
+"""
+import logging
+import math
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterator, List
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.core.config import SHM_NAME_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# 模型输入只支持 8 位图片
+SHM_SUPPORTED_DTYPES = ("uint8",)
+
+
+def attach_shared_memory(shm_name: str) -> shared_memory.SharedMemory:
+    """
+    打开客户端创建的共享内存段
+    段由客户端负责释放, 不注册到 resource_tracker, 避免本进程退出时被 unlink
+    """
+    try:
+        return shared_memory.SharedMemory(name=shm_name, track=False)
+    except TypeError:  # Python < 3.13 不支持 track 参数
+        shm = shared_memory.SharedMemory(name=shm_name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def validate_shared_image(shm_name: str, shape: List[int], dtype: str, offset: int):
+    """检查共享内存段名与图片形状"""
+    if not shm_name.startswith(SHM_NAME_PREFIX) or "/" in shm_name:
+        raise HTTPException(403, f"Shared memory name must start with '{SHM_NAME_PREFIX}'")
+
+    if dtype not in SHM_SUPPORTED_DTYPES:
+        raise HTTPException(400, f"Unsupported dtype: {dtype}. Supported: {SHM_SUPPORTED_DTYPES}")
+
+    if (
+        len(shape) not in (2, 3)
+        or any(dim <= 0 for dim in shape)
+        or (len(shape) == 3 and shape[2] not in (1, 3, 4))
+    ):
+        raise HTTPException(400, f"Invalid image shape: {shape}")
+
+    if offset < 0:
+        raise HTTPException(400, f"Invalid offset: {offset}")
+
+
+@contextmanager
+def open_shared_image(
+    shm_name: str, shape: List[int], dtype: str = "uint8", offset: int = 0
+) -> Iterator[np.ndarray]:
+    """
+    在共享内存段上创建图片视图（不复制）
+    调用方需在退出前释放对视图的引用, 否则共享内存映射延迟到视图被回收时关闭
+    """
+    validate_shared_image(shm_name, shape, dtype, offset)
+
+    try:
+        shm = attach_shared_memory(shm_name)
+    except FileNotFoundError:
+        raise HTTPException(404, f"Shared memory not found: {shm_name}")
+
+    try:
+        nbytes = math.prod(shape) * np.dtype(dtype).itemsize
+        if offset + nbytes > shm.size:
+            raise HTTPException(
+                400,
+                f"Image {shape} ({nbytes} bytes at offset {offset}) exceeds "
+                f"shared memory size {shm.size}"
+            )
+        yield np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            logger.debug(f"共享内存视图仍被引用, 延迟关闭 | name: {shm_name}")
@@ -0,0 +1,32 @@
+"""
+流式响应编码工具
+"""
+import json
+from typing import Any, Dict, Union
+
+from pydantic import BaseModel
+
+# 支持的流式格式及其响应类型
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def encode_stream_event(
+    event: str,
+    data: Union[BaseModel, Dict[str, Any]],
+    stream_format: str = "ndjson"
+) -> str:
+    """
+    编码一条流式消息
+    ndjson: 每行一个JSON对象; sse: "event: <event>" + "data: <json>" + 空行
+    """
+    if isinstance(data, BaseModel):
+        payload = data.model_dump_json()
+    else:
+        payload = json.dumps(data, ensure_ascii=False)
+
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return payload + "\n"
@@ -4,10 +4,20 @@
 # Get port from environment variable, default to 7850
 OCR_PORT=${OCR_PORT:-7850}
 
+# Worker count, default to 1
+OCR_WORK_COUNT=${OCR_WORK_COUNT:-1}
+
+# Load the app (and shared model weights) in the master before forking workers
+PRELOAD_ARGS=""
+if [ "${OCR_SHARED_WEIGHTS:-false}" = "true" ]; then
+    PRELOAD_ARGS="--preload"
+fi
+
 # Start gunicorn with configurable port
 exec gunicorn \
     --bind "0.0.0.0:${OCR_PORT}" \
-    --workers 1 \
+    --workers "${OCR_WORK_COUNT}" \
+    ${PRELOAD_ARGS} \
     --worker-class uvicorn.workers.UvicornWorker \
     --timeout 120 \
     --keep-alive 5 \
@@ -2,4 +2,11 @@
 # @Author: SWHL
 # @Contact: liekkaskono@163.com
 from .main import RapidOCR
-from .utils import LoadImageError, VisRes
+from .pipeline import OCRPipeline
+from .utils import (
+    CancelToken,
+    LoadImageError,
+    OCRCancelledError,
+    OCROptions,
+    VisRes,
+)
@@ -56,10 +56,15 @@ class TextClassifier:
 
             norm_img_batch = []
             for ino in range(beg_img_no, end_img_no):
-                norm_img = self.resize_norm_img(img_list[indices[ino]])
+                if self.infer.uint8_input:
+                    norm_img = self.resize_pad_img(img_list[indices[ino]])
+                else:
+                    norm_img = self.resize_norm_img(img_list[indices[ino]])
                 norm_img = norm_img[np.newaxis, :]
                 norm_img_batch.append(norm_img)
-            norm_img_batch = np.concatenate(norm_img_batch).astype(np.float32)
+            norm_img_batch = np.concatenate(norm_img_batch)
+            if not self.infer.uint8_input:
+                norm_img_batch = norm_img_batch.astype(np.float32)
 
             starttime = time.time()
             prob_out = self.infer(norm_img_batch)[0]
@@ -97,6 +102,17 @@ class TextClassifier:
         padding_im[:, :, :resized_w] = resized_image
         return padding_im
 
+    def resize_pad_img(self, img: np.ndarray) -> np.ndarray:
+        """uint8 HWC counterpart of resize_norm_img for models normalizing in the graph."""
+        _, img_h, img_w = self.cls_image_shape
+        h, w = img.shape[:2]
+        resized_w = min(img_w, int(math.ceil(img_h * w / float(h))))
+
+        # 128 normalizes to about 0, the padding value of resize_norm_img
+        padding_im = np.full((img_h, img_w, 3), 128, dtype=np.uint8)
+        padding_im[:, :resized_w] = cv2.resize(img, (resized_w, img_h))
+        return padding_im
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -2,3 +2,4 @@
 # @Author: SWHL
 # @Contact: liekkaskono@163.com
 from .text_detect import TextDetector
+from .batch_scheduler import DetBatchScheduler
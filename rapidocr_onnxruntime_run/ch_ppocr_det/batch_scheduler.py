@@ -0,0 +1,127 @@
+# -*- encoding: utf-8 -*-
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils import OCROptions
+from ..utils.batch_scheduler import BatchItem, BatchScheduler
+from .text_detect import TextDetector
+from .utils import DetPreProcess
+
+BucketEntry = Tuple[BatchItem, DetPreProcess, int, int]
+
+
+class DetBatchScheduler(BatchScheduler):
+    """Run detection of concurrent requests in shape-bucketed batches.
+
+    Every image is resized as ``TextDetector`` would do it, then each axis is
+    rounded up to the next canonical bucket side and padded with mid-gray (0 after
+    normalization, or 128 for models taking uint8 input). Images that share a
+    bucket are stacked into one session run so ORT only ever sees a handful
+    of input shapes, and each probability map is cropped back to its valid
+    region before ``DBPostProcess``. Images larger than every bucket run
+    alone through ``TextDetector`` at their own shape.
+    Drop-in replacement for ``TextDetector.__call__``.
+    """
+
+    def __init__(
+        self,
+        detector: TextDetector,
+        bucket_sides: Sequence[int],
+        max_batch_size: int = 4,
+        max_wait_ms: float = 5,
+    ):
+        if not bucket_sides:
+            raise ValueError("det batch bucket sides must not be empty")
+
+        self.detector = detector
+        self.bucket_sides = sorted({int(side) for side in bucket_sides})
+        super().__init__(max_batch_size, max_wait_ms, name="DetBatchScheduler")
+
+    def __call__(
+        self, img: np.ndarray, options: Optional[OCROptions] = None
+    ) -> Tuple[Optional[np.ndarray], float]:
+        if img is None:
+            raise ValueError("img is None")
+        cancel_token = options.cancel_token if options is not None else None
+        return self.submit((img, options), cancel_token).result()
+
+    def get_bucket(self, resize_h: int, resize_w: int) -> Optional[Tuple[int, int]]:
+        bucket_h = self.get_bucket_side(resize_h)
+        bucket_w = self.get_bucket_side(resize_w)
+        if bucket_h is None or bucket_w is None:
+            return None
+        return bucket_h, bucket_w
+
+    def get_bucket_side(self, size: int) -> Optional[int]:
+        for side in self.bucket_sides:
+            if size <= side:
+                return side
+        return None
+
+    def process(self, items: List[BatchItem]):
+        groups: Dict[Tuple[int, int], List[BucketEntry]] = {}
+        for item in items:
+            h, w = item.payload[0].shape[:2]
+            preprocess_op = self.detector.get_preprocess(max(h, w))
+            resize_h, resize_w = preprocess_op.get_resize_shape(h, w)
+            if resize_h <= 0 or resize_w <= 0:
+                item.future.set_result((None, 0))
+                continue
+
+            bucket = self.get_bucket(resize_h, resize_w)
+            if bucket is None:
+                # Shrinking into a bucket would lose small text
+                try:
+                    item.future.set_result(self.detector(*item.payload))
+                except Exception as e:
+                    item.future.set_exception(e)
+                continue
+
+            groups.setdefault(bucket, []).append(
+                (item, preprocess_op, resize_h, resize_w)
+            )
+
+        for bucket, entries in groups.items():
+            for beg in range(0, len(entries), self.max_batch_size):
+                self.run_bucket(bucket, entries[beg : beg + self.max_batch_size])
+
+    def run_bucket(self, bucket: Tuple[int, int], entries: List[BucketEntry]):
+        start_time = time.perf_counter()
+
+        bucket_h, bucket_w = bucket
+        if self.detector.uint8_input:
+            batch = np.full((len(entries), bucket_h, bucket_w, 3), 128, dtype=np.uint8)
+        else:
+            batch = np.zeros((len(entries), 3, bucket_h, bucket_w), dtype=np.float32)
+        for i, (item, preprocess_op, resize_h, resize_w) in enumerate(entries):
+            if self.detector.uint8_input:
+                preprocess_op.resize(
+                    item.payload[0],
+                    batch[i, :resize_h, :resize_w],
+                    self.detector.buffers,
+                )
+            else:
+                preprocess_op.resize_normalize(
+                    item.payload[0],
+                    batch[i, :, :resize_h, :resize_w],
+                    self.detector.buffers,
+                )
+
+        outputs = self.detector.infer(batch)
+        preds = outputs[0]
+        masks = outputs[1] if self.detector.use_det_mask else None
+
+        for i, (item, _, resize_h, resize_w) in enumerate(entries):
+            img, options = item.payload
+            ori_img_shape = img.shape[0], img.shape[1]
+            pred = np.ascontiguousarray(preds[i : i + 1, :, :resize_h, :resize_w])
+            mask = None
+            if masks is not None:
+                mask = np.ascontiguousarray(masks[i : i + 1, :, :resize_h, :resize_w])
+            dt_boxes, _ = self.detector.postprocess_op(
+                pred, ori_img_shape, options, mask
+            )
+            dt_boxes = self.detector.filter_tag_det_res(dt_boxes, ori_img_shape)
+            item.future.set_result((dt_boxes, time.perf_counter() - start_time))
@@ -19,9 +19,10 @@ from typing import Any, Dict, Optional, Tuple
 
 import numpy as np
 
-from ..utils import OrtInferSession
+from ..utils import OCROptions, OrtInferSession, get_logger
+from ..utils.infer_engine import DET_MASK_OUTPUT, META_DET_THRESH
 
-from .utils import DBPostProcess, DetPreProcess
+from .utils import DBPostProcess, DetPreProcess, PreprocessBuffers
 
 
 class TextDetector:
@@ -30,7 +31,6 @@ class TextDetector:
         self.limit_type = config.get("limit_type")
         self.mean = config.get("mean")
         self.std = config.get("std")
-        self.preprocess_op = None
 
         post_process = {
             "thresh": config.get("thresh", 0.3),
@@ -43,21 +43,42 @@ class TextDetector:
         self.postprocess_op = DBPostProcess(**post_process)
 
         self.infer = OrtInferSession(config)
-
-    def __call__(self, img: np.ndarray) -> Tuple[Optional[np.ndarray], float]:
+        self.uint8_input = self.infer.uint8_input
+
+        # A folded model's mask is only usable if it was binarized with our thresh
+        self.use_det_mask = False
+        if self.infer.has_output(DET_MASK_OUTPUT):
+            det_thresh = float(self.infer.metadata.get(META_DET_THRESH, "nan"))
+            self.use_det_mask = det_thresh == post_process["thresh"]
+            if not self.use_det_mask:
+                get_logger("TextDetector").warning(
+                    "det model mask thresh %s != %s, binarizing the prob map instead",
+                    det_thresh,
+                    post_process["thresh"],
+                )
+
+        self.preprocess_ops: Dict[int, DetPreProcess] = {}
+        self.buffers = PreprocessBuffers()
+
+    def __call__(
+        self, img: np.ndarray, options: Optional[OCROptions] = None
+    ) -> Tuple[Optional[np.ndarray], float]:
         start_time = time.perf_counter()
 
         if img is None:
             raise ValueError("img is None")
 
         ori_img_shape = img.shape[0], img.shape[1]
-        self.preprocess_op = self.get_preprocess(max(img.shape[0], img.shape[1]))
-        prepro_img = self.preprocess_op(img)
+        preprocess_op = self.get_preprocess(max(img.shape[0], img.shape[1]))
+        prepro_img = preprocess_op(img, self.buffers, self.uint8_input)
         if prepro_img is None:
             return None, 0
 
-        preds = self.infer(prepro_img)[0]
-        dt_boxes, dt_boxes_scores = self.postprocess_op(preds, ori_img_shape)
+        outputs = self.infer(prepro_img)
+        mask = outputs[1] if self.use_det_mask else None
+        dt_boxes, dt_boxes_scores = self.postprocess_op(
+            outputs[0], ori_img_shape, options, mask
+        )
         dt_boxes = self.filter_tag_det_res(dt_boxes, ori_img_shape)
         elapse = time.perf_counter() - start_time
         return dt_boxes, elapse
@@ -71,7 +92,14 @@ class TextDetector:
             limit_side_len = 1500
         else:
             limit_side_len = 2000
-        return DetPreProcess(limit_side_len, self.limit_type, self.mean, self.std)
+
+        preprocess_op = self.preprocess_ops.get(limit_side_len)
+        if preprocess_op is None:
+            preprocess_op = DetPreProcess(
+                limit_side_len, self.limit_type, self.mean, self.std
+            )
+            self.preprocess_ops[limit_side_len] = preprocess_op
+        return preprocess_op
 
     def filter_tag_det_res(
         self, dt_boxes: np.ndarray, image_shape: Tuple[int, int]
@@ -1,13 +1,36 @@
 # -*- encoding: utf-8 -*-
 # @Author: SWHL
 # @Contact: liekkaskono@163.com
-from typing import List, Optional, Tuple
+import threading
+from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 import pyclipper
 from shapely.geometry import Polygon
 
+from ..utils import OCROptions
+
+
+class PreprocessBuffers:
+    """Per-thread reusable buffers for det preprocessing.
+
+    Each thread keeps one growable buffer per name and gets views of the
+    requested shape, so steady-state preprocessing does not allocate. A view
+    is only valid until the same thread asks for that name again.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.float32) -> np.ndarray:
+        buffers: Dict[str, np.ndarray] = self._local.__dict__.setdefault("buffers", {})
+        size = int(np.prod(shape))
+        buf = buffers.get(name)
+        if buf is None or buf.size < size or buf.dtype != dtype:
+            buf = buffers[name] = np.empty(size, dtype=dtype)
+        return buf[:size].reshape(shape)
+
 
 class DetPreProcess:
     def __init__(
@@ -19,33 +42,114 @@ class DetPreProcess:
         if std is None:
             std = [0.5, 0.5, 0.5]
 
-        self.mean = np.array(mean)
-        self.std = np.array(std)
+        self.mean = np.array(mean, dtype=np.float32)
+        self.std = np.array(std, dtype=np.float32)
         self.scale = 1 / 255.0
 
+        # (img * scale - mean) / std folded into img * alpha + beta per channel
+        self.alpha = (self.scale / self.std).astype(np.float32)
+        self.beta = (-self.mean / self.std).astype(np.float32)
+
         self.limit_side_len = limit_side_len
         self.limit_type = limit_type
 
-    def __call__(self, img: np.ndarray) -> Optional[np.ndarray]:
-        resized_img = self.resize(img)
-        if resized_img is None:
+    def __call__(
+        self,
+        img: np.ndarray,
+        buffers: Optional[PreprocessBuffers] = None,
+        uint8_input: bool = False,
+    ) -> Optional[np.ndarray]:
+        h, w = img.shape[:2]
+        resize_h, resize_w = self.get_resize_shape(h, w)
+        if resize_h <= 0 or resize_w <= 0:
             return None
 
-        img = self.normalize(resized_img)
-        img = self.permute(img)
-        img = np.expand_dims(img, axis=0).astype(np.float32)
-        return img
+        if uint8_input:
+            # The model normalizes in the graph, feed the resized image as NHWC
+            shape = (1, resize_h, resize_w, 3)
+            if buffers is None:
+                out = np.empty(shape, dtype=np.uint8)
+            else:
+                out = buffers.get("input_uint8", shape, np.uint8)
+            self.resize(img, out[0], buffers)
+            return out
+
+        shape = (1, 3, resize_h, resize_w)
+        if buffers is None:
+            out = np.empty(shape, dtype=np.float32)
+        else:
+            out = buffers.get("input", shape, np.float32)
+        self.resize_normalize(img, out[0], buffers)
+        return out
+
+    def resize_normalize(
+        self,
+        img: np.ndarray,
+        out: np.ndarray,
+        buffers: Optional[PreprocessBuffers] = None,
+    ):
+        """Resize img to the size of out, normalize it and write it as CHW into out.
+
+        out is a float32 (3, h, w) array or view (e.g. a region of a padded
+        batch). Each channel is converted with a single scale-and-shift pass,
+        without float64 promotion or full-frame temporaries.
+        """
+        resize_h, resize_w = out.shape[1:]
+        if img.shape[:2] == (resize_h, resize_w):
+            resized = img
+        else:
+            dst = None
+            if buffers is not None:
+                dst = buffers.get("resized", (resize_h, resize_w, img.shape[2]), np.uint8)
+            try:
+                resized = cv2.resize(img, (int(resize_w), int(resize_h)), dst=dst)
+            except Exception as exc:
+                raise ResizeImgError from exc
+
+        plane = None
+        if buffers is not None:
+            plane = buffers.get("plane", (resize_h, resize_w), np.uint8)
+        for c in range(3):
+            plane = cv2.extractChannel(resized, c, dst=plane)
+            cv2.addWeighted(
+                plane,
+                float(self.alpha[c]),
+                plane,
+                0.0,
+                float(self.beta[c]),
+                dst=out[c],
+                dtype=cv2.CV_32F,
+            )
+
+    def resize(
+        self,
+        img: np.ndarray,
+        out: np.ndarray,
+        buffers: Optional[PreprocessBuffers] = None,
+    ):
+        """Resize img to the size of out and write it into out, a uint8 (h, w, 3) array or view."""
+        resize_h, resize_w = out.shape[:2]
+        if img.shape[:2] == (resize_h, resize_w):
+            out[...] = img
+            return
+
+        dst = out if out.flags.c_contiguous else None
+        if dst is None and buffers is not None:
+            dst = buffers.get("resized", (resize_h, resize_w, img.shape[2]), np.uint8)
+        try:
+            resized = cv2.resize(img, (int(resize_w), int(resize_h)), dst=dst)
+        except Exception as exc:
+            raise ResizeImgError from exc
+        if resized is not out:
+            out[...] = resized
 
     def normalize(self, img: np.ndarray) -> np.ndarray:
-        return (img.astype("float32") * self.scale - self.mean) / self.std
+        return img.astype(np.float32) * self.alpha + self.beta
 
     def permute(self, img: np.ndarray) -> np.ndarray:
         return img.transpose((2, 0, 1))
 
-    def resize(self, img: np.ndarray) -> Optional[np.ndarray]:
-        """resize image to a size multiple of 32 which is required by the network"""
-        h, w = img.shape[:2]
-
+    def get_resize_shape(self, h: int, w: int) -> Tuple[int, int]:
         if self.limit_type == "max":
             if max(h, w) > self.limit_side_len:
                 if h > w:
@@ -68,15 +172,7 @@ class DetPreProcess:
 
         resize_h = int(round(resize_h / 32) * 32)
         resize_w = int(round(resize_w / 32) * 32)
-
-        try:
-            if int(resize_w) <= 0 or int(resize_h) <= 0:
-                return None
-            img = cv2.resize(img, (int(resize_w), int(resize_h)))
-        except Exception as exc:
-            raise ResizeImgError from exc
-
-        return img
+        return resize_h, resize_w
 
 
 class ResizeImgError(Exception):
@@ -107,28 +203,50 @@ class DBPostProcess:
             self.dilation_kernel = np.array([[1, 1], [1, 1]])
 
     def __call__(
-        self, pred: np.ndarray, ori_shape: Tuple[int, int]
+        self,
+        pred: np.ndarray,
+        ori_shape: Tuple[int, int],
+        options: Optional[OCROptions] = None,
+        segmentation: Optional[np.ndarray] = None,
     ) -> Tuple[np.ndarray, List[float]]:
+        """segmentation is the binarized pred if the model already outputs it."""
+        box_thresh, unclip_ratio = self.box_thresh, self.unclip_ratio
+        if options is not None:
+            box_thresh, unclip_ratio = options.box_thresh, options.unclip_ratio
+
         src_h, src_w = ori_shape
         pred = pred[:, 0, :, :]
-        segmentation = pred > self.thresh
+        if segmentation is None:
+            segmentation = pred > self.thresh
+        else:
+            segmentation = segmentation[:, 0, :, :]
 
         mask = segmentation[0]
         if self.dilation_kernel is not None:
             mask = cv2.dilate(
                 np.array(segmentation[0]).astype(np.uint8), self.dilation_kernel
             )
-        boxes, scores = self.boxes_from_bitmap(pred[0], mask, src_w, src_h)
+        boxes, scores = self.boxes_from_bitmap(
+            pred[0], mask, src_w, src_h, box_thresh, unclip_ratio
+        )
         return boxes, scores
 
     def boxes_from_bitmap(
-        self, pred: np.ndarray, bitmap: np.ndarray, dest_width: int, dest_height: int
+        self,
+        pred: np.ndarray,
+        bitmap: np.ndarray,
+        dest_width: int,
+        dest_height: int,
+        box_thresh: Optional[float] = None,
+        unclip_ratio: Optional[float] = None,
     ) -> Tuple[np.ndarray, List[float]]:
         """
         bitmap: single map with shape (1, H, W),
                 whose values are binarized as {0, 1}
         """
 
+        box_thresh = self.box_thresh if box_thresh is None else box_thresh
+
         height, width = bitmap.shape
 
         outs = cv2.findContours(
@@ -153,10 +271,10 @@ class DBPostProcess:
             else:
                 score = self.box_score_slow(pred, contour)
 
-            if self.box_thresh > score:
+            if box_thresh > score:
                 continue
 
-            box = self.unclip(points)
+            box = self.unclip(points, unclip_ratio)
             box, sside = self.get_mini_boxes(box)
             if sside < self.min_size + 2:
                 continue
@@ -227,8 +345,11 @@ class DBPostProcess:
         cv2.fillPoly(mask, contour.reshape(1, -1, 2).astype(np.int32), 1)
         return cv2.mean(bitmap[ymin : ymax + 1, xmin : xmax + 1], mask)[0]
 
-    def unclip(self, box: np.ndarray) -> np.ndarray:
-        unclip_ratio = self.unclip_ratio
+    def unclip(
+        self, box: np.ndarray, unclip_ratio: Optional[float] = None
+    ) -> np.ndarray:
+        if unclip_ratio is None:
+            unclip_ratio = self.unclip_ratio
         poly = Polygon(box)
         distance = poly.area * unclip_ratio / poly.length
         offset = pyclipper.PyclipperOffset()
@@ -2,3 +2,5 @@
 # @Author: SWHL
 # @Contact: liekkaskono@163.com
 from .text_recognize import TextRecognizer
+from .batch_scheduler import RecBatchScheduler
+from .crop_cache import RecCropCache
@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+from typing import Any, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ..utils.batch_scheduler import BatchItem, BatchScheduler
+from ..utils.cancellation import CancelToken, OCRCancelledError
+from .text_recognize import TextRecognizer
+
+
+class RecBatchScheduler(BatchScheduler):
+    """Pool text crops from concurrent requests into shared rec batches.
+
+    Crops of all collected requests are sorted by aspect ratio and run in
+    chunks of ``max_batch_size``, then handed back to their own request in
+    the original order. Drop-in replacement for ``TextRecognizer.__call__``.
+    """
+
+    def __init__(
+        self,
+        recognizer: TextRecognizer,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5,
+    ):
+        self.recognizer = recognizer
+        super().__init__(max_batch_size, max_wait_ms, name="RecBatchScheduler")
+
+    def __call__(
+        self,
+        img_list: Union[np.ndarray, List[np.ndarray]],
+        return_word_box: bool = False,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> Tuple[List[Tuple[str, float]], float]:
+        if isinstance(img_list, np.ndarray):
+            img_list = [img_list]
+
+        if len(img_list) == 0:
+            return [], 0.0
+        return self.submit((img_list, return_word_box), cancel_token).result()
+
+    def item_size(self, payload: Any) -> int:
+        return len(payload[0])
+
+    def process(self, items: List[BatchItem]):
+        crops = []
+        for item_no, item in enumerate(items):
+            for img_no, img in enumerate(item.payload[0]):
+                crops.append((img.shape[1] / float(img.shape[0]), item_no, img_no, img))
+
+        # Sorting by aspect ratio keeps padding small inside each batch
+        crops.sort(key=lambda x: x[0])
+
+        rec_res = [[("", 0.0)] * len(item.payload[0]) for item in items]
+        elapses = [0.0] * len(items)
+        for beg in range(0, len(crops), self.max_batch_size):
+            # Requests cancelled mid-way stop taking part in later batches
+            for item in items:
+                if item.cancelled and not item.future.done():
+                    item.future.set_exception(OCRCancelledError("cancelled during rec"))
+            batch = [
+                c
+                for c in crops[beg : beg + self.max_batch_size]
+                if not items[c[1]].future.done()
+            ]
+            if not batch:
+                continue
+
+            return_word_box = any(items[c[1]].payload[1] for c in batch)
+
+            rec_result, elapse = self.recognizer.rec_batch(
+                [c[3] for c in batch], return_word_box
+            )
+            for (_, item_no, img_no, _), one_res in zip(batch, rec_result):
+                if return_word_box and not items[item_no].payload[1]:
+                    one_res = (one_res[0], one_res[1])
+                rec_res[item_no][img_no] = one_res
+
+            for item_no in {c[1] for c in batch}:
+                elapses[item_no] += elapse
+
+        for item, res, elapse in zip(items, rec_res, elapses):
+            if not item.future.done():
+                item.future.set_result((res, elapse))
@@ -0,0 +1,122 @@
+# -*- encoding: utf-8 -*-
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..utils.cancellation import CancelToken
+
+
+class RecCropCache:
+    """Recognize identical text crops only once.
+
+    Crops are keyed by a hash of a small normalized copy (gray, fixed
+    height, quantized), so repeated labels and values such as "0.00" in
+    tables are recognized once per request and fanned out. With
+    ``max_size > 0`` results are also kept in a bounded LRU shared across
+    requests. Drop-in replacement for ``TextRecognizer.__call__``; word box
+    requests bypass the cache since their boxes depend on the exact crop.
+    """
+
+    def __init__(
+        self,
+        recognizer: Callable[..., Tuple[List[Tuple[str, float]], float]],
+        max_size: int = 4096,
+        key_height: int = 24,
+        quant_bits: int = 5,
+    ):
+        self.recognizer = recognizer
+        self.max_size = max_size
+        self.key_height = key_height
+        self.quant_shift = 8 - quant_bits
+
+        self._cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.crops = 0
+        self.recognized = 0
+        self.cache_hits = 0
+
+    def __call__(
+        self,
+        img_list: Union[np.ndarray, List[np.ndarray]],
+        return_word_box: bool = False,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> Tuple[List[Tuple[str, float]], float]:
+        if isinstance(img_list, np.ndarray):
+            img_list = [img_list]
+
+        if return_word_box or len(img_list) == 0:
+            return self.recognizer(img_list, return_word_box, cancel_token)
+
+        rec_res: List[Any] = [None] * len(img_list)
+        pending: Dict[bytes, List[int]] = {}
+        cache_hits = 0
+        for i, img in enumerate(img_list):
+            key = self.crop_key(img)
+            cached = self.get(key)
+            if cached is not None:
+                rec_res[i] = cached
+                cache_hits += 1
+            else:
+                pending.setdefault(key, []).append(i)
+
+        elapse = 0.0
+        if pending:
+            unique_imgs = [img_list[indices[0]] for indices in pending.values()]
+            unique_res, elapse = self.recognizer(unique_imgs, False, cancel_token)
+            for (key, indices), res in zip(pending.items(), unique_res):
+                self.put(key, res)
+                for i in indices:
+                    rec_res[i] = res
+
+        with self._lock:
+            self.crops += len(img_list)
+            self.recognized += len(pending)
+            self.cache_hits += cache_hits
+        return rec_res, elapse
+
+    def crop_key(self, img: np.ndarray) -> bytes:
+        h, w = img.shape[:2]
+        key_w = max(1, round(w * self.key_height / h))
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (key_w, self.key_height), interpolation=cv2.INTER_AREA)
+        small >>= self.quant_shift
+
+        digest = hashlib.blake2b(small.tobytes(), digest_size=16)
+        digest.update(key_w.to_bytes(4, "little"))
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Tuple[str, float]]:
+        if self.max_size <= 0:
+            return None
+
+        with self._lock:
+            res = self._cache.get(key)
+            if res is not None:
+                self._cache.move_to_end(key)
+            return res
+
+    def put(self, key: bytes, res: Tuple[str, float]):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._cache[key] = res
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "crops": self.crops,
+                "recognized": self.recognized,
+                "cache_hits": self.cache_hits,
+                "deduplicated": self.crops - self.recognized - self.cache_hits,
+                "cache_size": len(self._cache),
+                "max_size": self.max_size,
+            }
@@ -14,12 +14,13 @@
 import argparse
 import math
 import time
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 
-from ..utils import OrtInferSession, read_yaml
+from ..utils import CancelToken, OrtInferSession, read_yaml
+from ..utils.infer_engine import REC_INDICES_OUTPUT
 
 from .utils import CTCLabelDecode
 
@@ -37,6 +38,9 @@ class TextRecognizer:
             character=character, character_path=character_path
         )
 
+        # Folded models output the argmax indices and max probs, not the softmax
+        self.reduced_output = self.session.has_output(REC_INDICES_OUTPUT)
+
         self.rec_batch_num = config["rec_batch_num"]
         self.rec_image_shape = config["rec_img_shape"]
 
@@ -44,6 +48,7 @@ class TextRecognizer:
         self,
         img_list: Union[np.ndarray, List[np.ndarray]],
         return_word_box: bool = False,
+        cancel_token: Optional[CancelToken] = None,
     ) -> Tuple[List[Tuple[str, float]], float]:
         if isinstance(img_list, np.ndarray):
             img_list = [img_list]
@@ -60,37 +65,62 @@ class TextRecognizer:
         batch_num = self.rec_batch_num
         elapse = 0
         for beg_img_no in range(0, img_num, batch_num):
+            if cancel_token is not None:
+                cancel_token.check("rec batch")
+
             end_img_no = min(img_num, beg_img_no + batch_num)
 
-            # Parameter Alignment for PaddleOCR
-            imgC, imgH, imgW = self.rec_image_shape[:3]
-            max_wh_ratio = imgW / imgH
-            wh_ratio_list = []
-            for ino in range(beg_img_no, end_img_no):
-                h, w = img_list[indices[ino]].shape[0:2]
-                wh_ratio = w * 1.0 / h
-                max_wh_ratio = max(max_wh_ratio, wh_ratio)
-                wh_ratio_list.append(wh_ratio)
-
-            norm_img_batch = []
-            for ino in range(beg_img_no, end_img_no):
-                norm_img = self.resize_norm_img(img_list[indices[ino]], max_wh_ratio)
-                norm_img_batch.append(norm_img[np.newaxis, :])
-            norm_img_batch = np.concatenate(norm_img_batch).astype(np.float32)
-
-            starttime = time.time()
-            preds = self.session(norm_img_batch)[0]
+            batch_imgs = [img_list[indices[ino]] for ino in range(beg_img_no, end_img_no)]
+            rec_result, batch_elapse = self.rec_batch(batch_imgs, return_word_box)
+
+            for rno, one_res in enumerate(rec_result):
+                rec_res[indices[beg_img_no + rno]] = one_res
+            elapse += batch_elapse
+        return rec_res, elapse
+
+    def rec_batch(
+        self, img_list: List[np.ndarray], return_word_box: bool = False
+    ) -> Tuple[List[Tuple[str, float]], float]:
+        """Recognize one batch of crops, padded to the widest one."""
+        # Parameter Alignment for PaddleOCR
+        imgC, imgH, imgW = self.rec_image_shape[:3]
+        max_wh_ratio = imgW / imgH
+        wh_ratio_list = []
+        for img in img_list:
+            h, w = img.shape[0:2]
+            wh_ratio = w * 1.0 / h
+            max_wh_ratio = max(max_wh_ratio, wh_ratio)
+            wh_ratio_list.append(wh_ratio)
+
+        norm_img_batch = []
+        for img in img_list:
+            if self.session.uint8_input:
+                norm_img = self.resize_pad_img(img, max_wh_ratio)
+            else:
+                norm_img = self.resize_norm_img(img, max_wh_ratio)
+            norm_img_batch.append(norm_img[np.newaxis, :])
+        norm_img_batch = np.concatenate(norm_img_batch)
+        if not self.session.uint8_input:
+            norm_img_batch = norm_img_batch.astype(np.float32)
+
+        starttime = time.time()
+        outputs = self.session(norm_img_batch)
+        if self.reduced_output:
+            rec_result = self.postprocess_op.decode_argmax(
+                outputs[0],
+                outputs[1],
+                return_word_box,
+                wh_ratio_list=wh_ratio_list,
+                max_wh_ratio=max_wh_ratio,
+            )
+        else:
             rec_result = self.postprocess_op(
-                preds,
+                outputs[0],
                 return_word_box,
                 wh_ratio_list=wh_ratio_list,
                 max_wh_ratio=max_wh_ratio,
             )
-
-            for rno, one_res in enumerate(rec_result):
-                rec_res[indices[beg_img_no + rno]] = one_res
-            elapse += time.time() - starttime
-        return rec_res, elapse
+        return rec_result, time.time() - starttime
 
     def resize_norm_img(self, img: np.ndarray, max_wh_ratio: float) -> np.ndarray:
         img_channel, img_height, img_width = self.rec_image_shape
@@ -115,6 +145,20 @@ class TextRecognizer:
         padding_im[:, :, 0:resized_w] = resized_image
         return padding_im
 
+    def resize_pad_img(self, img: np.ndarray, max_wh_ratio: float) -> np.ndarray:
+        """uint8 HWC counterpart of resize_norm_img for models normalizing in the graph."""
+        img_channel, img_height, img_width = self.rec_image_shape
+        assert img_channel == img.shape[2]
+
+        img_width = int(img_height * max_wh_ratio)
+        h, w = img.shape[:2]
+        resized_w = min(img_width, int(math.ceil(img_height * w / float(h))))
+
+        # 128 normalizes to about 0, the padding value of resize_norm_img
+        padding_im = np.full((img_height, img_width, img_channel), 128, dtype=np.uint8)
+        padding_im[:, 0:resized_w] = cv2.resize(img, (resized_w, img_height))
+        return padding_im
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -21,6 +21,16 @@ class CTCLabelDecode:
     ) -> List[Tuple[str, float]]:
         preds_idx = preds.argmax(axis=2)
         preds_prob = preds.max(axis=2)
+        return self.decode_argmax(preds_idx, preds_prob, return_word_box, **kwargs)
+
+    def decode_argmax(
+        self,
+        preds_idx: np.ndarray,
+        preds_prob: np.ndarray,
+        return_word_box: bool = False,
+        **kwargs,
+    ) -> List[Tuple[str, float]]:
+        """Decode [N, T] argmax indices and max probs, e.g. computed in the graph."""
         text = self.decode(
             preds_idx, preds_prob, return_word_box, is_remove_duplicate=True
         )
@@ -10,10 +10,11 @@ import numpy as np
 
 from .cal_rec_boxes import CalRecBoxes
 from .ch_ppocr_cls import TextClassifier
-from .ch_ppocr_det import TextDetector
-from .ch_ppocr_rec import TextRecognizer
+from .ch_ppocr_det import DetBatchScheduler, TextDetector
+from .ch_ppocr_rec import RecBatchScheduler, RecCropCache, TextRecognizer
 from .utils import (
     LoadImage,
+    OCROptions,
     UpdateParameters,
     VisRes,
     add_round_letterbox,
@@ -21,6 +22,7 @@ from .utils import (
     increase_min_side,
     read_yaml,
     reduce_max_side,
+    share_model_weights,
     update_model_path,
 )
 
@@ -31,30 +33,49 @@ logger = get_logger("RapidOCR")
 
 class RapidOCR:
     def __init__(self, config_path: Optional[str] = None, **kwargs):
-        if config_path is not None and Path(config_path).exists():
-            config = read_yaml(config_path)
-        else:
-            config = read_yaml(DEFAULT_CFG_PATH)
-        config = update_model_path(config)
-
-        if kwargs:
-            updater = UpdateParameters()
-            config = updater(config, **kwargs)
+        config = self.load_config(config_path, **kwargs)
 
         global_config = config["Global"]
         self.print_verbose = global_config["print_verbose"]
         self.text_score = global_config["text_score"]
+        self.default_options = OCROptions(
+            text_score=global_config["text_score"],
+            box_thresh=config["Det"].get("box_thresh", 0.5),
+            unclip_ratio=config["Det"].get("unclip_ratio", 1.6),
+            return_word_box=global_config.get("return_word_box", False),
+        )
         self.min_height = global_config["min_height"]
         self.width_height_ratio = global_config["width_height_ratio"]
 
         self.use_det = global_config["use_det"]
         self.text_det = TextDetector(config["Det"])
+        self.text_det_scheduler = None
+        if config["Det"].get("batch_scheduler", False):
+            self.text_det_scheduler = DetBatchScheduler(
+                self.text_det,
+                bucket_sides=config["Det"]["batch_bucket_sides"],
+                max_batch_size=config["Det"].get("batch_max_size", 4),
+                max_wait_ms=config["Det"].get("batch_max_wait_ms", 5),
+            )
 
         self.use_cls = global_config["use_cls"]
         self.text_cls = TextClassifier(config["Cls"])
 
         self.use_rec = global_config["use_rec"]
         self.text_rec = TextRecognizer(config["Rec"])
+        self.text_rec_scheduler = None
+        if config["Rec"].get("rec_batch_scheduler", False):
+            self.text_rec_scheduler = RecBatchScheduler(
+                self.text_rec,
+                max_batch_size=config["Rec"].get("rec_batch_max_size", 32),
+                max_wait_ms=config["Rec"].get("rec_batch_max_wait_ms", 5),
+            )
+        self.text_rec_cache = None
+        if config["Rec"].get("rec_crop_dedup", False):
+            self.text_rec_cache = RecCropCache(
+                self.text_rec_scheduler or self.text_rec,
+                max_size=config["Rec"].get("rec_crop_cache_size", 4096),
+            )
 
         self.load_img = LoadImage()
         self.max_side_len = global_config["max_side_len"]
@@ -62,52 +83,173 @@ class RapidOCR:
 
         self.cal_rec_boxes = CalRecBoxes()
 
+    @staticmethod
+    def load_config(config_path: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        if config_path is not None and Path(config_path).exists():
+            config = read_yaml(config_path)
+        else:
+            config = read_yaml(DEFAULT_CFG_PATH)
+        config = update_model_path(config)
+
+        if kwargs:
+            updater = UpdateParameters()
+            config = updater(config, **kwargs)
+        return config
+
+    @classmethod
+    def share_weights(cls, config_path: Optional[str] = None, **kwargs):
+        """Load det/cls/rec weights into shared memory, call before forking workers."""
+        config = cls.load_config(config_path, **kwargs)
+        for module in ("Det", "Cls", "Rec"):
+            share_model_weights(config[module]["model_path"])
+
     def __call__(
         self,
         img_content: Union[str, np.ndarray, bytes, Path],
         use_det: Optional[bool] = None,
         use_cls: Optional[bool] = None,
         use_rec: Optional[bool] = None,
+        options: Optional[OCROptions] = None,
         **kwargs,
     ) -> Tuple[Optional[List[List[Union[Any, str]]]], Optional[List[float]]]:
         use_det = self.use_det if use_det is None else use_det
         use_cls = self.use_cls if use_cls is None else use_cls
         use_rec = self.use_rec if use_rec is None else use_rec
-        return_word_box = False
-        if kwargs:
-            box_thresh = kwargs.get("box_thresh", 0.5)
-            unclip_ratio = kwargs.get("unclip_ratio", 1.6)
-            text_score = kwargs.get("text_score", 0.5)
-            return_word_box = kwargs.get("return_word_box", False)
-            self.text_det.postprocess_op.box_thresh = box_thresh
-            self.text_det.postprocess_op.unclip_ratio = unclip_ratio
-            self.text_score = text_score
 
-        img = self.load_img(img_content)
+        # Request-scoped options, the shared model state is never mutated
+        options = (options or self.default_options).update(**kwargs)
+
+        state = self.det_stage(img_content, use_det, options)
+        if state is None:
+            return None, None
+
+        if use_cls:
+            self.cls_stage(state)
+
+        if use_rec:
+            self.rec_stage(state)
+        return self.final_stage(state)
+
+    def ocr_batch(
+        self,
+        img_contents: List[Union[str, np.ndarray, bytes, Path]],
+        use_det: Optional[bool] = None,
+        use_cls: Optional[bool] = None,
+        use_rec: Optional[bool] = None,
+        options: Optional[OCROptions] = None,
+        **kwargs,
+    ) -> List[Tuple[Optional[List[List[Union[Any, str]]]], Optional[List[float]]]]:
+        """OCR many images at once, pooling the crops of all images into shared
+        cls / rec batches. Returns one ``__call__`` style result per image."""
+        use_det = self.use_det if use_det is None else use_det
+        use_cls = self.use_cls if use_cls is None else use_cls
+        use_rec = self.use_rec if use_rec is None else use_rec
+        options = (options or self.default_options).update(**kwargs)
+
+        states = [self.det_stage(img, use_det, options) for img in img_contents]
+        active = [state for state in states if state is not None]
+
+        # Without det the whole image is the single crop
+        for state in active:
+            if isinstance(state["img"], np.ndarray):
+                state["img"] = [state["img"]]
+
+        if use_cls and active:
+            options.check_cancelled("cls")
+            crops = [crop for state in active for crop in state["img"]]
+            crops, cls_res, cls_elapse = self.text_cls(crops)
+            for state, (beg, end) in zip(active, self._split_ranges(active)):
+                state["img"] = crops[beg:end]
+                state["cls_res"] = cls_res[beg:end]
+                state["cls_elapse"] = cls_elapse
+
+        if use_rec and active:
+            options.check_cancelled("rec")
+            crops = [crop for state in active for crop in state["img"]]
+            rec_res, rec_elapse = self.text_rec_runner(
+                crops, options.return_word_box, options.cancel_token
+            )
+            for state, (beg, end) in zip(active, self._split_ranges(active)):
+                state["rec_res"] = rec_res[beg:end]
+                state["rec_elapse"] = rec_elapse
+
+        return [
+            (None, None) if state is None else self.final_stage(state)
+            for state in states
+        ]
+
+    @staticmethod
+    def _split_ranges(states: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+        ranges, beg = [], 0
+        for state in states:
+            ranges.append((beg, beg + len(state["img"])))
+            beg += len(state["img"])
+        return ranges
+
+    def det_stage(
+        self,
+        img_content: Union[str, np.ndarray, bytes, Path],
+        use_det: bool,
+        options: OCROptions,
+    ) -> Optional[Dict[str, Any]]:
+        """Load, preprocess, detect and crop. Returns None if no text is found."""
+        options.check_cancelled("det")
+        img, raw_h, raw_w = self.load_img.load_reduced(img_content, self.max_side_len)
 
-        raw_h, raw_w = img.shape[:2]
         op_record = {}
+        h, w = img.shape[:2]
+        if (h, w) != (raw_h, raw_w):
+            op_record["decode"] = {"ratio_h": raw_h / h, "ratio_w": raw_w / w}
         img, ratio_h, ratio_w = self.preprocess(img)
         op_record["preprocess"] = {"ratio_h": ratio_h, "ratio_w": ratio_w}
 
-        dt_boxes, cls_res, rec_res = None, None, None
-        det_elapse, cls_elapse, rec_elapse = 0.0, 0.0, 0.0
-
+        dt_boxes, det_elapse = None, 0.0
         if use_det:
             img, op_record = self.maybe_add_letterbox(img, op_record)
-            dt_boxes, det_elapse = self.auto_text_det(img)
+            dt_boxes, det_elapse = self.auto_text_det(img, options)
             if dt_boxes is None:
-                return None, None
+                return None
 
             img = self.get_crop_img_list(img, dt_boxes)
 
-        if use_cls:
-            img, cls_res, cls_elapse = self.text_cls(img)
+        return {
+            "img": img,
+            "raw_h": raw_h,
+            "raw_w": raw_w,
+            "op_record": op_record,
+            "options": options,
+            "dt_boxes": dt_boxes,
+            "cls_res": None,
+            "rec_res": None,
+            "det_elapse": det_elapse,
+            "cls_elapse": 0.0,
+            "rec_elapse": 0.0,
+        }
+
+    def cls_stage(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        state["options"].check_cancelled("cls")
+        state["img"], state["cls_res"], state["cls_elapse"] = self.text_cls(
+            state["img"]
+        )
+        return state
 
-        if use_rec:
-            rec_res, rec_elapse = self.text_rec(img, return_word_box)
+    def rec_stage(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        options = state["options"]
+        options.check_cancelled("rec")
 
-        if dt_boxes is not None and rec_res is not None and return_word_box:
+        state["rec_res"], state["rec_elapse"] = self.text_rec_runner(
+            state["img"], options.return_word_box, options.cancel_token
+        )
+        return state
+
+    def final_stage(
+        self, state: Dict[str, Any]
+    ) -> Tuple[Optional[List[List[Union[Any, str]]]], Optional[List[float]]]:
+        img, dt_boxes, rec_res = state["img"], state["dt_boxes"], state["rec_res"]
+        op_record, raw_h, raw_w = state["op_record"], state["raw_h"], state["raw_w"]
+        options = state["options"]
+
+        if dt_boxes is not None and rec_res is not None and options.return_word_box:
             rec_res = self.cal_rec_boxes(img, dt_boxes, rec_res)
             for rec_res_i in rec_res:
                 if rec_res_i[2]:
@@ -121,10 +263,26 @@ class RapidOCR:
             dt_boxes = self._get_origin_points(dt_boxes, op_record, raw_h, raw_w)
 
         ocr_res = self.get_final_res(
-            dt_boxes, cls_res, rec_res, det_elapse, cls_elapse, rec_elapse
+            dt_boxes,
+            state["cls_res"],
+            rec_res,
+            state["det_elapse"],
+            state["cls_elapse"],
+            state["rec_elapse"],
+            options,
         )
         return ocr_res
 
+    @property
+    def text_rec_runner(self):
+        return self.text_rec_cache or self.text_rec_scheduler or self.text_rec
+
+    def close(self):
+        if self.text_det_scheduler is not None:
+            self.text_det_scheduler.close()
+        if self.text_rec_scheduler is not None:
+            self.text_rec_scheduler.close()
+
     def preprocess(self, img: np.ndarray) -> Tuple[np.ndarray, float, float]:
         h, w = img.shape[:2]
         max_value = max(h, w)
@@ -163,9 +321,10 @@ class RapidOCR:
         return padding_h
 
     def auto_text_det(
-        self, img: np.ndarray
+        self, img: np.ndarray, options: Optional[OCROptions] = None
     ) -> Tuple[Optional[List[np.ndarray]], float]:
-        dt_boxes, det_elapse = self.text_det(img)
+        text_det = self.text_det_scheduler or self.text_det
+        dt_boxes, det_elapse = text_det(img, options)
         if dt_boxes is None or len(dt_boxes) < 1:
             return None, 0.0
 
@@ -256,7 +415,7 @@ class RapidOCR:
                 top, left = v.get("top"), v.get("left")
                 dt_boxes_array[:, :, 0] -= left
                 dt_boxes_array[:, :, 1] -= top
-            elif "preprocess" in op:
+            elif "preprocess" in op or "decode" in op:
                 ratio_h = v.get("ratio_h")
                 ratio_w = v.get("ratio_w")
                 dt_boxes_array[:, :, 0] *= ratio_w
@@ -279,6 +438,7 @@ class RapidOCR:
         det_elapse: float,
         cls_elapse: float,
         rec_elapse: float,
+        options: Optional[OCROptions] = None,
     ) -> Tuple[Optional[List[List[Union[Any, str]]]], Optional[List[float]]]:
         if dt_boxes is None and rec_res is None and cls_res is not None:
             return cls_res, [cls_elapse]
@@ -292,7 +452,7 @@ class RapidOCR:
         if dt_boxes is not None and rec_res is None:
             return [box.tolist() for box in dt_boxes], [det_elapse]
 
-        dt_boxes, rec_res = self.filter_result(dt_boxes, rec_res)
+        dt_boxes, rec_res = self.filter_result(dt_boxes, rec_res, options)
         if not dt_boxes or not rec_res or len(dt_boxes) <= 0:
             return None, None
 
@@ -307,14 +467,17 @@ class RapidOCR:
         self,
         dt_boxes: Optional[List[np.ndarray]],
         rec_res: Optional[List[Tuple[str, float]]],
+        options: Optional[OCROptions] = None,
     ) -> Tuple[Optional[List[np.ndarray]], Optional[List[Tuple[str, float]]]]:
         if dt_boxes is None or rec_res is None:
             return None, None
 
+        text_score = (options or self.default_options).text_score
+
         filter_boxes, filter_rec_res = [], []
         for box, rec_reuslt in zip(dt_boxes, rec_res):
             text, score = rec_reuslt[0], rec_reuslt[1]
-            if float(score) >= self.text_score:
+            if float(score) >= text_score:
                 filter_boxes.append(box)
                 filter_rec_res.append(rec_reuslt)
 
@@ -0,0 +1,177 @@
+# -*- encoding: utf-8 -*-
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .main import RapidOCR
+from .utils import OCROptions, get_logger
+
+logger = get_logger("OCRPipeline")
+
+_STOP = object()
+
+
+class PipelineJob:
+    def __init__(
+        self,
+        img_content: Union[str, np.ndarray, bytes, Path],
+        use_det: bool,
+        use_cls: bool,
+        use_rec: bool,
+        options: OCROptions,
+    ):
+        self.img_content = img_content
+        self.use_det = use_det
+        self.use_cls = use_cls
+        self.use_rec = use_rec
+        self.options = options
+        self.state: Optional[Dict[str, Any]] = None
+        self.future: Future = Future()
+
+
+class StageWorker:
+    """One thread running a single stage, fed by a bounded queue."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[PipelineJob], bool],
+        in_queue: "queue.Queue[Any]",
+        out_queue: Optional["queue.Queue[Any]"] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+
+        self.processed = 0
+        self.busy_time = 0.0
+        self.start_time = time.perf_counter()
+
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            job = self.in_queue.get()
+            if job is _STOP:
+                if self.out_queue is not None:
+                    self.out_queue.put(_STOP)
+                return
+
+            start_time = time.perf_counter()
+            try:
+                forward = self.func(job)
+            except Exception as e:
+                job.future.set_exception(e)
+                forward = False
+            self.busy_time += time.perf_counter() - start_time
+            self.processed += 1
+
+            if forward and self.out_queue is not None:
+                self.out_queue.put(job)
+
+    def stats(self) -> Dict[str, Any]:
+        wall_time = time.perf_counter() - self.start_time
+        return {
+            "queue_depth": self.in_queue.qsize(),
+            "queue_size": self.in_queue.maxsize,
+            "processed": self.processed,
+            "utilization": round(self.busy_time / wall_time, 4) if wall_time else 0.0,
+        }
+
+
+class OCRPipeline:
+    """Run det -> cls -> rec of a RapidOCR on one worker per stage.
+
+    Stages are connected by bounded queues so the detection of request N+1
+    overlaps the classification / recognition of request N. Drop-in
+    replacement for ``RapidOCR.__call__``; callers block while the first
+    queue is full.
+    """
+
+    def __init__(self, ocr: RapidOCR, queue_size: int = 4):
+        self.ocr = ocr
+
+        queue_size = max(1, int(queue_size))
+        det_queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        cls_queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        rec_queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+
+        self.stages: List[StageWorker] = [
+            StageWorker("det", self._det, det_queue, cls_queue),
+            StageWorker("cls", self._cls, cls_queue, rec_queue),
+            StageWorker("rec", self._rec, rec_queue),
+        ]
+        self._closed = False
+
+    def __call__(
+        self,
+        img_content: Union[str, np.ndarray, bytes, Path],
+        use_det: Optional[bool] = None,
+        use_cls: Optional[bool] = None,
+        use_rec: Optional[bool] = None,
+        options: Optional[OCROptions] = None,
+        **kwargs,
+    ) -> Tuple[Optional[List[List[Union[Any, str]]]], Optional[List[float]]]:
+        if self._closed:
+            raise RuntimeError("OCRPipeline is closed")
+
+        job = PipelineJob(
+            img_content,
+            self.ocr.use_det if use_det is None else use_det,
+            self.ocr.use_cls if use_cls is None else use_cls,
+            self.ocr.use_rec if use_rec is None else use_rec,
+            (options or self.ocr.default_options).update(**kwargs),
+        )
+        self.stages[0].in_queue.put(job)
+        return job.future.result()
+
+    def ocr_batch(
+        self,
+        img_contents: List[Union[str, np.ndarray, bytes, Path]],
+        use_det: Optional[bool] = None,
+        use_cls: Optional[bool] = None,
+        use_rec: Optional[bool] = None,
+        options: Optional[OCROptions] = None,
+        **kwargs,
+    ) -> List[Tuple[Optional[List[List[Union[Any, str]]]], Optional[List[float]]]]:
+        """Batches already share cls / rec runs, so they bypass the stage workers."""
+        return self.ocr.ocr_batch(
+            img_contents, use_det, use_cls, use_rec, options, **kwargs
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.stages[0].in_queue.put(_STOP)
+        for stage in self.stages:
+            stage.thread.join()
+        self.ocr.close()
+
+    def _det(self, job: PipelineJob) -> bool:
+        job.state = self.ocr.det_stage(job.img_content, job.use_det, job.options)
+        if job.state is None:
+            job.future.set_result((None, None))
+            return False
+        return True
+
+    def _cls(self, job: PipelineJob) -> bool:
+        if job.use_cls:
+            self.ocr.cls_stage(job.state)
+        return True
+
+    def _rec(self, job: PipelineJob) -> bool:
+        if job.use_rec:
+            self.ocr.rec_stage(job.state)
+        job.future.set_result(self.ocr.final_stage(job.state))
+        return False
@@ -6,10 +6,14 @@ from typing import Dict, Union
 
 import yaml
 
+from .batch_scheduler import BatchItem, BatchScheduler
+from .cancellation import CancelToken, OCRCancelledError
 from .infer_engine import OrtInferSession
 from .load_image import LoadImage, LoadImageError
 from .logger import get_logger
+from .ocr_options import OCROptions
 from .parse_parameters import UpdateParameters, init_args, update_model_path
+from .shared_weights import SharedModel, get_shared_model, share_model_weights
 from .process_img import add_round_letterbox, increase_min_side, reduce_max_side
 from .vis_res import VisRes
 
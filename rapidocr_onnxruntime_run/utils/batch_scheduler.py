@@ -0,0 +1,129 @@
+# -*- encoding: utf-8 -*-
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, List, Optional
+
+from .cancellation import CancelToken, OCRCancelledError
+from .logger import get_logger
+
+_STOP = object()
+
+
+class BatchItem:
+    def __init__(
+        self,
+        payload: Any,
+        future: Future,
+        size: int,
+        cancel_token: Optional[CancelToken] = None,
+    ):
+        self.payload = payload
+        self.future = future
+        self.size = size
+        self.cancel_token = cancel_token
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token is not None and self.cancel_token.cancelled
+
+
+class BatchScheduler:
+    """Collect work submitted from many threads and run it in shared batches.
+
+    A background worker waits for the first pending item, then keeps pulling
+    items until either ``max_batch_size`` units are collected or ``max_wait_ms``
+    has passed since the first one arrived. Items whose cancel token has
+    fired are failed with ``OCRCancelledError`` instead of being processed.
+    Subclasses implement ``process`` and resolve the future of every item
+    they receive.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float, name: str):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.logger = get_logger(name)
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(
+        self, payload: Any, cancel_token: Optional[CancelToken] = None
+    ) -> Future:
+        if self._closed:
+            raise RuntimeError(f"{self._worker.name} is closed")
+
+        future: Future = Future()
+        self._queue.put(
+            BatchItem(payload, future, self.item_size(payload), cancel_token)
+        )
+        return future
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def item_size(self, payload: Any) -> int:
+        return 1
+
+    def process(self, items: List[BatchItem]):
+        raise NotImplementedError
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            items, size = [first], first.size
+            deadline = time.perf_counter() + self.max_wait
+            stop = False
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if item is _STOP:
+                    stop = True
+                    break
+                items.append(item)
+                size += item.size
+
+            self._dispatch(items)
+            if stop:
+                return
+
+    def _dispatch(self, items: List[BatchItem]):
+        items = [item for item in items if item.future.set_running_or_notify_cancel()]
+
+        # Drop expired / cancelled work before it reaches the model
+        pending = []
+        for item in items:
+            if item.cancelled:
+                item.future.set_exception(
+                    OCRCancelledError(f"cancelled before {self._worker.name}")
+                )
+            else:
+                pending.append(item)
+        items = pending
+        if not items:
+            return
+
+        try:
+            self.process(items)
+        except Exception as e:
+            self.logger.exception("batch processing failed: %s", e)
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
@@ -0,0 +1,58 @@
+# -*- encoding: utf-8 -*-
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class OCRCancelledError(Exception):
+    pass
+
+
+class CancelToken:
+    """Deadline and cancel flag of one request, checked between stages.
+
+    ``deadline`` is a ``time.time()`` timestamp so it stays meaningful in
+    other processes. Only the deadline and the current cancel state survive
+    pickling; a later ``cancel()`` is not seen by a copy.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self._event = threading.Event()
+
+    @classmethod
+    def from_timeout(cls, timeout: Optional[float]) -> "CancelToken":
+        if timeout is None or timeout <= 0:
+            return cls()
+        return cls(time.time() + timeout)
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or self.expired
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    def check(self, where: str = ""):
+        if self._event.is_set():
+            raise OCRCancelledError(f"request cancelled before {where}".strip())
+        if self.expired:
+            raise OCRCancelledError(f"deadline exceeded before {where}".strip())
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"deadline": self.deadline, "cancelled": self._event.is_set()}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.deadline = state["deadline"]
+        self._event = threading.Event()
+        if state["cancelled"]:
+            self._event.set()
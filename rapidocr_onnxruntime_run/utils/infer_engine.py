@@ -3,6 +3,7 @@
 # @Contact: liekkaskono@163.com
 import os
 import platform
+import queue
 import traceback
 from enum import Enum
 from pathlib import Path
@@ -18,6 +19,7 @@ from onnxruntime import (
 )
 
 from .logger import get_logger
+from .shared_weights import get_shared_model
 
 
 class EP(Enum):
@@ -31,6 +33,15 @@ class EP(Enum):
 USE_GPU = os.getenv("OCR_USE_GPU", "true").lower() == "true"
 HIP_INDEX = int(os.getenv("OCR_HIP_INDEX", "0"))
 
+# Metadata and output names of models folded by utils/model_surgery.py
+META_INPUT = "rapidocr_input"
+META_DET_THRESH = "rapidocr_det_thresh"
+META_REC_OUTPUT = "rapidocr_rec_output"
+UINT8_NHWC = "uint8_nhwc"
+DET_MASK_OUTPUT = "det_mask"
+REC_INDICES_OUTPUT = "rec_indices"
+REC_PROBS_OUTPUT = "rec_probs"
+
 
 class OrtInferSession:
     def __init__(self, config: Dict[str, Any]):
@@ -49,16 +60,40 @@ class OrtInferSession:
         self.had_providers: List[str] = get_available_providers()
         EP_list = self._get_ep_list()
 
-        sess_opt = self._init_sess_opts(config)
-        self.session = InferenceSession(
-            model_path,
-            sess_options=sess_opt,
-            providers=EP_list,
-        )
+        # 会话副本池: 每个副本独占一部分CPU核, 并发请求借出/归还副本
+        self.num_replicas = max(1, int(config.get("session_replicas", 1)))
+        shared_model = get_shared_model(model_path)
+
+        self.sessions: List[InferenceSession] = []
+        self._shared_values = []
+        for replica_no in range(self.num_replicas):
+            sess_opt = self._init_sess_opts(config, replica_no, self.num_replicas)
+
+            # 多进程部署时使用 fork 前加载到共享内存中的权重
+            model = model_path
+            if shared_model is not None:
+                self._shared_values.extend(shared_model.add_to(sess_opt))
+                model = shared_model.model_bytes
+
+            self.sessions.append(
+                InferenceSession(
+                    model,
+                    sess_options=sess_opt,
+                    providers=EP_list,
+                )
+            )
+
+        self.session = self.sessions[0]
+        self.metadata: Dict[str, str] = self.session.get_modelmeta().custom_metadata_map
+        self._idle_sessions: "queue.Queue[InferenceSession]" = queue.Queue()
+        for session in self.sessions:
+            self._idle_sessions.put(session)
         self._verify_providers()
 
     @staticmethod
-    def _init_sess_opts(config: Dict[str, Any]) -> SessionOptions:
+    def _init_sess_opts(
+        config: Dict[str, Any], replica_no: int = 0, num_replicas: int = 1
+    ) -> SessionOptions:
         sess_opt = SessionOptions()
         sess_opt.log_severity_level = 4
         sess_opt.enable_cpu_mem_arena = False
@@ -66,15 +101,42 @@ class OrtInferSession:
 
         cpu_nums = os.cpu_count()
         intra_op_num_threads = config.get("intra_op_num_threads", -1)
+        if num_replicas > 1 and intra_op_num_threads == -1:
+            intra_op_num_threads = max(1, cpu_nums // num_replicas)
+
         if intra_op_num_threads != -1 and 1 <= intra_op_num_threads <= cpu_nums:
             sess_opt.intra_op_num_threads = intra_op_num_threads
 
+            if num_replicas > 1 and config.get("replica_cpu_affinity", False):
+                affinities = OrtInferSession._get_thread_affinities(
+                    replica_no, intra_op_num_threads
+                )
+                if affinities:
+                    sess_opt.add_session_config_entry(
+                        "session.intra_op_thread_affinities", affinities
+                    )
+
         inter_op_num_threads = config.get("inter_op_num_threads", -1)
         if inter_op_num_threads != -1 and 1 <= inter_op_num_threads <= cpu_nums:
             sess_opt.inter_op_num_threads = inter_op_num_threads
 
         return sess_opt
 
+    @staticmethod
+    def _get_thread_affinities(replica_no: int, num_threads: int) -> str:
+        """Pin the pool threads of one replica to its own slice of cores.
+
+        ORT expects one entry per pool thread (the calling thread is not part
+        of the pool), with 1-based logical processor ids separated by ``;``.
+        """
+        if not hasattr(os, "sched_getaffinity"):
+            return ""
+
+        cores = sorted(os.sched_getaffinity(0))
+        start = replica_no * num_threads
+        replica_cores = [cores[(start + i) % len(cores)] for i in range(num_threads)]
+        return ";".join(str(core + 1) for core in replica_cores[1:])
+
     def _get_ep_list(self) -> List[Tuple[str, Dict[str, Any]]]:
         cpu_provider_opts = {
             "arena_extend_strategy": "kSameAsRequested",
@@ -207,8 +269,20 @@ class OrtInferSession:
 
     def __call__(self, input_content: np.ndarray) -> np.ndarray:
         input_dict = dict(zip(self.get_input_names(), [input_content]))
+        if self.num_replicas == 1:
+            return self._run(self.session, input_dict)
+
+        session = self._idle_sessions.get()
         try:
-            return self.session.run(self.get_output_names(), input_dict)
+            return self._run(session, input_dict)
+        finally:
+            self._idle_sessions.put(session)
+
+    def _run(
+        self, session: InferenceSession, input_dict: Dict[str, np.ndarray]
+    ) -> np.ndarray:
+        try:
+            return session.run(self.get_output_names(), input_dict)
         except Exception as e:
             error_info = traceback.format_exc()
             raise ONNXRuntimeError(error_info) from e
@@ -220,15 +294,21 @@ class OrtInferSession:
         return [v.name for v in self.session.get_outputs()]
 
     def get_character_list(self, key: str = "character") -> List[str]:
-        meta_dict = self.session.get_modelmeta().custom_metadata_map
-        return meta_dict[key].splitlines()
+        return self.metadata[key].splitlines()
 
     def have_key(self, key: str = "character") -> bool:
-        meta_dict = self.session.get_modelmeta().custom_metadata_map
-        if key in meta_dict.keys():
+        if key in self.metadata.keys():
             return True
         return False
 
+    @property
+    def uint8_input(self) -> bool:
+        """The model takes raw uint8 [N, H, W, 3] images and normalizes in the graph."""
+        return self.metadata.get(META_INPUT) == UINT8_NHWC
+
+    def has_output(self, name: str) -> bool:
+        return name in self.get_output_names()
+
     @staticmethod
     def _verify_model(model_path: Union[str, Path, None]):
         if model_path is None:
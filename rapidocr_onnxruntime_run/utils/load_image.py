@@ -1,9 +1,10 @@
 # -*- encoding: utf-8 -*-
 # @Author: SWHL
 # @Contact: liekkaskono@163.com
+import math
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
 
 import cv2
 import numpy as np
@@ -28,18 +29,33 @@ class LoadImage:
         img = self.convert_img(img, origin_img_type)
         return img
 
-    def load_img(self, img: InputType) -> np.ndarray:
-        if isinstance(img, (str, Path)):
-            self.verify_exist(img)
-            try:
-                img = self.img_to_ndarray(Image.open(img))
-            except UnidentifiedImageError as e:
-                raise LoadImageError(f"cannot identify image file {img}") from e
-            return img
+    def load_reduced(
+        self, img: InputType, max_side_len: Optional[int] = None
+    ) -> Tuple[np.ndarray, int, int]:
+        """Load the image, decoding files larger than max_side_len at a reduced
+        scale where the format supports it (JPEG DCT scaling).
+        Returns the image and the height and width of the original image."""
+        if not isinstance(img, (str, Path, bytes)) or not max_side_len:
+            img = self(img)
+            return img, img.shape[0], img.shape[1]
 
-        if isinstance(img, bytes):
-            img = self.img_to_ndarray(Image.open(BytesIO(img)))
-            return img
+        origin_img_type = type(img)
+        pil_img = self.open_img(img)
+        raw_w, raw_h = pil_img.size
+        if max(raw_h, raw_w) > max_side_len:
+            # The decoded image is never smaller than the requested size,
+            # so the det input resolution stays the same.
+            ratio = max_side_len / max(raw_h, raw_w)
+            pil_img.draft(
+                pil_img.mode, (math.ceil(raw_w * ratio), math.ceil(raw_h * ratio))
+            )
+
+        img = self.convert_img(self.img_to_ndarray(pil_img), origin_img_type)
+        return img, raw_h, raw_w
+
+    def load_img(self, img: InputType) -> np.ndarray:
+        if isinstance(img, (str, Path, bytes)):
+            return self.img_to_ndarray(self.open_img(img))
 
         if isinstance(img, np.ndarray):
             return img
@@ -49,6 +65,16 @@ class LoadImage:
 
         raise LoadImageError(f"{type(img)} is not supported!")
 
+    def open_img(self, img: Union[str, Path, bytes]) -> Image.Image:
+        if isinstance(img, bytes):
+            return Image.open(BytesIO(img))
+
+        self.verify_exist(img)
+        try:
+            return Image.open(img)
+        except UnidentifiedImageError as e:
+            raise LoadImageError(f"cannot identify image file {img}") from e
+
     def img_to_ndarray(self, img: Image.Image) -> np.ndarray:
         if img.mode == "1":
             img = img.convert("L")
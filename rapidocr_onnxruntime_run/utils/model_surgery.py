@@ -0,0 +1,239 @@
+# -*- encoding: utf-8 -*-
+"""Fold pre/post-processing into the det/cls/rec ONNX graphs.
+
+The folded models take the raw uint8 BGR image batch as ``[N, H, W, 3]``
+and do the cast, HWC -> CHW transpose and per-channel normalization in the
+graph. The rec model outputs the per-step argmax indices and max probs
+instead of the full softmax, the det model additionally outputs the
+thresholded mask. ``OrtInferSession`` recognizes folded models by their
+metadata, so they are drop-in replacements::
+
+    python -m rapidocr_onnxruntime_run.utils.model_surgery \\
+        --det models/ch_PP-OCRv4_det_infer.onnx \\
+        --cls models/ch_ppocr_mobile_v2.0_cls_infer.onnx \\
+        --rec models/ch_PP-OCRv4_rec_infer.onnx \\
+        --output_dir models/folded
+"""
+import argparse
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from . import read_yaml
+from .infer_engine import (
+    DET_MASK_OUTPUT,
+    META_DET_THRESH,
+    META_INPUT,
+    META_REC_OUTPUT,
+    REC_INDICES_OUTPUT,
+    REC_PROBS_OUTPUT,
+    UINT8_NHWC,
+)
+
+try:
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+except ImportError as e:
+    raise ImportError("Model surgery requires the onnx package, run `pip install onnx`.") from e
+
+root_dir = Path(__file__).resolve().parent.parent
+DEFAULT_CONFIG = root_dir / "config.yaml"
+
+
+def fold_input(model: "onnx.ModelProto", mean: Sequence[float], std: Sequence[float]):
+    """Replace the float NCHW input by a uint8 NHWC one, normalized in the graph."""
+    graph = model.graph
+    if _get_metadata(model, META_INPUT) == UINT8_NHWC:
+        raise ValueError(f"{graph.name} already takes {UINT8_NHWC} input")
+
+    old_input = graph.input[0]
+    dims = _get_dims(old_input)
+    if len(dims) != 4 or dims[1] != 3:
+        raise ValueError(f"Expected a [N, 3, H, W] input, got {old_input.name} {dims}")
+
+    name = old_input.name
+    new_name = f"{name}_uint8"
+    new_input = helper.make_tensor_value_info(
+        new_name, TensorProto.UINT8, [dims[0], dims[2], dims[3], dims[1]]
+    )
+
+    mean = np.array(mean, dtype=np.float32)
+    std = np.array(std, dtype=np.float32)
+    alpha = (1 / 255.0 / std).astype(np.float32).reshape(1, 3, 1, 1)
+    beta = (-mean / std).astype(np.float32).reshape(1, 3, 1, 1)
+    graph.initializer.extend(
+        [
+            numpy_helper.from_array(alpha, f"{name}_alpha"),
+            numpy_helper.from_array(beta, f"{name}_beta"),
+        ]
+    )
+
+    prefix = [
+        helper.make_node("Cast", [new_name], [f"{name}_float"], to=TensorProto.FLOAT),
+        helper.make_node(
+            "Transpose", [f"{name}_float"], [f"{name}_nchw"], perm=[0, 3, 1, 2]
+        ),
+        helper.make_node("Mul", [f"{name}_nchw", f"{name}_alpha"], [f"{name}_scaled"]),
+        helper.make_node("Add", [f"{name}_scaled", f"{name}_beta"], [name]),
+    ]
+    nodes = prefix + list(graph.node)
+    del graph.node[:]
+    graph.node.extend(nodes)
+
+    graph.input.remove(old_input)
+    graph.input.insert(0, new_input)
+    _set_metadata(model, META_INPUT, UINT8_NHWC)
+
+
+def fold_det_model(
+    model: "onnx.ModelProto",
+    mean: Sequence[float],
+    std: Sequence[float],
+    thresh: float,
+) -> "onnx.ModelProto":
+    """uint8 input, and the binarized mask (prob > thresh) next to the prob map."""
+    fold_input(model, mean, std)
+
+    graph = model.graph
+    prob = graph.output[0]
+    graph.initializer.append(
+        numpy_helper.from_array(np.array(thresh, dtype=np.float32), "det_thresh")
+    )
+    graph.node.append(
+        helper.make_node("Greater", [prob.name, "det_thresh"], [DET_MASK_OUTPUT])
+    )
+    graph.output.append(
+        helper.make_tensor_value_info(DET_MASK_OUTPUT, TensorProto.BOOL, _get_dims(prob))
+    )
+    _set_metadata(model, META_DET_THRESH, repr(float(thresh)))
+    return model
+
+
+def fold_cls_model(model: "onnx.ModelProto") -> "onnx.ModelProto":
+    """uint8 input, the [N, 2] probs output is already minimal."""
+    fold_input(model, [0.5, 0.5, 0.5], [0.5, 0.5, 0.5])
+    return model
+
+
+def fold_rec_model(model: "onnx.ModelProto") -> "onnx.ModelProto":
+    """uint8 input, per-step argmax indices and max probs instead of the softmax."""
+    fold_input(model, [0.5, 0.5, 0.5], [0.5, 0.5, 0.5])
+
+    graph = model.graph
+    probs = graph.output[0]
+    dims = _get_dims(probs)
+    if len(dims) != 3:
+        raise ValueError(f"Expected a [N, T, C] output, got {probs.name} {dims}")
+
+    graph.node.append(
+        helper.make_node(
+            "ArgMax", [probs.name], [REC_INDICES_OUTPUT], axis=2, keepdims=0
+        )
+    )
+    if _get_opset(model) >= 18:
+        graph.initializer.append(
+            numpy_helper.from_array(np.array([2], dtype=np.int64), "rec_reduce_axes")
+        )
+        reduce_max = helper.make_node(
+            "ReduceMax", [probs.name, "rec_reduce_axes"], [REC_PROBS_OUTPUT], keepdims=0
+        )
+    else:
+        reduce_max = helper.make_node(
+            "ReduceMax", [probs.name], [REC_PROBS_OUTPUT], axes=[2], keepdims=0
+        )
+    graph.node.append(reduce_max)
+
+    del graph.output[:]
+    graph.output.extend(
+        [
+            helper.make_tensor_value_info(REC_INDICES_OUTPUT, TensorProto.INT64, dims[:2]),
+            helper.make_tensor_value_info(REC_PROBS_OUTPUT, TensorProto.FLOAT, dims[:2]),
+        ]
+    )
+    _set_metadata(model, META_REC_OUTPUT, "argmax")
+    return model
+
+
+def _get_dims(value_info: "onnx.ValueInfoProto") -> list:
+    return [
+        d.dim_param or (d.dim_value if d.HasField("dim_value") else None)
+        for d in value_info.type.tensor_type.shape.dim
+    ]
+
+
+def _get_opset(model: "onnx.ModelProto") -> int:
+    for opset in model.opset_import:
+        if opset.domain in ("", "ai.onnx"):
+            return opset.version
+    return 0
+
+
+def _get_metadata(model: "onnx.ModelProto", key: str) -> Optional[str]:
+    for prop in model.metadata_props:
+        if prop.key == key:
+            return prop.value
+    return None
+
+
+def _set_metadata(model: "onnx.ModelProto", key: str, value: str):
+    for prop in model.metadata_props:
+        if prop.key == key:
+            prop.value = value
+            return
+    model.metadata_props.add(key=key, value=value)
+
+
+def save_model(model: "onnx.ModelProto", input_path: Path, output_dir: Optional[str]) -> Path:
+    onnx.checker.check_model(model)
+    output_dir = Path(output_dir) if output_dir else input_path.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"{input_path.stem}_u8.onnx"
+    onnx.save(model, str(output_path))
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--config_path", type=str, default=str(DEFAULT_CONFIG))
+    parser.add_argument("--det", type=str, default=None, help="det model to fold")
+    parser.add_argument("--cls", type=str, default=None, help="cls model to fold")
+    parser.add_argument("--rec", type=str, default=None, help="rec model to fold")
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default=None,
+        help="defaults to the directory of each input model",
+    )
+    args = parser.parse_args()
+
+    if not (args.det or args.cls or args.rec):
+        parser.error("at least one of --det, --cls, --rec is required")
+
+    config = read_yaml(args.config_path)
+    det_config = config["Det"]
+
+    for module, model_path in (("det", args.det), ("cls", args.cls), ("rec", args.rec)):
+        if not model_path:
+            continue
+
+        model_path = Path(model_path)
+        model = onnx.load(str(model_path))
+        if module == "det":
+            fold_det_model(
+                model,
+                det_config.get("mean") or [0.5, 0.5, 0.5],
+                det_config.get("std") or [0.5, 0.5, 0.5],
+                det_config.get("thresh", 0.3),
+            )
+        elif module == "cls":
+            fold_cls_model(model)
+        else:
+            fold_rec_model(model)
+
+        output_path = save_model(model, model_path, args.output_dir)
+        print(f"{model_path} -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# -*- encoding: utf-8 -*-
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Dict, Optional
+
+from .cancellation import CancelToken
+
+
+@dataclass(frozen=True)
+class OCROptions:
+    """Per-call options, passed down instead of mutating shared model state."""
+
+    text_score: float = 0.5
+    box_thresh: float = 0.5
+    unclip_ratio: float = 1.6
+    return_word_box: bool = False
+    cancel_token: Optional[CancelToken] = field(default=None, compare=False)
+
+    def update(self, **kwargs: Any) -> "OCROptions":
+        """Return a copy overridden by the known keys of ``kwargs``."""
+        names = {f.name for f in fields(self)}
+        changes: Dict[str, Any] = {
+            k: v for k, v in kwargs.items() if k in names and v is not None
+        }
+        if not changes:
+            return self
+        return replace(self, **changes)
+
+    def check_cancelled(self, where: str = ""):
+        """Raise ``OCRCancelledError`` if the request was cancelled or expired."""
+        if self.cancel_token is not None:
+            self.cancel_token.check(where)
@@ -41,6 +41,10 @@ def init_args():
 
     global_group.add_argument("--intra_op_num_threads", type=int, default=-1)
     global_group.add_argument("--inter_op_num_threads", type=int, default=-1)
+    global_group.add_argument("--session_replicas", type=int, default=1)
+    global_group.add_argument(
+        "--replica_cpu_affinity", action="store_true", default=False
+    )
 
     det_group = parser.add_argument_group(title="Det")
     det_group.add_argument("--det_use_cuda", action="store_true", default=False)
@@ -59,6 +63,9 @@ def init_args():
     det_group.add_argument(
         "--det_score_mode", type=str, default="fast", choices=["slow", "fast"]
     )
+    det_group.add_argument("--det_batch_scheduler", action="store_true", default=False)
+    det_group.add_argument("--det_batch_max_size", type=int, default=4)
+    det_group.add_argument("--det_batch_max_wait_ms", type=float, default=5)
 
     cls_group = parser.add_argument_group(title="Cls")
     cls_group.add_argument("--cls_use_cuda", action="store_true", default=False)
@@ -76,6 +83,11 @@ def init_args():
     rec_group.add_argument("--rec_keys_path", type=str, default=None)
     rec_group.add_argument("--rec_img_shape", type=list, default=[3, 48, 320])
     rec_group.add_argument("--rec_batch_num", type=int, default=6)
+    rec_group.add_argument("--rec_batch_scheduler", action="store_true", default=False)
+    rec_group.add_argument("--rec_batch_max_size", type=int, default=32)
+    rec_group.add_argument("--rec_batch_max_wait_ms", type=float, default=5)
+    rec_group.add_argument("--rec_crop_dedup", action="store_true", default=False)
+    rec_group.add_argument("--rec_crop_cache_size", type=int, default=4096)
 
     vis_group = parser.add_argument_group(title="Visual Result")
     vis_group.add_argument("-vis", "--vis_res", action="store_true", default=False)
@@ -142,7 +154,12 @@ class UpdateParameters:
             ),
         }
 
-        update_params = ["intra_op_num_threads", "inter_op_num_threads"]
+        update_params = [
+            "intra_op_num_threads",
+            "inter_op_num_threads",
+            "session_replicas",
+            "replica_cpu_affinity",
+        ]
         new_config = self.update_global_to_module(
             config, update_params, src="Global", dsts=["Det", "Cls", "Rec"]
         )
@@ -153,6 +170,8 @@ class UpdateParameters:
     ):
         for dst in dsts:
             for param in params:
+                if param not in config[src]:
+                    continue
                 config[dst].update({param: config[src][param]})
         return config
 
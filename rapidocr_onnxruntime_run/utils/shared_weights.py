@@ -0,0 +1,146 @@
+# -*- encoding: utf-8 -*-
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from onnxruntime import GraphOptimizationLevel, InferenceSession, OrtValue, SessionOptions
+
+from .logger import get_logger
+
+logger = get_logger("SharedWeights")
+
+ALIGNMENT = 64
+
+_shared_models: Dict[str, "SharedModel"] = {}
+
+
+class SharedModel:
+    """Model weights living in an anonymous shared mapping.
+
+    Created in the parent process before workers are forked. The mapping is
+    ``MAP_SHARED``, so every forked worker reads the very same physical pages,
+    and ORT uses them in place through ``SessionOptions.add_initializer``.
+    ``model_bytes`` is the graph already optimized by ORT, with the data of
+    the shared initializers stripped, so sessions neither hold a second copy
+    of the weights nor re-copy them in graph fusions.
+    """
+
+    def __init__(self, model_bytes: bytes, initializers: Dict[str, np.ndarray]):
+        self.model_bytes = model_bytes
+        self.initializers = initializers
+
+    @property
+    def nbytes(self) -> int:
+        return sum(v.nbytes for v in self.initializers.values())
+
+    def add_to(self, sess_opt: SessionOptions) -> List[OrtValue]:
+        """Register the shared weights, the returned values must outlive the session."""
+        # The graph is optimized already, fusions would make private copies
+        sess_opt.graph_optimization_level = GraphOptimizationLevel.ORT_DISABLE_ALL
+        # Prepacked copies would be per process, let kernels read shared weights
+        sess_opt.add_session_config_entry("session.disable_prepacking", "1")
+
+        ort_values = []
+        for name, value in self.initializers.items():
+            ort_value = OrtValue.ortvalue_from_numpy(value)
+            sess_opt.add_initializer(name, ort_value)
+            ort_values.append(ort_value)
+        return ort_values
+
+
+def share_model_weights(
+    model_path: Union[str, Path], min_bytes: int = 1024
+) -> SharedModel:
+    """Optimize an ONNX model and move its large constants into shared memory.
+
+    The model is optimized for the CPU provider of this host, the workers
+    forked from this process run on the same machine.
+    """
+    try:
+        import onnx
+        from onnx import numpy_helper
+    except ImportError as e:
+        raise ImportError(
+            "Sharing model weights requires the onnx package, run `pip install onnx`."
+        ) from e
+
+    key = _get_key(model_path)
+    if key in _shared_models:
+        return _shared_models[key]
+
+    model = onnx.load_from_string(_optimize_model(model_path))
+    graph = model.graph
+
+    arrays: Dict[str, np.ndarray] = {}
+    for tensor in graph.initializer:
+        value = numpy_helper.to_array(tensor)
+        if value.nbytes >= min_bytes:
+            arrays[tensor.name] = value
+            _strip_tensor_data(tensor, value.nbytes)
+
+    total = sum(_align(v.nbytes) for v in arrays.values())
+    buffer = mmap.mmap(-1, max(total, 1))
+
+    initializers, offset = {}, 0
+    for name, value in arrays.items():
+        shared = np.ndarray(value.shape, value.dtype, buffer=buffer, offset=offset)
+        shared[...] = value
+        initializers[name] = shared
+        offset += _align(value.nbytes)
+
+    shared_model = SharedModel(model.SerializeToString(), initializers)
+    _shared_models[key] = shared_model
+    logger.info(
+        "Shared %d weights (%.1f MB) of %s, graph %.1f KB",
+        len(initializers),
+        shared_model.nbytes / 1024 / 1024,
+        model_path,
+        len(shared_model.model_bytes) / 1024,
+    )
+    return shared_model
+
+
+def _optimize_model(model_path: Union[str, Path]) -> bytes:
+    """Run ORT graph optimizations once and return the serialized result."""
+    with tempfile.TemporaryDirectory(prefix="rapidocr_") as tmp_dir:
+        optimized_path = os.path.join(tmp_dir, "optimized.onnx")
+        sess_opt = SessionOptions()
+        sess_opt.log_severity_level = 3
+        sess_opt.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_opt.optimized_model_filepath = optimized_path
+        InferenceSession(
+            str(model_path), sess_options=sess_opt, providers=["CPUExecutionProvider"]
+        )
+        with open(optimized_path, "rb") as f:
+            return f.read()
+
+
+def _strip_tensor_data(tensor, nbytes: int):
+    """Drop the data of an initializer supplied through add_initializer.
+
+    The tensor keeps its name, type and shape; the data is marked external
+    so the model stays valid, ORT never reads it since the name is overridden.
+    """
+    for field in ("raw_data", "float_data", "int32_data", "int64_data", "double_data"):
+        tensor.ClearField(field)
+    tensor.data_location = tensor.EXTERNAL
+    del tensor.external_data[:]
+    tensor.external_data.add(key="location", value="__shared_weights__")
+    tensor.external_data.add(key="length", value=str(nbytes))
+
+
+def get_shared_model(model_path: Union[str, Path, None]) -> Optional[SharedModel]:
+    if model_path is None:
+        return None
+    return _shared_models.get(_get_key(model_path))
+
+
+def _get_key(model_path: Union[str, Path]) -> str:
+    return str(Path(model_path).resolve())
+
+
+def _align(nbytes: int) -> int:
+    return (nbytes + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT